@@ -1,43 +1,57 @@
 from flask import Blueprint, request, jsonify
-from db_connection import conectar
+from db_connection import conexao
 import psycopg2
 from config import ENABLE_SQL_ENDPOINT, ADMIN_TOKEN, RATE_LIMIT_ADMIN
 from ratelimit import limiter
+from versoes import com_etag, GLOBAL
+from streaming import formato_stream, resposta_stream
+from json_rapido import resposta_linhas
+from sql_seguro import (
+    ExecucaoSQL,
+    resposta_sql,
+    mensagem_erro,
+    ConsultaRejeitada,
+    FilaCheia,
+    InstrucoesMultiplas,
+)
+import consultas_nomeadas
 
 analytics_bp = Blueprint("analytics", __name__)
 
+SQL_ANALISE_LANCAMENTOS = """
+    SELECT 
+        l.id_imovel,
+        im.nome AS nome_imovel,
+        c.categoria,
+        c.dc,
+        l.valor,
+        l.data,
+        l.id_situacao,
+        l.descricao,
+        l.ativo
+    FROM lancamentos l
+    JOIN imoveis im ON l.id_imovel = im.id
+    JOIN categorias c ON l.id_categoria = c.id
+    ORDER BY l.data
+"""
+
 # 🔹 Rota de lançamentos para análise
 @analytics_bp.route("/analise/lancamentos", methods=["GET"])
 @limiter.limit(RATE_LIMIT_ADMIN)
+@com_etag([GLOBAL])
 def get_lancamentos_completos_unificados():
     if not ENABLE_SQL_ENDPOINT:
         return jsonify({"error": "Endpoint desabilitado"}), 404
-    conn, cur = conectar()
-    cur.execute("""
-        SELECT 
-            l.id_imovel,
-            im.nome AS nome_imovel,
-            c.categoria,
-            c.dc,
-            l.valor,
-            l.data,
-            l.id_situacao,
-            l.descricao,
-            l.ativo
-        FROM lancamentos l
-        JOIN imoveis im ON l.id_imovel = im.id
-        JOIN categorias c ON l.id_categoria = c.id
-        ORDER BY l.data
-    """)
-    rows = cur.fetchall()
-    conn.close()
-    return jsonify([dict(row) for row in rows])
+    formato = formato_stream()
+    if formato:
+        return resposta_stream(SQL_ANALISE_LANCAMENTOS, formato=formato)
+    with conexao(cursor_factory=None) as (conn, cur):
+        return resposta_linhas(cur, SQL_ANALISE_LANCAMENTOS)
 
 
-# 🔹 Rota de execução SQL segura
-@analytics_bp.route("/sql", methods=["POST"])
-@limiter.limit(RATE_LIMIT_ADMIN)
-def executar_sql_seguro():
+def _acesso_sql_negado():
+    """Resposta de erro se o endpoint estiver desabilitado ou o token de
+    admin não conferir; None se o acesso for permitido."""
     if not ENABLE_SQL_ENDPOINT:
         return jsonify({"error": "Endpoint desabilitado"}), 404
     # Se ADMIN_TOKEN estiver definido, exigir cabeçalho correspondente
@@ -45,18 +59,69 @@ def executar_sql_seguro():
         token = request.headers.get("X-ADMIN-TOKEN", "")
         if token != ADMIN_TOKEN:
             return jsonify({"error": "Token inválido"}), 403
-    data = request.get_json()
-    query = data.get("query", "").strip()
+    return None
+
+
+# 🔹 Rota de execução SQL segura
+@analytics_bp.route("/sql", methods=["POST"])
+@limiter.limit(RATE_LIMIT_ADMIN)
+def executar_sql_seguro():
+    negado = _acesso_sql_negado()
+    if negado:
+        return negado
+    data = request.get_json(silent=True) or {}
+    query = str(data.get("query", "")).strip()
 
     if not query.lower().startswith("select"):
         return jsonify({"error": "Apenas SELECT é permitido"}), 403
 
-    conn, cur = conectar()
+    # Transação READ ONLY com timeout e teto de linhas; resultado em streaming
     try:
-        cur.execute(query)
-        rows = cur.fetchall()
-        return jsonify([dict(row) for row in rows])
+        return resposta_sql(ExecucaoSQL(query))
+    except InstrucoesMultiplas:
+        return jsonify({"error": "Apenas uma instrução SELECT por consulta"}), 403
+    except ConsultaRejeitada as e:
+        return jsonify({
+            "error": "Consulta rejeitada pelo controle de custo: " + str(e),
+            **{k: v for k, v in e.detalhes.items() if k != "motivo"},
+        }), 422
+    except FilaCheia:
+        resposta = jsonify({"error": "Muitas consultas pesadas em andamento; tente novamente em instantes"})
+        resposta.headers["Retry-After"] = "5"
+        return resposta, 503
     except psycopg2.Error as e:
+        status, mensagem = mensagem_erro(e)
+        return jsonify({"error": mensagem}), status
+
+
+# 🔹 Consultas nomeadas (catálogo fixo, parâmetros validados)
+@analytics_bp.route("/sql/named", methods=["GET"])
+@limiter.limit(RATE_LIMIT_ADMIN)
+def listar_consultas_nomeadas():
+    negado = _acesso_sql_negado()
+    if negado:
+        return negado
+    return jsonify(consultas_nomeadas.descrever_catalogo())
+
+
+@analytics_bp.route("/sql/named/<nome>", methods=["GET"])
+@limiter.limit(RATE_LIMIT_ADMIN)
+def executar_consulta_nomeada(nome):
+    negado = _acesso_sql_negado()
+    if negado:
+        return negado
+    if nome not in consultas_nomeadas.CATALOGO:
+        return jsonify({
+            "error": f"Consulta desconhecida: {nome}",
+            "disponiveis": sorted(consultas_nomeadas.CATALOGO),
+        }), 404
+    try:
+        valores = consultas_nomeadas.validar_parametros(nome, request.args.to_dict())
+    except consultas_nomeadas.ParametroInvalido as e:
         return jsonify({"error": str(e)}), 400
-    finally:
-        conn.close()
+    try:
+        resultado = consultas_nomeadas.executar(nome, valores)
+    except psycopg2.Error as e:
+        status, mensagem = mensagem_erro(e)
+        return jsonify({"error": mensagem}), status
+    return jsonify({"consulta": nome, **resultado})
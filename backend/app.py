@@ -1,3 +1,4 @@
+import click
 from flask import Flask, request, jsonify
 from flask import send_file, abort
 from flask_cors import CORS
@@ -11,12 +12,15 @@ from models import (
     listar_categorias,
     adicionar_categoria,
     deletar_categoria,
-    listar_lancamentos,
+    SQL_LANCAMENTOS,
     #adicionar_lancamento,
     adicionar_lancamentos_em_lote,
     listar_resumo_financeiro,
     listar_orcamentos_por_imovel,
-    atualizar_inserir_orcamentos
+    atualizar_inserir_orcamentos,
+    reconstruir_resumo_imoveis,
+    listar_lancamentos_completos_view,
+    listar_lancamentos_incompletos_view,
 )
 from analytics import analytics_bp
 from gpt import gpt_bp
@@ -32,19 +36,51 @@ from config import (
     RATE_LIMIT_GLOBAL,
     RATE_LIMIT_EDIT,
     TRUST_PROXY,
+    COMPRESSAO_ATIVA,
 )
-from security import requires_editor_token
+from security import requires_editor_token, requires_editor_auth
 from ratelimit import limiter
+from db_connection import conexao, estatisticas_pool, init_app as init_db
+import referencia
+from streaming import formato_stream, resposta_stream
+from sql_seguro import estatisticas_planos, estatisticas_resultados
+import consultas_nomeadas
+from versoes import (
+    com_etag,
+    etag_para,
+    resposta_304,
+    marcar_etag,
+    escopo_imovel,
+    escopos_imovel,
+    GLOBAL,
+    REFERENCIA,
+)
+from secoes import executar_secoes, executar_em_sequencia
+from json_rapido import ProvedorJSON, resposta_linhas
+import compressao
+import metricas
+import instrumentacao
+import auditoria
+from functools import partial
 from werkzeug.middleware.proxy_fix import ProxyFix
-import time, json
+import time
 from flask import g
 from werkzeug.exceptions import HTTPException
 
 
 app = Flask(__name__)
+# JSON rápido (orjson) com datas DD/MM/AAAA e Decimal como número
+app.json = ProvedorJSON(app)
+# Métricas em /metrics; registrado antes do rate limiter para contar os 429
+metricas.init_app(app)
+# Server-Timing, consultas por requisição e aviso de N+1
+instrumentacao.init_app(app)
 # Proxy IP fix para uso por trás de proxy (Render)
 if TRUST_PROXY:
     app.wsgi_app = ProxyFix(app.wsgi_app, x_for=1)
+# gzip/brotli nas respostas JSON grandes e nos streams
+if COMPRESSAO_ATIVA:
+    app.wsgi_app = compressao.Compressao(app.wsgi_app)
 # Configura CORS conforme origens permitidas
 cors_resources = {r"/*": {"origins": ALLOWED_ORIGINS_LIST or "*"}}
 CORS(app, resources=cors_resources)
@@ -56,6 +92,9 @@ if default_limits:
     app.config['RATELIMIT_DEFAULTS'] = default_limits
 limiter.init_app(app)
 
+# Sessão de banco por requisição (uma conexão/transação compartilhada)
+init_db(app)
+
 # Registra analytics somente se habilitado
 if ENABLE_SQL_ENDPOINT:
     app.register_blueprint(analytics_bp)
@@ -79,6 +118,21 @@ def healthz():
     return jsonify({"status": "ok"}), 200
 
 
+@app.route("/healthz/stats", methods=["GET"])
+@requires_editor_auth
+def healthz_stats():
+    # Estatísticas do worker que atendeu a requisição
+    return jsonify({
+        "pool": estatisticas_pool(),
+        "cache_referencia": referencia.estatisticas(),
+        "cache_planos_sql": estatisticas_planos(),
+        "cache_resultados_sql": estatisticas_resultados(),
+        "cache_consultas_nomeadas": consultas_nomeadas.estatisticas(),
+        "compressao": compressao.estatisticas(),
+        "auditoria": auditoria.estatisticas(),
+    }), 200
+
+
 # =====================================================
 # =====================================================
 # 🔹 ROTAS IMÓVEIS
@@ -99,8 +153,15 @@ def start_timer():
     g._start_time = time.perf_counter()
 
 
+def _json_ja_lido():
+    # Corpo JSON só se a rota já o leu (cache do Werkzeug); o log não parseia de novo
+    valor = getattr(request, "_cached_json", (Ellipsis, Ellipsis))[0]
+    return None if valor is Ellipsis else valor
+
+
 @app.after_request
 def audit_log(response):
+    # Só monta o evento; a gravação é feita em lote por auditoria.py, fora da requisição
     try:
         method = request.method
         path = request.path
@@ -116,32 +177,27 @@ def audit_log(response):
             has_editor = hdr_auth.startswith("Bearer ")
             ip = request.headers.get("X-Forwarded-For", request.remote_addr or "-").split(",")[0].strip()
             ua = request.headers.get("User-Agent", "-")
-            body_size = 0
             keys = []
-            try:
-                data = request.get_json(silent=True)
-                if isinstance(data, (dict, list)):
-                    body_size = len(json.dumps(data))
-                    if isinstance(data, dict):
-                        keys = list(data.keys())[:12]
-                    else:
-                        keys = ["list"]
-            except Exception:
-                pass
+            data = _json_ja_lido()
+            if isinstance(data, dict):
+                keys = list(data.keys())[:12]
+            elif isinstance(data, list):
+                keys = ["list"]
 
-            log = {
+            auditoria.registrar({
                 "event": "audit",
+                "ts": time.time(),
                 "method": method,
                 "path": path,
                 "status": response.status_code,
                 "duration_ms": duration_ms,
                 "ip": ip,
                 "ua": ua,
-                "body_size": body_size,
+                # Tamanho enviado pelo cliente (Content-Length), não o JSON re-serializado
+                "body_size": request.content_length or 0,
                 "json_keys": keys,
                 "editor_token_present": has_editor,
-            }
-            print(json.dumps(log, ensure_ascii=False))
+            })
     except Exception:
         pass
     return response
@@ -159,6 +215,7 @@ def handle_exceptions(e):
     return jsonify({"error": str(e)}), 500
 
 @app.route("/imoveis", methods=["GET"])
+@com_etag([GLOBAL])
 def get_imoveis():
     return jsonify(listar_imoveis())
 
@@ -170,18 +227,74 @@ def add_imovel():
     return jsonify(adicionar_imovel(data["nome"], data["vendido"]))
 
 @app.route("/imoveis/<int:imovel_id>", methods=["GET"])
+@com_etag(lambda imovel_id: [escopo_imovel(imovel_id)])
 def get_imovel_by_id(imovel_id):
     imovel = buscar_imovel_por_id(imovel_id)
     if not imovel:
         return jsonify({"error": "Imóvel não encontrado"}), 404
     return jsonify(imovel)
 
+# Seções do bundle do imóvel: nome -> (função(id), escopos do ETag)
+SECOES_BUNDLE = {
+    "imovel": (buscar_imovel_por_id, lambda i: [escopo_imovel(i)]),
+    "resumo_financeiro": (listar_resumo_financeiro, escopos_imovel),
+    "orcamentos": (listar_orcamentos_por_imovel, escopos_imovel),
+    "lancamentos_completos": (listar_lancamentos_completos_view, escopos_imovel),
+    # Inclui os lançamentos sem imóvel: qualquer escrita muda a lista
+    "lancamentos_incompletos": (listar_lancamentos_incompletos_view, lambda i: [GLOBAL]),
+}
+# Mesma consulta com outro nome: pedidas juntas, rodam uma vez só
+APELIDOS_BUNDLE = {"orcamento_execucao": "resumo_financeiro"}
+
+@app.route("/imoveis/<int:imovel_id>/bundle", methods=["GET"])
+def get_imovel_bundle(imovel_id):
+    """Seções do imóvel (`?include=` separado por vírgula; padrão todas) num
+    só documento, com um ETag para o conjunto. Por padrão as seções rodam
+    em sequência na conexão da requisição; `?paralelo=1` usa conexões do
+    pool em paralelo e tolera falha parcial (seção null em `secoes`)."""
+    include = request.args.get("include", "").strip()
+    pedidas = [p.strip() for p in include.split(",") if p.strip()] or list(SECOES_BUNDLE)
+    desconhecidas = [p for p in pedidas if p not in SECOES_BUNDLE and p not in APELIDOS_BUNDLE]
+    if desconhecidas:
+        return jsonify({
+            "error": f"Seção desconhecida: {', '.join(desconhecidas)}",
+            "disponiveis": list(SECOES_BUNDLE) + list(APELIDOS_BUNDLE),
+        }), 400
+    secoes_reais = list(dict.fromkeys(APELIDOS_BUNDLE.get(p, p) for p in pedidas))
+
+    escopos = sorted({e for nome in secoes_reais for e in SECOES_BUNDLE[nome][1](imovel_id)})
+    tag = etag_para(escopos)
+    nao_modificado = resposta_304(tag)
+    if nao_modificado:
+        return nao_modificado
+
+    tarefas = {nome: partial(SECOES_BUNDLE[nome][0], imovel_id) for nome in secoes_reais}
+    if request.args.get("paralelo", "").lower() in ("1", "true"):
+        dados, secoes = executar_secoes(tarefas)
+    else:
+        try:
+            dados, secoes = executar_em_sequencia(tarefas)
+        except Exception as e:
+            print(f"Erro ao montar bundle do imóvel: {e}")
+            return jsonify({"error": "Erro ao buscar dados do imóvel"}), 500
+
+    if secoes.get("imovel", {}).get("ok") and dados["imovel"] is None:
+        return jsonify({"error": "Imóvel não encontrado"}), 404
+    resposta = jsonify({
+        **{p: dados[APELIDOS_BUNDLE.get(p, p)] for p in pedidas},
+        "secoes": secoes,
+    })
+    if all(secao["ok"] for secao in secoes.values()):
+        marcar_etag(resposta, tag)
+    return resposta
+
 @app.route("/imoveis/<int:imovel_id>", methods=["PATCH"])
 @requires_editor_token
 @limiter.limit(RATE_LIMIT_EDIT)
 def update_imovel(imovel_id):
     data = request.json
-    imovel = buscar_imovel_por_id(imovel_id)
+    # Bloqueia a linha até o fim da requisição (mesma transação do UPDATE)
+    imovel = buscar_imovel_por_id(imovel_id, bloquear=True)
     if not imovel:
         return jsonify({"error": "Imóvel não encontrado"}), 404
 
@@ -207,7 +320,8 @@ def update_imovel(imovel_id):
         longitude,
         corretagem,
         ganho_capital,
-        valor_venda
+        valor_venda,
+        imovel=imovel
     )
 
     return jsonify(imovel_atualizado)
@@ -223,6 +337,7 @@ def delete_imovel(imovel_id):
 # =====================================================
 
 @app.route("/categorias", methods=["GET"])
+@com_etag([REFERENCIA])
 def get_categorias():
     return jsonify(listar_categorias())
 
@@ -244,8 +359,15 @@ def delete_categoria(categoria_id):
 # =====================================================
 
 @app.route("/lancamentos", methods=["GET"])
+@com_etag([GLOBAL])
 def get_lancamentos():
-    return jsonify(listar_lancamentos())
+    # ?stream=ndjson|json: lê em lotes por cursor no servidor
+    formato = formato_stream()
+    if formato:
+        return resposta_stream(SQL_LANCAMENTOS, formato=formato)
+    # Tuplas direto para JSON, sem DictRow
+    with conexao(cursor_factory=None) as (conn, cur):
+        return resposta_linhas(cur, SQL_LANCAMENTOS)
 
 ## Removido: endpoint genérico POST /lancamentos (inconsistente). Usar /gpt/lancamentos ou rotas do dashboard.
 
@@ -254,6 +376,9 @@ def get_lancamentos():
 # =====================================================
 
 @app.route("/dashboard/resumo-financeiro/<int:id_imovel>", methods=["GET"])
+# 🔹 ROTA ALTERNATIVA (opcional): mesmo handler e mesma consulta
+@app.route("/dashboard/orcamento_execucao/<int:id_imovel>", methods=["GET"])
+@com_etag(escopos_imovel)
 def get_resumo_financeiro(id_imovel):
     try:
         dados = listar_resumo_financeiro(id_imovel)
@@ -262,21 +387,12 @@ def get_resumo_financeiro(id_imovel):
         print(f"Erro ao buscar resumo financeiro: {e}")
         return jsonify({"error": "Erro ao buscar resumo financeiro"}), 500
 
-# 🔹 ROTA ALTERNATIVA (opcional)
-@app.route("/dashboard/orcamento_execucao/<int:id_imovel>", methods=["GET"])
-def get_orcamento_execucao(id_imovel):
-    try:
-        dados = listar_resumo_financeiro(id_imovel)
-        return jsonify(dados)
-    except Exception as e:
-        print(f"Erro ao buscar orçamento execução: {e}")
-        return jsonify({"error": "Erro ao buscar orçamento execução"}), 500
-
 # =====================================================
 # 🔹 ROTAS ORÇAMENTOS
 # =====================================================
 
 @app.route("/orcamentos/<int:id_imovel>", methods=["GET"])
+@com_etag(escopos_imovel)
 def get_orcamentos_por_imovel(id_imovel):
     orcamentos = listar_orcamentos_por_imovel(id_imovel)
     return jsonify(orcamentos), 200
@@ -290,7 +406,10 @@ def post_orcamentos_por_imovel(id_imovel):
     if not isinstance(data, list):
         return jsonify({"error": "Formato inválido! Esperado uma lista de orçamentos."}), 400
 
-    resultado = atualizar_inserir_orcamentos(id_imovel, data)
+    try:
+        resultado = atualizar_inserir_orcamentos(id_imovel, data)
+    except ValueError as e:
+        return jsonify({"error": "Formato inválido! Cada item precisa de id_grupo e orcamento numéricos.", "details": str(e)}), 400
     return jsonify(resultado), 200
 
 
@@ -307,6 +426,20 @@ def get_openapi_spec():
     else:
         abort(404, description="Arquivo openapi.json não encontrado")
 
+# =====================================================
+# 🔹 COMANDOS (flask --app app <comando>)
+# =====================================================
+
+@app.cli.command("reconstruir-resumo")
+@click.option("--excluir", default=None, help="IDs de categoria fora do total, separados por vírgula (troca a lista)")
+def reconstruir_resumo_command(excluir):
+    """Recalcula resumo_imoveis com as categorias de resumo_categorias_excluidas."""
+    categorias = None
+    if excluir is not None:
+        categorias = [int(c) for c in excluir.split(",") if c.strip()]
+    total = reconstruir_resumo_imoveis(categorias)
+    print(f"Resumo recalculado para {total} imóveis.")
+
 # =====================================================
 # 🔹 BLUEPRINT DASHBOARD
 # =====================================================
@@ -0,0 +1,193 @@
+"""Log de auditoria fora do caminho da requisição.
+
+`registrar(evento)` só coloca o evento numa fila limitada
+(AUDITORIA_FILA_MAX); uma thread por worker tira os eventos em lotes
+(até AUDITORIA_LOTE, ou o que chegou em AUDITORIA_INTERVALO_SEC) e grava
+na saída de AUDITORIA_SAIDA:
+
+- `stdout`: uma linha JSON por evento (o formato de antes);
+- `arquivo`: as mesmas linhas, acrescentadas em AUDITORIA_ARQUIVO;
+- `postgres`: tabela `auditoria` (migrations/007_auditoria.sql), um
+  INSERT por lote.
+
+Com a fila cheia o evento é descartado e contado (`descartados` em
+/healthz/stats e `auditoria_descartados_total` em /metrics): a requisição
+nunca espera pelo log. Ao encerrar o processo o que restou na fila é
+gravado.
+"""
+import atexit
+import json
+import os
+import queue
+import sys
+import threading
+import time
+from psycopg2 import extras
+from config import (
+    AUDITORIA_SAIDA,
+    AUDITORIA_ARQUIVO,
+    AUDITORIA_FILA_MAX,
+    AUDITORIA_LOTE,
+    AUDITORIA_INTERVALO_SEC,
+)
+import metricas
+
+
+# ======================================================
+# 🔹 Saídas
+# ======================================================
+
+def _linhas(eventos):
+    return "".join(json.dumps(e, ensure_ascii=False) + "\n" for e in eventos)
+
+
+def _gravar_stdout(eventos):
+    sys.stdout.write(_linhas(eventos))
+    sys.stdout.flush()
+
+
+def _gravar_arquivo(eventos):
+    with open(AUDITORIA_ARQUIVO, "a", encoding="utf-8") as arquivo:
+        arquivo.write(_linhas(eventos))
+
+
+def _gravar_postgres(eventos):
+    # Import tardio: db_connection importa metricas/instrumentacao, que não dependem daqui
+    from db_connection import conexao_isolada
+
+    with conexao_isolada(cursor_factory=None) as (conn, cur):
+        extras.execute_values(
+            cur,
+            """
+            INSERT INTO auditoria (
+                criado_em, metodo, caminho, status, duracao_ms, ip,
+                user_agent, tamanho_corpo, chaves_json, token_editor
+            ) VALUES %s
+            """,
+            [
+                (
+                    e["ts"], e["method"], e["path"], e["status"], e["duration_ms"], e["ip"],
+                    e["ua"], e["body_size"], extras.Json(e["json_keys"]), e["editor_token_present"],
+                )
+                for e in eventos
+            ],
+            template="(to_timestamp(%s), %s, %s, %s, %s, %s, %s, %s, %s, %s)",
+        )
+
+
+_SAIDAS = {"stdout": _gravar_stdout, "arquivo": _gravar_arquivo, "postgres": _gravar_postgres}
+
+
+# ======================================================
+# 🔹 Fila e thread de gravação
+# ======================================================
+
+class _Auditoria:
+    def __init__(self, gravar, fila_max, lote, intervalo):
+        self._gravar = gravar
+        self._lote = lote
+        self._intervalo = intervalo
+        self._fila = queue.Queue(maxsize=fila_max)
+        self._lock = threading.Lock()
+        self._thread = None
+        self._pid = None
+        self.enfileirados = 0
+        self.gravados = 0
+        self.descartados = 0
+        self.falhas = 0
+
+    def registrar(self, evento):
+        self._garantir_thread()
+        try:
+            self._fila.put_nowait(evento)
+        except queue.Full:
+            with self._lock:
+                self.descartados += 1
+            metricas.AUDITORIA_DESCARTADOS.inc()
+            return False
+        with self._lock:
+            self.enfileirados += 1
+        return True
+
+    def _garantir_thread(self):
+        # Mesmo cuidado do pool e do executor de seções: threads não sobrevivem ao fork
+        pid = os.getpid()
+        if self._pid == pid:
+            return
+        with self._lock:
+            if self._pid == pid:
+                return
+            if self._pid is not None:
+                self._fila = queue.Queue(maxsize=self._fila.maxsize)
+            self._thread = threading.Thread(target=self._executar, name="auditoria", daemon=True)
+            self._thread.start()
+            self._pid = pid
+
+    def _proximo_lote(self):
+        lote = [self._fila.get()]
+        prazo = time.monotonic() + self._intervalo
+        while len(lote) < self._lote:
+            restante = prazo - time.monotonic()
+            if restante <= 0:
+                break
+            try:
+                lote.append(self._fila.get(timeout=restante))
+            except queue.Empty:
+                break
+        return lote
+
+    def _executar(self):
+        while True:
+            self._gravar_lote(self._proximo_lote())
+
+    def _gravar_lote(self, lote):
+        try:
+            self._gravar(lote)
+            with self._lock:
+                self.gravados += len(lote)
+        except Exception as e:
+            with self._lock:
+                self.falhas += len(lote)
+            metricas.AUDITORIA_FALHAS.inc(len(lote))
+            print(f"Erro ao gravar auditoria ({len(lote)} eventos): {e}")
+
+    def esvaziar(self):
+        """Grava na thread atual o que ainda está na fila (encerramento)."""
+        lote = []
+        while True:
+            try:
+                lote.append(self._fila.get_nowait())
+            except queue.Empty:
+                break
+            if len(lote) >= self._lote:
+                self._gravar_lote(lote)
+                lote = []
+        if lote:
+            self._gravar_lote(lote)
+
+    def estatisticas(self):
+        with self._lock:
+            return {
+                "saida": AUDITORIA_SAIDA,
+                "na_fila": self._fila.qsize(),
+                "fila_max": self._fila.maxsize,
+                "enfileirados": self.enfileirados,
+                "gravados": self.gravados,
+                "descartados": self.descartados,
+                "falhas": self.falhas,
+            }
+
+
+_auditoria = _Auditoria(
+    _SAIDAS.get(AUDITORIA_SAIDA, _gravar_stdout), AUDITORIA_FILA_MAX, AUDITORIA_LOTE, AUDITORIA_INTERVALO_SEC
+)
+atexit.register(_auditoria.esvaziar)
+
+
+def registrar(evento):
+    """Enfileira `evento` (dict); False se a fila estava cheia e ele foi descartado."""
+    return _auditoria.registrar(evento)
+
+
+def estatisticas():
+    return _auditoria.estatisticas()
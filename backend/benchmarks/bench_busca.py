@@ -0,0 +1,123 @@
+"""Benchmark da busca por nome (/imoveis/search, /categorias/search).
+
+Cria uma tabela temporária com nomes sintéticos (padrão 50 mil) e compara
+a busca antiga (`ILIKE '%q%'` + OFFSET, sem índice) com a busca por
+trigramas de search.py (índice GIN sobre `f_unaccent(lower(nome))`).
+Mostra o tempo mediano e quantos resultados cada uma encontra para termos
+com acento e erros de digitação. Requer migrations/005_busca_trigram.sql.
+
+Uso (a partir de backend/):
+    python benchmarks/bench_busca.py --linhas 50000 --repeticoes 20
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from psycopg2 import extras  # noqa: E402
+from db_connection import conexao_isolada  # noqa: E402
+from config import SEARCH_SIMILARIDADE_MIN  # noqa: E402
+from search import sql_busca, _escapar_like  # noqa: E402
+
+TIPOS = ["Casa", "Apartamento", "Sala", "Terreno", "Sobrado", "Kitnet", "Galpão"]
+CIDADES = [
+    "Pelotas", "São Paulo", "Florianópolis", "Jaraguá do Sul", "Porto Alegre",
+    "Caxias do Sul", "Santa Maria", "Balneário Camboriú", "Criciúma", "Joinville",
+]
+RUAS = ["Rua das Flores", "Av. Brasil", "Rua XV", "Rua Tiradentes", "Av. Beira-Mar", "Travessa São João"]
+
+# termo -> o que testa
+TERMOS = {
+    "Pelotas": "exato",
+    "pelotas": "minúsculas",
+    "Pelotsa": "erro de digitação",
+    "sao paulo": "sem acento",
+    "florianopolis": "sem acento",
+    "Camboriu": "sem acento",
+    "tiradentes 12": "duas palavras",
+}
+
+BUSCA_ANTIGA = """
+    SELECT id, nome
+    FROM nomes_bench
+    WHERE nome ILIKE %s
+    ORDER BY nome
+    LIMIT %s OFFSET %s
+"""
+
+
+def gerar_nomes(n):
+    aleatorio = random.Random(42)
+    return [
+        (f"{aleatorio.choice(TIPOS)} {aleatorio.choice(RUAS)} {aleatorio.randint(1, 999)} - {aleatorio.choice(CIDADES)}",)
+        for _ in range(n)
+    ]
+
+
+def preparar(cur, linhas):
+    cur.execute("CREATE TEMP TABLE nomes_bench (id serial PRIMARY KEY, nome text NOT NULL)")
+    extras.execute_values(cur, "INSERT INTO nomes_bench (nome) VALUES %s", gerar_nomes(linhas), page_size=5000)
+    cur.execute("CREATE INDEX ON nomes_bench USING gin (f_unaccent(lower(nome)) gin_trgm_ops)")
+    cur.execute("ANALYZE nomes_bench")
+
+
+def busca_antiga(cur, termo, limite):
+    cur.execute(BUSCA_ANTIGA, (f"%{termo}%", limite, 0))
+    return cur.fetchall()
+
+
+def busca_trigram(cur, termo, limite):
+    cur.execute(
+        sql_busca("nomes_bench", "nome"),
+        {
+            "similaridade": str(SEARCH_SIMILARIDADE_MIN),
+            "q": termo,
+            "padrao": f"%{_escapar_like(termo)}%",
+            "cursor": None,
+            "limit": limite,
+        },
+    )
+    return cur.fetchall()
+
+
+def contar_antiga(cur, termo):
+    cur.execute("SELECT count(*) FROM nomes_bench WHERE nome ILIKE %s", (f"%{termo}%",))
+    return cur.fetchone()[0]
+
+
+def medir(cur, funcao, termo, limite, repeticoes):
+    tempos = []
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        funcao(cur, termo, limite)
+        tempos.append((time.perf_counter() - inicio) * 1000)
+    return statistics.median(tempos)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--linhas", type=int, default=50000)
+    parser.add_argument("--repeticoes", type=int, default=20)
+    parser.add_argument("--limite", type=int, default=10)
+    args = parser.parse_args()
+
+    with conexao_isolada() as (conn, cur):
+        preparar(cur, args.linhas)
+        print(f"{args.linhas} nomes sintéticos; mediana de {args.repeticoes} execuções, LIMIT {args.limite}\n")
+        print(f"{'termo':<16} {'caso':<18} {'ILIKE ms':>9} {'achados':>8}   {'trigram ms':>10} {'página':>7} {'1º score':>8}")
+        for termo, caso in TERMOS.items():
+            antiga_ms = medir(cur, busca_antiga, termo, args.limite, args.repeticoes)
+            achados = contar_antiga(cur, termo)
+            trigram_ms = medir(cur, busca_trigram, termo, args.limite, args.repeticoes)
+            pagina = busca_trigram(cur, termo, args.limite)
+            primeiro = f"{pagina[0][2]:.2f}" if pagina else "-"
+            print(f"{termo:<16} {caso:<18} {antiga_ms:9.2f} {achados:8d}   {trigram_ms:10.2f} {len(pagina):7d} {primeiro:>8}")
+        conn.rollback()
+
+
+if __name__ == "__main__":
+    main()
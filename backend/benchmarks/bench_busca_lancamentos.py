@@ -0,0 +1,121 @@
+"""Benchmark da busca textual em descrições de lançamentos.
+
+Gera uma tabela temporária com milhões de lançamentos sintéticos (no
+próprio banco, via generate_series) e compara `descricao ILIKE '%termo%'`
+(o que se fazia pelo /sql) com a consulta de GET /lancamentos/search
+(índice GIN de texto completo, ranking e trechos destacados), com e sem
+filtro de imóvel/período. Requer migrations/005 e 006.
+
+Uso (a partir de backend/):
+    python benchmarks/bench_busca_lancamentos.py --linhas 2000000 --repeticoes 5
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+from datetime import date
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from db_connection import conexao_isolada  # noqa: E402
+from search import SQL_BUSCA_LANCAMENTOS  # noqa: E402
+
+SQL_BENCH = SQL_BUSCA_LANCAMENTOS.replace("FROM lancamentos l", "FROM lancamentos_bench l")
+
+GERAR = """
+    CREATE TEMP TABLE lancamentos_bench AS
+    SELECT g AS id,
+           date '2020-01-01' + (g %% 1800) AS data,
+           1 + g %% 40 AS id_imovel,
+           1 + g %% 30 AS id_categoria,
+           1 + g %% 3 AS id_situacao,
+           round((random() * 5000)::numeric, 2) AS valor,
+           (ARRAY['Pagamento', 'Compra', 'Serviço', 'Adiantamento', 'Reembolso'])[1 + g %% 5]
+             || ' ' ||
+           (ARRAY['eletricista', 'encanador', 'pedreiro', 'pintor', 'marceneiro', 'vidraceiro',
+                  'material elétrico', 'cimento e areia', 'azulejos', 'conta de luz', 'IPTU',
+                  'condomínio', 'instalação elétrica', 'reforma do banheiro'])[1 + (g * 7) %% 14]
+             || ' ' ||
+           (ARRAY['João', 'Maria', 'Construtora Sul', 'Loja Central', 'Ferragem Pelotas', 'José'])[1 + (g * 13) %% 6]
+             || ' nf ' || g AS descricao
+    FROM generate_series(1, %s) AS g
+"""
+
+CONSULTAS = [
+    ("eletricista", None, None, None),
+    ("instalacao eletrica", None, None, None),
+    ("eletricista", 7, date(2022, 1, 1), date(2022, 12, 31)),
+    ('"reforma do banheiro"', 3, None, None),
+]
+
+
+def preparar(cur, linhas):
+    inicio = time.perf_counter()
+    cur.execute(GERAR, (linhas,))
+    cur.execute("ALTER TABLE lancamentos_bench ADD PRIMARY KEY (id)")
+    cur.execute(
+        "CREATE INDEX ON lancamentos_bench USING gin (to_tsvector('portugues_sem_acento', coalesce(descricao, '')))"
+    )
+    cur.execute("CREATE INDEX ON lancamentos_bench (id_imovel, data)")
+    cur.execute("ANALYZE lancamentos_bench")
+    print(f"{linhas} linhas geradas e indexadas em {time.perf_counter() - inicio:.1f}s\n")
+
+
+def ilike(cur, q, id_imovel, de, ate, limite):
+    # O /sql não ranqueia: a palavra literal, sem stemming nem acento
+    termo = q.strip('"').split()[0]
+    cur.execute(
+        """
+        SELECT id, data, descricao, valor
+        FROM lancamentos_bench
+        WHERE descricao ILIKE %s
+          AND (%s IS NULL OR id_imovel = %s)
+          AND (%s::date IS NULL OR data >= %s::date)
+          AND (%s::date IS NULL OR data <= %s::date)
+        ORDER BY data DESC
+        LIMIT %s
+        """,
+        (f"%{termo}%", id_imovel, id_imovel, de, de, ate, ate, limite),
+    )
+    return cur.fetchall()
+
+
+def texto_completo(cur, q, id_imovel, de, ate, limite):
+    cur.execute(SQL_BENCH, {"q": q, "id_imovel": id_imovel, "de": de, "ate": ate, "cursor": None, "limit": limite})
+    return cur.fetchall()
+
+
+def medir(cur, funcao, consulta, limite, repeticoes):
+    tempos = []
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        funcao(cur, *consulta, limite)
+        tempos.append((time.perf_counter() - inicio) * 1000)
+    return statistics.median(tempos)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--linhas", type=int, default=2_000_000)
+    parser.add_argument("--repeticoes", type=int, default=5)
+    parser.add_argument("--limite", type=int, default=20)
+    args = parser.parse_args()
+
+    with conexao_isolada() as (conn, cur):
+        preparar(cur, args.linhas)
+        print(f"{'consulta':<44} {'ILIKE ms':>10} {'FTS ms':>10}")
+        for consulta in CONSULTAS:
+            q, id_imovel, de, ate = consulta
+            rotulo = q + (f" imóvel={id_imovel}" if id_imovel else "") + (f" {de}..{ate}" if de else "")
+            antigo = medir(cur, ilike, consulta, args.limite, args.repeticoes)
+            novo = medir(cur, texto_completo, consulta, args.limite, args.repeticoes)
+            print(f"{rotulo:<44} {antigo:10.1f} {novo:10.1f}")
+        exemplo = texto_completo(cur, *CONSULTAS[1], 1)
+        if exemplo:
+            print(f"\nexemplo de trecho: {exemplo[0][10]}")
+        conn.rollback()
+
+
+if __name__ == "__main__":
+    main()
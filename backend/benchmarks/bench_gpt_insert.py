@@ -0,0 +1,103 @@
+"""Benchmark da latência do POST /gpt/lancamentos no banco.
+
+Compara o fluxo antigo (imóvel, categoria e situação consultados em
+conexões separadas e depois o INSERT numa quarta conexão) com
+`models.adicionar_lancamento_validado`, que valida e insere num único
+comando usando o pool. Usa o banco configurado no `.env`, mas nada é
+gravado: as duas transações de INSERT são desfeitas (rollback) em vez de
+confirmadas, então lançamentos, versões e triggers não deixam rastro; só a
+sequência de ids de `lancamentos` avança.
+
+Uso (a partir de backend/):
+    python benchmarks/bench_gpt_insert.py --imovel 1 --categoria 1 --situacao 1 --repeticoes 50
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+from datetime import date
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flask import Flask, g  # noqa: E402
+from db_connection import _nova_conexao  # noqa: E402
+from models import adicionar_lancamento_validado  # noqa: E402
+
+# Só para o contexto de requisição: o fluxo novo usa a sessão de banco da requisição
+_app = Flask(__name__)
+
+DESCRICAO = "bench gpt"
+
+
+def _consulta_em_conexao_nova(sql, params, desfazer=False):
+    conn = _nova_conexao()
+    try:
+        cur = conn.cursor()
+        cur.execute(sql, params)
+        linha = cur.fetchone()
+        if desfazer:
+            # No lugar do commit do fluxo antigo: mesma ida ao servidor, nada gravado
+            conn.rollback()
+        return linha
+    finally:
+        conn.close()
+
+
+def fluxo_antigo(imovel, categoria, situacao):
+    _consulta_em_conexao_nova("SELECT * FROM imoveis WHERE id = %s", (imovel,))
+    _consulta_em_conexao_nova("SELECT 1 FROM categorias WHERE id = %s", (categoria,))
+    _consulta_em_conexao_nova("SELECT 1 FROM situacao_lancamento WHERE id = %s", (situacao,))
+    _consulta_em_conexao_nova(
+        """
+        INSERT INTO lancamentos (data, id_imovel, id_categoria, id_situacao, descricao, valor, ativo)
+        VALUES (%s, %s, %s, %s, %s, %s, %s)
+        RETURNING id
+        """,
+        (date.today(), imovel, categoria, situacao, DESCRICAO, 0, True),
+        desfazer=True,
+    )
+
+
+def fluxo_novo(imovel, categoria, situacao):
+    with _app.test_request_context():
+        try:
+            _, erro = adicionar_lancamento_validado(date.today(), imovel, categoria, situacao, DESCRICAO, 0, True)
+        finally:
+            # Como uma requisição com status >= 400: a sessão desfaz a transação
+            sessao = g.get("_sessao_db")
+            if sessao is not None:
+                sessao.finalizar(confirmar=False)
+    if erro:
+        raise SystemExit(f"IDs inválidos para o benchmark: {erro}")
+
+
+def medir(nome, funcao, args, repeticoes):
+    funcao(*args)  # aquecimento (abre o pool no fluxo novo)
+    tempos = []
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        funcao(*args)
+        tempos.append((time.perf_counter() - inicio) * 1000)
+    tempos.sort()
+    p95 = tempos[min(len(tempos) - 1, int(len(tempos) * 0.95))]
+    print(f"{nome:<8} mediana {statistics.median(tempos):8.1f} ms  p95 {p95:8.1f} ms  ({repeticoes} inserções)")
+    return statistics.median(tempos)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--imovel", type=int, required=True)
+    parser.add_argument("--categoria", type=int, required=True)
+    parser.add_argument("--situacao", type=int, required=True)
+    parser.add_argument("--repeticoes", type=int, default=50)
+    args = parser.parse_args()
+
+    ids = (args.imovel, args.categoria, args.situacao)
+    antes = medir("antes", fluxo_antigo, ids, args.repeticoes)
+    depois = medir("depois", fluxo_novo, ids, args.repeticoes)
+    print(f"ganho: {antes / depois:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
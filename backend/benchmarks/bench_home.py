@@ -0,0 +1,98 @@
+"""Benchmark da carga fria da Home: cinco requisições (como o Home.jsx fazia)
+contra uma só em GET /dashboard/home.
+
+Mede o tempo mediano de três modos: as cinco rotas em sequência, as cinco
+em paralelo (como o navegador dispara) e /dashboard/home. "Fria" = sem
+If-None-Match; no modo em processo o cache de referência e o de versões
+também são zerados a cada repetição. Com --url as requisições vão por HTTP
+para um servidor já rodando (inclui a latência de rede/proxy, que é onde a
+rota única mais ganha); sem --url usa o cliente de teste do Flask e o banco
+do `.env`.
+
+Uso (a partir de backend/):
+    python benchmarks/bench_home.py --repeticoes 20
+    python benchmarks/bench_home.py --url https://backend-financeiro-m4r6.onrender.com
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+ROTAS_SEPARADAS = [
+    "/imoveis",
+    "/categorias",
+    "/dashboard/ultima_atualizacao",
+    "/dashboard/ultimos_lancamentos?limit=10",
+    "/dashboard/gastos-mensais?meses=6&excluir=8,15,18",
+]
+ROTA_HOME = "/dashboard/home?meses=6&excluir=8,15,18&limit=10"
+
+
+def cliente_http(base):
+    def get(rota):
+        with urllib.request.urlopen(base.rstrip("/") + rota) as resposta:
+            return resposta.status, len(resposta.read())
+
+    return get, lambda: None
+
+
+def cliente_local():
+    from app import app
+    import referencia
+    import versoes
+
+    def get(rota):
+        # Um cliente por chamada: as threads do modo paralelo não compartilham estado
+        resposta = app.test_client().get(rota)
+        return resposta.status_code, len(resposta.data)
+
+    def esfriar():
+        referencia.invalidar()
+        versoes._carregado_em = 0.0
+
+    return get, esfriar
+
+
+def medir(funcao, esfriar, repeticoes):
+    tempos = []
+    for _ in range(repeticoes):
+        esfriar()
+        inicio = time.perf_counter()
+        funcao()
+        tempos.append(time.perf_counter() - inicio)
+    return statistics.median(tempos) * 1000, max(tempos) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--url", help="base de um servidor rodando (padrão: app no próprio processo)")
+    parser.add_argument("--repeticoes", type=int, default=20)
+    args = parser.parse_args()
+
+    get, esfriar = cliente_http(args.url) if args.url else cliente_local()
+    paralelo = ThreadPoolExecutor(max_workers=len(ROTAS_SEPARADAS))
+
+    for rota in ROTAS_SEPARADAS + [ROTA_HOME]:  # aquecimento (pool, conexões TLS)
+        status, _ = get(rota)
+        if status != 200:
+            print(f"Aviso: {rota} respondeu {status}")
+
+    modos = {
+        "5 rotas em sequência": lambda: [get(r) for r in ROTAS_SEPARADAS],
+        "5 rotas em paralelo": lambda: list(paralelo.map(get, ROTAS_SEPARADAS)),
+        "/dashboard/home": lambda: get(ROTA_HOME),
+    }
+    print(f"{'modo':<22} {'mediana ms':>11} {'máx ms':>9}")
+    for nome, funcao in modos.items():
+        mediana, maximo = medir(funcao, esfriar, args.repeticoes)
+        print(f"{nome:<22} {mediana:11.1f} {maximo:9.1f}")
+    paralelo.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+"""Microbenchmark da serialização de lançamentos para JSON.
+
+Gera N lançamentos sintéticos (padrão 100 mil; data, Decimal, texto) e
+compara, sem banco:
+- antes: DictRow → dict, data formatada linha a linha com strftime e
+  provider padrão do Flask (str, depois bytes);
+- depois: tuplas do cursor → `json_rapido.linhas_para_json` (orjson);
+- depois sem orjson: o mesmo caminho com a biblioteca padrão (fallback).
+Mostra o tempo mediano e o tamanho da saída.
+
+Uso (a partir de backend/):
+    python benchmarks/bench_json.py --linhas 100000 --repeticoes 5
+"""
+import argparse
+import datetime
+import importlib.util
+import os
+import random
+import statistics
+import sys
+import time
+from decimal import Decimal
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flask import Flask  # noqa: E402
+from flask.json.provider import DefaultJSONProvider  # noqa: E402
+from psycopg2.extras import DictRow  # noqa: E402
+import json_rapido  # noqa: E402
+
+COLUNAS = ["id_lancamento", "id_imovel", "data", "descricao", "valor",
+           "id_categoria", "nome_categoria", "id_situacao", "nome_situacao"]
+DESCRICOES = ["Pagamento pedreiro", "Material elétrico", "Conta de água", "IPTU parcela", "Cimento e areia"]
+
+
+class _CursorFalso:
+    # O mínimo que DictRow usa do cursor
+    description = [(c,) for c in COLUNAS]
+    index = {c: i for i, c in enumerate(COLUNAS)}
+
+
+def gerar(n):
+    inicio = datetime.date(2020, 1, 1)
+    linhas = []
+    for i in range(n):
+        linhas.append((
+            i, random.randint(1, 40), inicio + datetime.timedelta(days=random.randint(0, 2000)),
+            random.choice(DESCRICOES), Decimal(random.randint(100, 5_000_000)) / 100,
+            random.randint(1, 30), "Categoria", 1, "Efetivado",
+        ))
+    return linhas
+
+
+def como_dictrows(linhas):
+    cursor = _CursorFalso()
+    resultado = []
+    for linha in linhas:
+        row = DictRow(cursor)
+        row[:] = linha
+        resultado.append(row)
+    return resultado
+
+
+def antes(rows, provider):
+    lista = []
+    for row in rows:
+        linha = dict(row)
+        if linha.get("data"):
+            linha["data"] = linha["data"].strftime("%d/%m/%Y")
+        lista.append(linha)
+    return provider.dumps(lista, separators=(",", ":")).encode("utf-8")
+
+
+def medir(funcao, repeticoes):
+    tempos, saida = [], b""
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        saida = funcao()
+        tempos.append(time.perf_counter() - inicio)
+    return statistics.median(tempos) * 1000, len(saida)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--linhas", type=int, default=100_000)
+    parser.add_argument("--repeticoes", type=int, default=5)
+    args = parser.parse_args()
+
+    linhas = gerar(args.linhas)
+    rows = como_dictrows(linhas)
+    provider_padrao = DefaultJSONProvider(Flask(__name__))
+
+    modos = [
+        ("antes (DictRow + Flask)", lambda: antes(rows, provider_padrao)),
+        ("depois (tuplas + orjson)", lambda: json_rapido.linhas_para_json(COLUNAS, linhas)),
+    ]
+    if json_rapido.orjson is None:
+        modos[1] = ("depois (tuplas, sem orjson)", modos[1][1])
+    else:
+        # Segunda cópia do módulo, carregada sem orjson, para medir o fallback
+        sys.modules["orjson"] = None
+        spec = importlib.util.spec_from_file_location("json_rapido_padrao", json_rapido.__file__)
+        sem_orjson = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(sem_orjson)
+        modos.append(("depois (tuplas, sem orjson)", lambda: sem_orjson.linhas_para_json(COLUNAS, linhas)))
+
+    print(f"{'modo':<28} {'mediana ms':>11} {'MB':>7}")
+    for nome, funcao in modos:
+        mediana, tamanho = medir(funcao, args.repeticoes)
+        print(f"{nome:<28} {mediana:11.1f} {tamanho / 1e6:7.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+"""Benchmark das linhas das listas (lançamentos completos/incompletos,
+últimos lançamentos, resumo financeiro): memória e tempo por requisição.
+
+Parte de N linhas sintéticas em texto, como o Postgres as envia (padrão
+100 mil), e compara, sem banco:
+- antes: conversão padrão do driver (date, Decimal) → DictRow → dict por
+  linha → `strftime` da data → JSON;
+- depois: conversão de linhas.py (DD/MM/AAAA, float) → registro
+  `__slots__` (`linhas.montador`) → JSON.
+Mostra o tempo mediano até a lista pronta, o tempo com a serialização e o
+pico de memória da lista (tracemalloc).
+
+Uso (a partir de backend/):
+    python benchmarks/bench_linhas.py --linhas 100000 --repeticoes 5
+"""
+import argparse
+import datetime
+import os
+import random
+import statistics
+import sys
+import time
+import tracemalloc
+from decimal import Decimal
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from psycopg2.extras import DictRow  # noqa: E402
+import json_rapido  # noqa: E402
+import linhas  # noqa: E402
+
+COLUNAS = ["id_lancamento", "id_imovel", "data", "descricao", "valor",
+           "id_categoria", "nome_categoria", "id_situacao", "nome_situacao"]
+DESCRICOES = ["Pagamento pedreiro", "Material elétrico", "Conta de água", "IPTU parcela", "Cimento e areia"]
+
+
+class _CursorFalso:
+    # O mínimo que DictRow usa do cursor
+    description = [(c,) for c in COLUNAS]
+    index = {c: i for i, c in enumerate(COLUNAS)}
+
+
+def gerar(n):
+    # Como chegam do servidor: data e numeric em texto
+    inicio = datetime.date(2020, 1, 1)
+    return [
+        (i, random.randint(1, 40), (inicio + datetime.timedelta(days=random.randint(0, 2000))).isoformat(),
+         random.choice(DESCRICOES), f"{random.randint(100, 5_000_000) / 100:.2f}",
+         random.randint(1, 30), "Categoria", 1, "Efetivado")
+        for i in range(n)
+    ]
+
+
+def lista_antes(texto):
+    cursor = _CursorFalso()
+    lista = []
+    for t in texto:
+        row = DictRow(cursor)
+        row[:] = (t[0], t[1], datetime.date.fromisoformat(t[2]), t[3], Decimal(t[4]), t[5], t[6], t[7], t[8])
+        linha = dict(row)
+        if linha.get("data"):
+            linha["data"] = linha["data"].strftime("%d/%m/%Y")
+        lista.append(linha)
+    return lista
+
+
+def lista_depois(texto):
+    montar = linhas.montador(COLUNAS)
+    data, numero = linhas._data_br, linhas._numero
+    return [
+        montar((t[0], t[1], data(t[2], None), t[3], numero(t[4], None), t[5], t[6], t[7], t[8]))
+        for t in texto
+    ]
+
+
+def medir(funcao, repeticoes):
+    tempos = []
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        funcao()
+        tempos.append(time.perf_counter() - inicio)
+    return statistics.median(tempos) * 1000
+
+
+def pico_memoria(funcao):
+    tracemalloc.start()
+    resultado = funcao()
+    _, pico = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del resultado
+    return pico
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--linhas", type=int, default=100_000)
+    parser.add_argument("--repeticoes", type=int, default=5)
+    args = parser.parse_args()
+
+    texto = gerar(args.linhas)
+    modos = {"antes (DictRow + dict)": lista_antes, "depois (registros)": lista_depois}
+
+    print(f"{'modo':<24} {'lista ms':>9} {'+JSON ms':>9} {'pico MB':>8} {'B/linha':>8}")
+    for nome, montar in modos.items():
+        ms_lista = medir(lambda: montar(texto), args.repeticoes)
+        ms_json = medir(lambda: json_rapido.codificar(montar(texto)), args.repeticoes)
+        pico = pico_memoria(lambda: montar(texto))
+        print(f"{nome:<24} {ms_lista:9.1f} {ms_json:9.1f} {pico / 1e6:8.1f} {pico / args.linhas:8.0f}")
+
+
+if __name__ == "__main__":
+    main()
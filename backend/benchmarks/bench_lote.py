@@ -0,0 +1,100 @@
+"""Benchmark da gravação em lote de lançamentos.
+
+Compara o caminho antigo (um `cur.execute` por linha) com o INSERT
+multi-linha usado por `models.adicionar_lancamentos_em_lote`. Grava numa
+tabela temporária com as mesmas colunas de `lancamentos`, então não toca
+nos dados reais; usa o banco configurado no `.env`.
+
+Uso (a partir de backend/):
+    python benchmarks/bench_lote.py --linhas 2000 --repeticoes 3
+"""
+import argparse
+import os
+import sys
+import time
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from psycopg2 import extras  # noqa: E402
+from db_connection import conexao_isolada  # noqa: E402
+from models import LOTE_PAGINA  # noqa: E402
+
+TABELA = """
+    CREATE TEMP TABLE IF NOT EXISTS lancamentos_bench (
+        id bigserial PRIMARY KEY,
+        data date,
+        id_imovel integer,
+        id_categoria integer,
+        id_situacao integer,
+        descricao text,
+        valor numeric,
+        ativo boolean
+    )
+"""
+
+
+def gerar_linhas(n):
+    inicio = date(2024, 1, 1)
+    return [
+        (inicio + timedelta(days=i % 365), 1, 0, 1, f"Lançamento sintético {i}", round(10 + i * 0.37, 2), True)
+        for i in range(n)
+    ]
+
+
+def linha_a_linha(cur, linhas):
+    for linha in linhas:
+        cur.execute(
+            """
+            INSERT INTO lancamentos_bench (data, id_imovel, id_categoria, id_situacao, descricao, valor, ativo)
+            VALUES (%s, %s, %s, %s, %s, %s, %s)
+            RETURNING id
+            """,
+            linha,
+        )
+        cur.fetchone()
+
+
+def multi_linha(cur, linhas):
+    extras.execute_values(
+        cur,
+        """
+        INSERT INTO lancamentos_bench (data, id_imovel, id_categoria, id_situacao, descricao, valor, ativo)
+        VALUES %s
+        RETURNING id
+        """,
+        linhas,
+        page_size=LOTE_PAGINA,
+        fetch=True,
+    )
+
+
+def medir(nome, funcao, linhas, repeticoes):
+    tempos = []
+    with conexao_isolada() as (conn, cur):
+        cur.execute(TABELA)
+        for _ in range(repeticoes):
+            cur.execute("TRUNCATE lancamentos_bench")
+            inicio = time.perf_counter()
+            funcao(cur, linhas)
+            tempos.append(time.perf_counter() - inicio)
+        cur.execute("DROP TABLE lancamentos_bench")
+    melhor = min(tempos)
+    print(f"{nome:<14} {len(linhas):>7} linhas  melhor {melhor * 1000:9.1f} ms  {len(linhas) / melhor:10.0f} linhas/s")
+    return melhor
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--linhas", type=int, default=2000)
+    parser.add_argument("--repeticoes", type=int, default=3)
+    args = parser.parse_args()
+
+    linhas = gerar_linhas(args.linhas)
+    antigo = medir("linha a linha", linha_a_linha, linhas, args.repeticoes)
+    novo = medir("multi-linha", multi_linha, linhas, args.repeticoes)
+    print(f"ganho: {antigo / novo:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
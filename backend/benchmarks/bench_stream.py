@@ -0,0 +1,62 @@
+"""Benchmark de GET /lancamentos e /analise/lancamentos com e sem streaming.
+
+Chama a aplicação no próprio processo (cliente de teste do Flask, sem
+bufferizar a resposta) e mede, para cada modo: tempo até o primeiro byte,
+tempo total, bytes e pico de memória Python (tracemalloc). Usa o banco
+configurado no `.env`; /analise/lancamentos requer ENABLE_SQL_ENDPOINT=true.
+
+Uso (a partir de backend/):
+    python benchmarks/bench_stream.py --rota /lancamentos
+"""
+import argparse
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import app  # noqa: E402
+
+MODOS = [
+    ("jsonify", ""),
+    ("stream json", "?stream=json"),
+    ("stream ndjson", "?stream=ndjson"),
+]
+
+
+def medir(cliente, url):
+    tracemalloc.start()
+    inicio = time.perf_counter()
+    resposta = cliente.get(url, buffered=False)
+    primeiro_byte = None
+    total_bytes = 0
+    for pedaco in resposta.response:
+        if primeiro_byte is None:
+            primeiro_byte = time.perf_counter() - inicio
+        total_bytes += len(pedaco)
+    resposta.close()
+    total = time.perf_counter() - inicio
+    _, pico = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return resposta.status_code, primeiro_byte or total, total, total_bytes, pico
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rota", default="/lancamentos", choices=["/lancamentos", "/analise/lancamentos"])
+    args = parser.parse_args()
+
+    cliente = app.test_client()
+    cliente.get(args.rota + "?stream=json", buffered=True)  # aquecimento (pool, versões)
+    print(f"{'modo':<14} {'status':>6} {'1º byte ms':>11} {'total ms':>9} {'MB':>8} {'pico MB':>8}")
+    for nome, sufixo in MODOS:
+        status, ttfb, total, tamanho, pico = medir(cliente, args.rota + sufixo)
+        print(
+            f"{nome:<14} {status:>6} {ttfb * 1000:11.1f} {total * 1000:9.1f} "
+            f"{tamanho / 1e6:8.2f} {pico / 1e6:8.2f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+"""Cache LRU em memória com TTL, usado pelos caches do processo."""
+import threading
+import time
+from collections import OrderedDict
+from metricas import CACHE
+
+
+class CacheLRU:
+    """Cache LRU com expiração por TTL e limite de itens (e, opcionalmente,
+    de bytes: `set` recebe o tamanho estimado de cada valor).
+
+    Seguro para threads. `get` devolve `(True, valor)` ou `(False, None)`.
+    Com `nome`, acertos e faltas também vão para /metrics.
+    """
+
+    def __init__(self, max_itens=128, ttl=None, max_bytes=None, nome=None):
+        self.max_itens = max_itens
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self._itens = OrderedDict()  # chave -> (valor, expira_em, tamanho)
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.acertos = 0
+        self.faltas = 0
+        self.remocoes = 0
+        self.expiracoes = 0
+        self._metrica_acerto = CACHE.labels(nome, "acerto") if nome else None
+        self._metrica_falta = CACHE.labels(nome, "falta") if nome else None
+
+    def get(self, chave):
+        achou, valor = self._buscar(chave)
+        metrica = self._metrica_acerto if achou else self._metrica_falta
+        if metrica is not None:
+            metrica.inc()
+        return achou, valor
+
+    def _buscar(self, chave):
+        with self._lock:
+            item = self._itens.get(chave)
+            if item is None:
+                self.faltas += 1
+                return False, None
+            valor, expira_em, _ = item
+            if expira_em is not None and time.monotonic() >= expira_em:
+                self._remover(chave)
+                self.expiracoes += 1
+                self.faltas += 1
+                return False, None
+            self._itens.move_to_end(chave)
+            self.acertos += 1
+            return True, valor
+
+    def set(self, chave, valor, tamanho=0):
+        if self.max_bytes is not None and tamanho > self.max_bytes:
+            return False
+        expira_em = time.monotonic() + self.ttl if self.ttl else None
+        with self._lock:
+            if chave in self._itens:
+                self._remover(chave)
+            self._itens[chave] = (valor, expira_em, tamanho)
+            self._bytes += tamanho
+            while len(self._itens) > self.max_itens or (
+                self.max_bytes is not None and self._bytes > self.max_bytes
+            ):
+                antiga = next(iter(self._itens))
+                self._remover(antiga)
+                self.remocoes += 1
+        return True
+
+    def limpar(self):
+        with self._lock:
+            self._itens.clear()
+            self._bytes = 0
+
+    def _remover(self, chave):
+        _, _, tamanho = self._itens.pop(chave)
+        self._bytes -= tamanho
+
+    def estatisticas(self):
+        with self._lock:
+            consultas = self.acertos + self.faltas
+            return {
+                "itens": len(self._itens),
+                "bytes": self._bytes,
+                "acertos": self.acertos,
+                "faltas": self.faltas,
+                "taxa_acerto": round(self.acertos / consultas, 4) if consultas else 0.0,
+                "remocoes": self.remocoes,
+                "expiracoes": self.expiracoes,
+            }
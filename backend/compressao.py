@@ -0,0 +1,205 @@
+"""Compressão das respostas (middleware WSGI, `app.wsgi_app = Compressao(...)`).
+
+- Codificação negociada pelo Accept-Encoding: brotli (se o pacote estiver
+  instalado) ou gzip, respeitando `q=0`.
+- Só comprime os Content-Types de COMPRESSAO_NIVEIS, cada um com o seu
+  nível; respostas com Content-Length abaixo de COMPRESSAO_MIN_BYTES, 304,
+  já codificadas ou com `Cache-Control: no-transform` passam como estão.
+- Streaming (sem Content-Length: NDJSON, /sql, `?stream=json`) é comprimido
+  pedaço a pedaço com flush a cada pedaço, então o cliente continua
+  recebendo as linhas à medida que saem do cursor.
+- O ETag das rotas de leitura já é fraco (versoes.py), então continua
+  válido para o corpo comprimido; `Vary: Accept-Encoding` vai em toda
+  resposta de tipo comprimível.
+
+Bytes antes/depois e o tempo de CPU gasto ficam em `estatisticas()`
+(GET /healthz/stats, por worker) e nos contadores `compressao_*_total`
+por codificação (GET /metrics, somados entre workers).
+"""
+import threading
+import time
+import zlib
+from werkzeug.datastructures import Headers
+from werkzeug.http import parse_accept_header
+from config import COMPRESSAO_MIN_BYTES, COMPRESSAO_NIVEIS
+import metricas
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - depende do ambiente
+    brotli = None
+
+
+def _ler_niveis(texto):
+    # "application/json=6:5,..." → {"application/json": (6, 5)}
+    niveis = {}
+    for item in texto.split(","):
+        tipo, _, nivel = item.strip().partition("=")
+        if not tipo or not nivel:
+            continue
+        nivel_gzip, _, nivel_brotli = nivel.partition(":")
+        nivel_gzip = int(nivel_gzip)
+        niveis[tipo.strip().lower()] = (nivel_gzip, int(nivel_brotli) if nivel_brotli else min(nivel_gzip, 11))
+    return niveis
+
+
+def _tipo(headers):
+    return (headers.get("Content-Type") or "").split(";")[0].strip().lower()
+
+
+class _Gzip:
+    def __init__(self, nivel):
+        # wbits 31 = cabeçalho e trailer gzip
+        self._c = zlib.compressobj(nivel, zlib.DEFLATED, 31)
+
+    def comprimir(self, dados, flush):
+        saida = self._c.compress(dados)
+        return saida + self._c.flush(zlib.Z_SYNC_FLUSH) if flush else saida
+
+    def finalizar(self):
+        return self._c.flush(zlib.Z_FINISH)
+
+
+class _Brotli:
+    def __init__(self, nivel):
+        self._c = brotli.Compressor(quality=nivel)
+
+    def comprimir(self, dados, flush):
+        saida = self._c.process(dados)
+        return saida + self._c.flush() if flush else saida
+
+    def finalizar(self):
+        return self._c.finish()
+
+
+class _Metricas:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._respostas = {"br": 0, "gzip": 0}
+        self._ignoradas = 0
+        self._bytes_originais = 0
+        self._bytes_comprimidos = 0
+        self._cpu_seg = 0.0
+
+    def ignorada(self):
+        with self._lock:
+            self._ignoradas += 1
+
+    def registrar(self, codificacao, originais, comprimidos, cpu_seg):
+        with self._lock:
+            self._respostas[codificacao] += 1
+            self._bytes_originais += originais
+            self._bytes_comprimidos += comprimidos
+            self._cpu_seg += cpu_seg
+        metricas.COMPRESSAO_RESPOSTAS.labels(codificacao).inc()
+        metricas.COMPRESSAO_BYTES_ORIGINAIS.labels(codificacao).inc(originais)
+        metricas.COMPRESSAO_BYTES_COMPRIMIDOS.labels(codificacao).inc(comprimidos)
+        metricas.COMPRESSAO_CPU.labels(codificacao).inc(cpu_seg)
+
+    def estatisticas(self):
+        with self._lock:
+            return {
+                "brotli_disponivel": brotli is not None,
+                "respostas": dict(self._respostas),
+                "ignoradas": self._ignoradas,
+                "bytes_originais": self._bytes_originais,
+                "bytes_comprimidos": self._bytes_comprimidos,
+                "bytes_economizados": self._bytes_originais - self._bytes_comprimidos,
+                "cpu_ms": round(self._cpu_seg * 1000, 2),
+            }
+
+
+_metricas = _Metricas()
+
+
+def estatisticas():
+    return _metricas.estatisticas()
+
+
+class Compressao:
+    """Middleware WSGI; ver a docstring do módulo."""
+
+    def __init__(self, app, minimo=COMPRESSAO_MIN_BYTES, niveis=COMPRESSAO_NIVEIS):
+        self.app = app
+        self.minimo = minimo
+        self.niveis = _ler_niveis(niveis) if isinstance(niveis, str) else dict(niveis)
+
+    def _negociar(self, environ):
+        aceitos = parse_accept_header(environ.get("HTTP_ACCEPT_ENCODING", ""))
+        if brotli is not None and aceitos.quality("br") > 0:
+            return "br"
+        if aceitos.quality("gzip") > 0:
+            return "gzip"
+        return None
+
+    def _nivel(self, headers, status):
+        # Nível para esta resposta ou None se ela deve passar como está
+        niveis = self.niveis.get(_tipo(headers))
+        if niveis is None:
+            return None
+        codigo = int(status.split(" ", 1)[0])
+        if codigo < 200 or codigo in (204, 206, 304):
+            return None
+        if "Content-Encoding" in headers or "no-transform" in (headers.get("Cache-Control") or ""):
+            return None
+        tamanho = headers.get("Content-Length")
+        if tamanho is not None and int(tamanho) < self.minimo:
+            return None
+        return niveis
+
+    def __call__(self, environ, start_response):
+        codificacao = self._negociar(environ)
+        if environ.get("REQUEST_METHOD") == "HEAD":
+            codificacao = None
+        estado = {}
+
+        def iniciar(status, headers, exc_info=None):
+            headers = Headers(headers)
+            if _tipo(headers) in self.niveis:
+                # Mesmo sem comprimir: um cache não pode servir esta versão a quem aceita gzip
+                vary = headers.get("Vary")
+                if not vary:
+                    headers["Vary"] = "Accept-Encoding"
+                elif "accept-encoding" not in vary.lower():
+                    headers["Vary"] = vary + ", Accept-Encoding"
+            niveis = self._nivel(headers, status) if codificacao else None
+            if niveis is not None:
+                estado["streaming"] = "Content-Length" not in headers
+                if codificacao == "gzip":
+                    estado["compressor"] = _Gzip(niveis[0])
+                else:
+                    estado["compressor"] = _Brotli(niveis[1])
+                headers.remove("Content-Length")
+                headers["Content-Encoding"] = codificacao
+            return start_response(status, headers.to_wsgi_list(), exc_info)
+
+        corpo = self.app(environ, iniciar)
+        compressor = estado.get("compressor")
+        if compressor is None:
+            _metricas.ignorada()
+            return corpo
+        return self._comprimir(corpo, compressor, codificacao, estado["streaming"])
+
+    def _comprimir(self, corpo, compressor, codificacao, streaming):
+        originais = comprimidos = 0
+        cpu = 0.0
+        try:
+            for pedaco in corpo:
+                if not pedaco:
+                    continue
+                inicio = time.thread_time()
+                saida = compressor.comprimir(pedaco, flush=streaming)
+                cpu += time.thread_time() - inicio
+                originais += len(pedaco)
+                comprimidos += len(saida)
+                if saida:
+                    yield saida
+            inicio = time.thread_time()
+            saida = compressor.finalizar()
+            cpu += time.thread_time() - inicio
+            comprimidos += len(saida)
+            yield saida
+        finally:
+            if hasattr(corpo, "close"):
+                corpo.close()
+            _metricas.registrar(codificacao, originais, comprimidos, cpu)
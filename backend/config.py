@@ -54,3 +54,90 @@ RATE_LIMIT_GPT_WRITE = os.getenv("RATE_LIMIT_GPT_WRITE", "20/minute")
 # Search API (auxiliar para o agente)
 ENABLE_SEARCH_API = os.getenv("ENABLE_SEARCH_API", "true").lower() == "true"
 RATE_LIMIT_SEARCH = os.getenv("RATE_LIMIT_SEARCH", "60/minute")
+# Similaridade mínima (pg_trgm word_similarity, 0..1) para um nome entrar na busca
+SEARCH_SIMILARIDADE_MIN = float(os.getenv("SEARCH_SIMILARIDADE_MIN", "0.4"))
+
+# Pool de conexões com o banco (por worker do gunicorn)
+DB_POOL_MIN = int(os.getenv("DB_POOL_MIN", "1"))
+DB_POOL_MAX = int(os.getenv("DB_POOL_MAX", "5"))
+# Segundos aguardando uma conexão livre antes de falhar
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "10"))
+# Conexões ociosas há mais que isso passam por um SELECT 1 antes do uso (0 = sempre)
+DB_POOL_CHECK_IDLE_SEC = float(os.getenv("DB_POOL_CHECK_IDLE_SEC", "30"))
+# Conexões ociosas acima do mínimo são fechadas após esse tempo
+DB_POOL_MAX_IDLE_SEC = float(os.getenv("DB_POOL_MAX_IDLE_SEC", "300"))
+
+# Respostas compostas (GET /dashboard/home): threads por worker consultando
+# seções em paralelo (cada uma usa uma conexão do pool; manter < DB_POOL_MAX)
+SECOES_THREADS = int(os.getenv("SECOES_THREADS", "4"))
+SECOES_TIMEOUT_SEC = float(os.getenv("SECOES_TIMEOUT_SEC", "10"))
+
+# Caches em memória (referência, resultados do /sql): segundos que cada worker confia nas versões lidas (o ETag sempre lê do banco)
+VERSAO_CACHE_TTL_SEC = float(os.getenv("VERSAO_CACHE_TTL_SEC", "2"))
+
+# Cache de categorias/grupos/situações por worker
+REF_CACHE_TTL_SEC = float(os.getenv("REF_CACHE_TTL_SEC", "300"))
+REF_CACHE_MAX_ITENS = int(os.getenv("REF_CACHE_MAX_ITENS", "16"))
+
+# Idempotência do POST /gpt/lancamentos: "postgres" (compartilhado entre
+# workers) ou "memoria" (por processo, para testes/desenvolvimento)
+IDEM_BACKEND = os.getenv("IDEM_BACKEND", "postgres").lower()
+IDEM_TTL_SEC = int(os.getenv("IDEM_TTL_SEC", "3600"))
+IDEM_MAX_ITENS = int(os.getenv("IDEM_MAX_ITENS", "5000"))
+
+# Respostas em streaming (?stream=ndjson|json): linhas por lote do cursor no servidor
+STREAM_LOTE = int(os.getenv("STREAM_LOTE", "2000"))
+
+# POST /sql: limites por consulta (transação READ ONLY)
+SQL_STATEMENT_TIMEOUT_MS = int(os.getenv("SQL_STATEMENT_TIMEOUT_MS", "5000"))
+SQL_MAX_LINHAS = int(os.getenv("SQL_MAX_LINHAS", "5000"))
+
+# POST /sql: controle de admissão pelo plano estimado (EXPLAIN)
+# Acima de SQL_CUSTO_MAX (custo do planner) ou SQL_LINHAS_ESTIMADAS_MAX a consulta é rejeitada;
+# acima de SQL_CUSTO_FILA ela entra na fila de consultas pesadas (SQL_PESADAS_SIMULTANEAS por worker)
+SQL_CUSTO_MAX = float(os.getenv("SQL_CUSTO_MAX", "5000000"))
+SQL_LINHAS_ESTIMADAS_MAX = float(os.getenv("SQL_LINHAS_ESTIMADAS_MAX", "10000000"))
+SQL_CUSTO_FILA = float(os.getenv("SQL_CUSTO_FILA", "200000"))
+SQL_PESADAS_SIMULTANEAS = int(os.getenv("SQL_PESADAS_SIMULTANEAS", "1"))
+SQL_FILA_TIMEOUT_SEC = float(os.getenv("SQL_FILA_TIMEOUT_SEC", "10"))
+SQL_PLANO_CACHE_ITENS = int(os.getenv("SQL_PLANO_CACHE_ITENS", "256"))
+SQL_PLANO_CACHE_TTL_SEC = float(os.getenv("SQL_PLANO_CACHE_TTL_SEC", "600"))
+
+# POST /sql: cache de resultados por texto normalizado + versão global dos dados
+SQL_RESULTADO_CACHE_BYTES = int(os.getenv("SQL_RESULTADO_CACHE_BYTES", str(32 * 1024 * 1024)))
+SQL_RESULTADO_CACHE_ITEM_MAX_BYTES = int(os.getenv("SQL_RESULTADO_CACHE_ITEM_MAX_BYTES", str(2 * 1024 * 1024)))
+SQL_RESULTADO_CACHE_ITENS = int(os.getenv("SQL_RESULTADO_CACHE_ITENS", "1024"))
+SQL_RESULTADO_CACHE_TTL_SEC = float(os.getenv("SQL_RESULTADO_CACHE_TTL_SEC", "300"))
+
+# GET /sql/named/<nome>: cache de resultados por (consulta, parâmetros, versão global dos dados)
+SQL_NOMEADAS_CACHE_ITENS = int(os.getenv("SQL_NOMEADAS_CACHE_ITENS", "512"))
+SQL_NOMEADAS_CACHE_TTL_SEC = float(os.getenv("SQL_NOMEADAS_CACHE_TTL_SEC", "300"))
+# false = sem PREPARE/EXECUTE (pooler em modo transação, ex.: Supabase na porta 6543)
+SQL_NOMEADAS_PREPARADAS = os.getenv("SQL_NOMEADAS_PREPARADAS", "true").lower() == "true"
+
+# Compressão das respostas (gzip/brotli negociado pelo Accept-Encoding)
+COMPRESSAO_ATIVA = os.getenv("COMPRESSAO_ATIVA", "true").lower() == "true"
+# Respostas com Content-Length abaixo disso saem sem compressão (streaming é sempre comprimido)
+COMPRESSAO_MIN_BYTES = int(os.getenv("COMPRESSAO_MIN_BYTES", "1024"))
+# Nível por Content-Type, "tipo=gzip:brotli" (gzip 1-9, brotli 0-11); outros tipos não são comprimidos
+COMPRESSAO_NIVEIS = os.getenv(
+    "COMPRESSAO_NIVEIS",
+    "application/json=6:5,application/x-ndjson=1:1,text/csv=6:5,text/plain=6:5,text/html=6:5",
+)
+
+# GET /metrics (Prometheus): se definido, exige "Authorization: Bearer <METRICAS_TOKEN>"
+METRICAS_TOKEN = os.getenv("METRICAS_TOKEN", "")
+
+# Instrumentação das consultas: log acima de SQL_LENTA_MS; mesmo texto repetido
+# SQL_N_MAIS_1_MIN vezes numa requisição = possível N+1; header Server-Timing
+SQL_LENTA_MS = float(os.getenv("SQL_LENTA_MS", "200"))
+SQL_N_MAIS_1_MIN = int(os.getenv("SQL_N_MAIS_1_MIN", "5"))
+SERVER_TIMING_ATIVO = os.getenv("SERVER_TIMING_ATIVO", "true").lower() == "true"
+
+# Auditoria (auditoria.py): saída "stdout", "arquivo" (AUDITORIA_ARQUIVO) ou "postgres" (tabela auditoria)
+AUDITORIA_SAIDA = os.getenv("AUDITORIA_SAIDA", "stdout").lower()
+AUDITORIA_ARQUIVO = os.getenv("AUDITORIA_ARQUIVO", "auditoria.log")
+# Eventos na fila por worker (acima disso são descartados) e tamanho/intervalo dos lotes gravados
+AUDITORIA_FILA_MAX = int(os.getenv("AUDITORIA_FILA_MAX", "10000"))
+AUDITORIA_LOTE = int(os.getenv("AUDITORIA_LOTE", "200"))
+AUDITORIA_INTERVALO_SEC = float(os.getenv("AUDITORIA_INTERVALO_SEC", "1"))
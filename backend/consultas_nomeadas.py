@@ -0,0 +1,313 @@
+"""Catálogo de consultas nomeadas do GET /sql/named/<nome>.
+
+Alternativa ao SQL livre do POST /sql para as perguntas mais comuns do
+agente: cada entrada tem texto fixo e parâmetros tipados e validados, então
+não há SQL gerado pelo modelo nem controle de custo a fazer.
+
+Cada consulta vira um prepared statement no servidor (`PREPARE cn_<nome>`)
+na primeira vez que roda numa conexão do pool; as execuções seguintes
+naquela conexão só mandam `EXECUTE` com os valores. O registro de quais
+conexões já prepararam o quê fica num WeakKeyDictionary: conexões
+descartadas pelo pool somem dele sozinhas.
+
+Atrás de um pooler em modo transação (Supabase na porta 6543) a sessão do
+servidor muda entre transações, então esse registro pode mentir nos dois
+sentidos: `EXECUTE` de um statement que a sessão não tem
+(InvalidSqlStatementName) prepara de novo e tenta uma vez mais; `PREPARE`
+de um que ela já tem (DuplicatePreparedStatement) conta como preparado.
+Cada tentativa roda sob um SAVEPOINT, para o erro não abortar a transação.
+Se ainda assim falhar, ou com SQL_NOMEADAS_PREPARADAS=false, a consulta
+roda como SQL parametrizado comum.
+
+Resultados ficam num cache LRU por worker com chave (nome, valores dos
+parâmetros, versão global dos dados), como o cache de resultados do
+POST /sql. Datas saem como texto AAAA-MM-DD e valores como número.
+"""
+import re
+import threading
+import time
+import weakref
+from datetime import date
+from functools import lru_cache
+from psycopg2 import errors
+from cache import CacheLRU
+from config import (
+    SQL_STATEMENT_TIMEOUT_MS,
+    SQL_NOMEADAS_CACHE_ITENS,
+    SQL_NOMEADAS_CACHE_TTL_SEC,
+    SQL_NOMEADAS_PREPARADAS,
+)
+from db_connection import conexao_isolada
+from models import converter_data
+from versoes import versoes_atuais, GLOBAL
+
+
+# ======================================================
+# 🔹 Catálogo
+# ======================================================
+
+# Parâmetros: nome (na query string), tipo (date|integer), descrição e,
+# opcionalmente, padrao/minimo/maximo. Sem valor e sem padrão → NULL,
+# que nas consultas significa "sem filtro".
+CATALOGO = {
+    "gastos_por_categoria": {
+        "descricao": "Total desembolsado (lançamentos confirmados) por categoria no período, do maior para o menor.",
+        "parametros": [
+            {"nome": "from", "tipo": "date", "descricao": "data inicial (AAAA-MM-DD ou DD/MM/AAAA)"},
+            {"nome": "to", "tipo": "date", "descricao": "data final (AAAA-MM-DD ou DD/MM/AAAA)"},
+            {"nome": "id_imovel", "tipo": "integer", "descricao": "restringe a um imóvel"},
+        ],
+        "sql": """
+            SELECT c.id AS id_categoria, c.categoria, g.grupo,
+                   COUNT(*) AS lancamentos, SUM(l.valor)::float8 AS total
+            FROM lancamentos l
+            JOIN categorias c ON c.id = l.id_categoria
+            LEFT JOIN grupos g ON g.id = c.id_grupo
+            WHERE l.id_situacao = 1
+              AND (l.ativo IS DISTINCT FROM FALSE)
+              AND ($1 IS NULL OR l.data >= $1)
+              AND ($2 IS NULL OR l.data <= $2)
+              AND ($3 IS NULL OR l.id_imovel = $3)
+            GROUP BY c.id, c.categoria, g.grupo
+            ORDER BY total DESC, c.categoria
+        """,
+    },
+    "gastos_mensais_por_imovel": {
+        "descricao": "Total desembolsado (lançamentos confirmados) por imóvel e mês no período.",
+        "parametros": [
+            {"nome": "from", "tipo": "date", "descricao": "data inicial (AAAA-MM-DD ou DD/MM/AAAA)"},
+            {"nome": "to", "tipo": "date", "descricao": "data final (AAAA-MM-DD ou DD/MM/AAAA)"},
+            {"nome": "id_imovel", "tipo": "integer", "descricao": "restringe a um imóvel"},
+        ],
+        "sql": """
+            SELECT TO_CHAR(DATE_TRUNC('month', l.data), 'YYYY-MM-DD') AS mes,
+                   i.id AS id_imovel, i.nome AS nome_imovel,
+                   SUM(l.valor)::float8 AS total
+            FROM lancamentos l
+            JOIN imoveis i ON i.id = l.id_imovel
+            WHERE l.id_situacao = 1
+              AND (l.ativo IS DISTINCT FROM FALSE)
+              AND ($1 IS NULL OR l.data >= $1)
+              AND ($2 IS NULL OR l.data <= $2)
+              AND ($3 IS NULL OR l.id_imovel = $3)
+            GROUP BY 1, i.id, i.nome
+            ORDER BY mes, i.nome
+        """,
+    },
+    "orcamento_vs_execucao": {
+        "descricao": "Orçamento x executado por grupo (vw_orcamento_execucao), com saldo e percentual executado.",
+        "parametros": [
+            {"nome": "id_imovel", "tipo": "integer", "descricao": "restringe a um imóvel"},
+        ],
+        "sql": """
+            SELECT v.id_imovel, i.nome AS nome_imovel, v.id_grupo, v.grupo,
+                   COALESCE(v.orcamento, 0)::float8 AS orcamento,
+                   COALESCE(v.valor_efetivado, 0)::float8 AS valor_efetivado,
+                   COALESCE(v.valor_em_contratacao, 0)::float8 AS valor_em_contratacao,
+                   COALESCE(v.valor_total, 0)::float8 AS valor_total,
+                   (COALESCE(v.orcamento, 0) - COALESCE(v.valor_total, 0))::float8 AS saldo,
+                   CASE WHEN v.orcamento > 0
+                        THEN ROUND(100 * COALESCE(v.valor_total, 0)::numeric / v.orcamento::numeric, 1)::float8
+                   END AS percentual_executado
+            FROM vw_orcamento_execucao v
+            JOIN imoveis i ON i.id = v.id_imovel
+            WHERE ($1 IS NULL OR v.id_imovel = $1)
+            ORDER BY i.nome, v.id_grupo
+        """,
+    },
+    "ultimos_lancamentos": {
+        "descricao": "Lançamentos mais recentes (por data), com nome do imóvel e da categoria.",
+        "parametros": [
+            {"nome": "id_imovel", "tipo": "integer", "descricao": "restringe a um imóvel"},
+            {"nome": "id_situacao", "tipo": "integer", "descricao": "restringe a uma situação (1 = confirmado)"},
+            {"nome": "limit", "tipo": "integer", "padrao": 20, "minimo": 1, "maximo": 200,
+             "descricao": "quantidade de lançamentos"},
+        ],
+        "sql": """
+            SELECT l.id, TO_CHAR(l.data, 'YYYY-MM-DD') AS data,
+                   l.id_imovel, i.nome AS nome_imovel,
+                   l.id_categoria, c.categoria, l.id_situacao,
+                   l.descricao, l.valor::float8 AS valor
+            FROM lancamentos l
+            LEFT JOIN imoveis i ON i.id = l.id_imovel
+            LEFT JOIN categorias c ON c.id = l.id_categoria
+            WHERE ($1 IS NULL OR l.id_imovel = $1)
+              AND ($2 IS NULL OR l.id_situacao = $2)
+            ORDER BY l.data DESC NULLS LAST, l.id DESC
+            LIMIT $3
+        """,
+    },
+}
+
+
+class ParametroInvalido(ValueError):
+    """Parâmetro desconhecido, com tipo errado ou fora dos limites (400)."""
+
+
+_resultados = CacheLRU(max_itens=SQL_NOMEADAS_CACHE_ITENS, ttl=SQL_NOMEADAS_CACHE_TTL_SEC, nome="consultas_nomeadas")
+
+# conexão -> nomes já preparados nela
+_preparadas = weakref.WeakKeyDictionary()
+_preparadas_lock = threading.Lock()
+
+
+# ======================================================
+# 🔹 Validação de parâmetros
+# ======================================================
+
+def _converter(spec, texto):
+    if spec["tipo"] == "date":
+        try:
+            return date.fromisoformat(converter_data(texto))
+        except Exception:
+            raise ParametroInvalido(f"{spec['nome']}: data inválida (use DD/MM/AAAA ou AAAA-MM-DD)")
+    try:
+        valor = int(texto)
+    except ValueError:
+        raise ParametroInvalido(f"{spec['nome']}: inteiro esperado")
+    if "minimo" in spec and valor < spec["minimo"]:
+        raise ParametroInvalido(f"{spec['nome']}: mínimo {spec['minimo']}")
+    if "maximo" in spec and valor > spec["maximo"]:
+        raise ParametroInvalido(f"{spec['nome']}: máximo {spec['maximo']}")
+    return valor
+
+
+def validar_parametros(nome, args):
+    """Valores dos parâmetros de `nome`, na ordem do catálogo, a partir de
+    um dict de strings (query string). ParametroInvalido se algo não bate."""
+    specs = CATALOGO[nome]["parametros"]
+    conhecidos = {s["nome"] for s in specs}
+    desconhecidos = sorted(set(args) - conhecidos)
+    if desconhecidos:
+        raise ParametroInvalido(
+            f"Parâmetro(s) desconhecido(s): {', '.join(desconhecidos)} "
+            f"(aceitos: {', '.join(s['nome'] for s in specs) or 'nenhum'})"
+        )
+    valores = []
+    for spec in specs:
+        texto = str(args.get(spec["nome"], "")).strip()
+        valores.append(_converter(spec, texto) if texto else spec.get("padrao"))
+    return tuple(valores)
+
+
+def descrever_catalogo():
+    """Catálogo sem o SQL, para GET /sql/named."""
+    return [
+        {
+            "nome": nome,
+            "descricao": entrada["descricao"],
+            "parametros": [dict(spec) for spec in entrada["parametros"]],
+        }
+        for nome, entrada in CATALOGO.items()
+    ]
+
+
+# ======================================================
+# 🔹 Execução (prepared statements por conexão)
+# ======================================================
+
+_MARCADOR = re.compile(r"\$(\d+)")
+
+
+def _sob_savepoint(conn, cur, sql, params=None):
+    # Um erro aqui desfaz só o savepoint; a transação continua utilizável.
+    # O controle do savepoint vai num cursor à parte: um execute em `cur`
+    # depois do comando trocaria o resultado (description) que vamos ler.
+    with conn.cursor() as controle:
+        controle.execute("SAVEPOINT consulta_nomeada")
+        try:
+            cur.execute(sql, params)
+        except Exception:
+            controle.execute("ROLLBACK TO SAVEPOINT consulta_nomeada")
+            raise
+        controle.execute("RELEASE SAVEPOINT consulta_nomeada")
+
+
+def _preparar(conn, cur, nome):
+    with _preparadas_lock:
+        nomes = _preparadas.get(conn)
+        if nomes is None:
+            nomes = _preparadas[conn] = set()
+        if nome in nomes:
+            return
+    entrada = CATALOGO[nome]
+    tipos = ", ".join(spec["tipo"] for spec in entrada["parametros"])
+    assinatura = f"cn_{nome}({tipos})" if tipos else f"cn_{nome}"
+    # PREPARE vale para a sessão inteira, mesmo que a transação seja desfeita
+    try:
+        _sob_savepoint(conn, cur, f"PREPARE {assinatura} AS {entrada['sql']}")
+    except errors.DuplicatePreparedStatement:
+        pass  # a sessão (de outro cliente do pooler) já tem: mesmo texto, mesmo nome
+    with _preparadas_lock:
+        nomes.add(nome)
+
+
+def _esquecer(conn):
+    with _preparadas_lock:
+        _preparadas.pop(conn, None)
+
+
+def _executar_preparada(conn, cur, nome, valores):
+    marcadores = ", ".join(["%s"] * len(valores))
+    comando = f"EXECUTE cn_{nome}({marcadores})" if valores else f"EXECUTE cn_{nome}"
+    for tentativa in range(2):
+        _preparar(conn, cur, nome)
+        try:
+            _sob_savepoint(conn, cur, comando, valores or None)
+            return
+        except errors.InvalidSqlStatementName:
+            # Sessão perdeu os prepared statements (DISCARD ALL, troca de backend no pooler)
+            _esquecer(conn)
+            if tentativa:
+                raise
+
+
+@lru_cache(maxsize=None)
+def _sql_parametrizado(nome):
+    # $n → %(pn)s::tipo, com os mesmos tipos que o PREPARE declararia
+    specs = CATALOGO[nome]["parametros"]
+    return _MARCADOR.sub(
+        lambda m: f"%(p{m.group(1)})s::{specs[int(m.group(1)) - 1]['tipo']}",
+        CATALOGO[nome]["sql"].replace("%", "%%"),
+    )
+
+
+def _executar_parametrizada(cur, nome, valores):
+    cur.execute(_sql_parametrizado(nome), {f"p{i}": v for i, v in enumerate(valores, 1)})
+
+
+def executar(nome, valores):
+    """Resultado de `nome` com `valores` (já validados):
+    `{colunas, linhas, total, tempo_ms, cache}`."""
+    chave = (nome, valores, versoes_atuais().get(GLOBAL, 0))
+    achou, guardado = _resultados.get(chave)
+    if achou:
+        return {**guardado, "cache": True}
+
+    inicio = time.perf_counter()
+    with conexao_isolada(cursor_factory=None) as (conn, cur):
+        cur.execute("SET TRANSACTION READ ONLY")
+        cur.execute("SELECT set_config('statement_timeout', %s, true)", (str(SQL_STATEMENT_TIMEOUT_MS),))
+        if not SQL_NOMEADAS_PREPARADAS:
+            _executar_parametrizada(cur, nome, valores)
+        else:
+            try:
+                _executar_preparada(conn, cur, nome, valores)
+            except (errors.InvalidSqlStatementName, errors.DuplicatePreparedStatement):
+                # Prepared statements não se sustentam nesta conexão: SQL comum
+                _executar_parametrizada(cur, nome, valores)
+        colunas = [c[0] for c in cur.description]
+        linhas = [dict(zip(colunas, linha)) for linha in cur.fetchall()]
+
+    resultado = {
+        "colunas": colunas,
+        "linhas": linhas,
+        "total": len(linhas),
+        "tempo_ms": round((time.perf_counter() - inicio) * 1000, 2),
+    }
+    _resultados.set(chave, resultado)
+    return {**resultado, "cache": False}
+
+
+def estatisticas():
+    return _resultados.estatisticas()
@@ -1,43 +1,103 @@
+import time
 from flask import request, jsonify
+from datetime import date
 from flask_cors import cross_origin
 from . import dashboard_bp
 from config import ALLOWED_ORIGINS_LIST, RATE_LIMIT_EDIT
 from security import requires_editor_token
 from ratelimit import limiter
+from versoes import com_etag, etag_para, resposta_304, marcar_etag, escopos_imovel, GLOBAL, REFERENCIA
+from secoes import executar_secoes
 from models import (
+    listar_imoveis,
+    listar_categorias,
     listar_lancamentos_incompletos_view,
     listar_lancamentos_completos_view,
     adicionar_lancamentos_em_lote,
     obter_data_ultima_atualizacao,
     listar_ultimos_lancamentos_confirmados,
     listar_totais_mensais_por_imovel,
+    converter_data,
 )
 
+# ==========================================================
+# 🔹 Filtros e paginação das listas de lançamentos
+# ==========================================================
+LIMITE_PAGINA_MAX = 500
+
+
+def _filtros_lista():
+    """Lê `from`, `to`, `id_categoria` (lista separada por vírgula), `limit`
+    e `cursor` da query string. Retorna `(filtros, paginado)`; lança
+    ValueError com a mensagem para o cliente se algum for inválido."""
+    filtros = {}
+    for nome, chave in (('from', 'de'), ('to', 'ate')):
+        valor = request.args.get(nome, '').strip()
+        if valor:
+            try:
+                filtros[chave] = date.fromisoformat(converter_data(valor))
+            except Exception:
+                raise ValueError(f"Data inválida em '{nome}' (use DD/MM/AAAA ou YYYY-MM-DD)")
+    categorias_raw = request.args.get('id_categoria', '').strip()
+    if categorias_raw:
+        try:
+            filtros['categorias'] = [int(p) for p in categorias_raw.split(',') if p.strip()]
+        except ValueError:
+            raise ValueError("id_categoria deve ser uma lista de inteiros")
+
+    cursor_raw = request.args.get('cursor', '').strip()
+    limit_raw = request.args.get('limit', '').strip()
+    paginado = bool(cursor_raw or limit_raw)
+    if paginado:
+        try:
+            limite = int(limit_raw) if limit_raw else 100
+        except ValueError:
+            raise ValueError("limit deve ser inteiro")
+        filtros['limite'] = min(max(limite, 1), LIMITE_PAGINA_MAX)
+    if cursor_raw:
+        data_cursor, _, id_cursor = cursor_raw.rpartition('_')
+        try:
+            if data_cursor == 'null':
+                data_cursor = None
+            else:
+                date.fromisoformat(data_cursor)
+            filtros['cursor'] = (data_cursor, int(id_cursor))
+        except ValueError:
+            raise ValueError("cursor inválido")
+    return filtros, paginado
+
+
+def _responder_lista(listar, id_imovel, rotulo):
+    try:
+        filtros, paginado = _filtros_lista()
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    try:
+        if paginado:
+            itens, proximo_cursor = listar(id_imovel, **filtros)
+            return jsonify({"itens": itens, "proximo_cursor": proximo_cursor}), 200
+        return jsonify(listar(id_imovel, **filtros)), 200
+    except Exception as e:
+        print(f"Erro ao listar {rotulo}: {e}")
+        return jsonify({"error": f"Erro ao buscar lançamentos {rotulo}"}), 500
+
 # ==========================================================
 # 🔹 Lista de lançamentos incompletos para um imóvel
 # ==========================================================
 @dashboard_bp.route('/dashboard/lancamentos/incompletos/<int:id_imovel>', methods=['GET'])
 @cross_origin(origins=ALLOWED_ORIGINS_LIST or '*')
+@com_etag([GLOBAL])
 def get_lancamentos_incompletos(id_imovel):
-    try:
-        resultados = listar_lancamentos_incompletos_view(id_imovel)
-        return jsonify(resultados), 200
-    except Exception as e:
-        print(f"Erro ao listar incompletos: {e}")
-        return jsonify({"error": "Erro ao buscar lançamentos incompletos"}), 500
+    return _responder_lista(listar_lancamentos_incompletos_view, id_imovel, "incompletos")
 
 # ==========================================================
 # 🔹 Lista de lançamentos completos para um imóvel
 # ==========================================================
 @dashboard_bp.route('/dashboard/lancamentos/completos/<int:id_imovel>', methods=['GET'])
 @cross_origin(origins=ALLOWED_ORIGINS_LIST or '*')
+@com_etag(escopos_imovel)
 def get_lancamentos_completos(id_imovel):
-    try:
-        resultados = listar_lancamentos_completos_view(id_imovel)
-        return jsonify(resultados), 200
-    except Exception as e:
-        print(f"Erro ao listar completos: {e}")
-        return jsonify({"error": "Erro ao buscar lançamentos completos"}), 500
+    return _responder_lista(listar_lancamentos_completos_view, id_imovel, "completos")
 
 # ==========================================================
 # 🔹 Adicionar lançamentos em lote
@@ -52,22 +112,31 @@ def adicionar_lote_lancamentos():
     if not novos or not isinstance(novos, list):
         return jsonify({"error": "Nenhum lançamento recebido ou formato incorreto!"}), 400
 
+    # modo=tudo (padrão): qualquer linha inválida cancela o lote
+    # modo=parcial: grava as válidas e devolve as rejeitadas
+    modo = request.args.get('modo', 'tudo').strip().lower()
+    if modo not in ('tudo', 'parcial'):
+        return jsonify({"error": "modo deve ser 'tudo' ou 'parcial'"}), 400
+
     try:
-        resultado = adicionar_lancamentos_em_lote(novos)
-        return jsonify({
-            "message": "Lançamentos adicionados com sucesso!",
-            "total": resultado
-        }), 201
-    except ValueError as e:
-        # Erros de validação (ex.: data inválida)
-        return jsonify({
-            "error": "Dados inválidos no lote. Verifique as datas (use DD/MM/AAAA ou YYYY-MM-DD).",
-            "details": str(e)
-        }), 400
+        resultado = adicionar_lancamentos_em_lote(novos, tudo_ou_nada=(modo == 'tudo'))
     except Exception as e:
         print(f"Erro ao adicionar lançamentos em lote: {e}")
         return jsonify({"error": "Erro ao adicionar lançamentos"}), 500
 
+    if not resultado["inseridos"]:
+        return jsonify({
+            "error": "Dados inválidos no lote. Nenhum lançamento foi gravado.",
+            "erros": resultado["erros"],
+        }), 400
+
+    return jsonify({
+        "message": "Lançamentos adicionados com sucesso!",
+        "total": resultado["inseridos"],
+        "ids": resultado["ids"],
+        "erros": resultado["erros"],
+    }), 201
+
 # ==========================================================
 # 🔹 Excluir lançamento (completo ou incompleto)
 # ==========================================================
@@ -127,6 +196,7 @@ def alterar_lancamento_incompleto(id_lancamento):
 # ==========================================================
 @dashboard_bp.route('/dashboard/ultima_atualizacao', methods=['GET'])
 @cross_origin(origins=ALLOWED_ORIGINS_LIST or '*')
+@com_etag([GLOBAL])
 def get_ultima_atualizacao():
     try:
         data_str = obter_data_ultima_atualizacao()
@@ -138,6 +208,7 @@ def get_ultima_atualizacao():
 
 @dashboard_bp.route('/dashboard/ultimos_lancamentos', methods=['GET'])
 @cross_origin(origins=ALLOWED_ORIGINS_LIST or '*')
+@com_etag([GLOBAL])
 def get_ultimos_lancamentos():
     try:
         limit = request.args.get('limit', 10)
@@ -150,24 +221,73 @@ def get_ultimos_lancamentos():
 
 @dashboard_bp.route('/dashboard/gastos-mensais', methods=['GET'])
 @cross_origin(origins=ALLOWED_ORIGINS_LIST or '*')
+@com_etag([GLOBAL])
 def get_gastos_mensais():
     try:
         meses = request.args.get('meses', 6)
-        excluir_raw = request.args.get('excluir', '').strip()
-        categorias_excluidas = None
-        if excluir_raw:
-            categorias_excluidas = []
-            for parte in excluir_raw.split(','):
-                parte = parte.strip()
-                if not parte:
-                    continue
-                try:
-                    categorias_excluidas.append(int(parte))
-                except Exception:
-                    continue
-
-        dados = listar_totais_mensais_por_imovel(meses, categorias_excluidas)
+        dados = listar_totais_mensais_por_imovel(meses, _categorias_excluidas())
         return jsonify(dados), 200
     except Exception as e:
         print(f"Erro ao listar gastos mensais: {e}")
         return jsonify({"error": "Erro ao listar gastos mensais"}), 500
+
+
+def _categorias_excluidas():
+    """Lista de IDs de `?excluir=` (ignora itens inválidos) ou None se o
+    parâmetro não veio (usa o padrão do model)."""
+    excluir_raw = request.args.get('excluir', '').strip()
+    if not excluir_raw:
+        return None
+    categorias_excluidas = []
+    for parte in excluir_raw.split(','):
+        parte = parte.strip()
+        if not parte:
+            continue
+        try:
+            categorias_excluidas.append(int(parte))
+        except Exception:
+            continue
+    return categorias_excluidas
+
+
+# ==========================================================
+# 🔹 Home: todos os widgets num único documento
+# ==========================================================
+@dashboard_bp.route('/dashboard/home', methods=['GET'])
+@cross_origin(origins=ALLOWED_ORIGINS_LIST or '*')
+def get_home():
+    """Imóveis, categorias, data de atualização, últimos lançamentos e
+    gastos mensais (mesmos parâmetros de /dashboard/gastos-mensais e
+    /dashboard/ultimos_lancamentos), consultados em paralelo.
+
+    `secoes` traz `ok`/`tempo_ms` (e `erro`) por seção; uma seção com falha
+    vem como null e as demais saem normalmente. O ETag só é enviado quando
+    todas as seções deram certo.
+    """
+    tag = etag_para([GLOBAL, REFERENCIA])
+    nao_modificado = resposta_304(tag)
+    if nao_modificado:
+        return nao_modificado
+
+    meses = request.args.get('meses', 6)
+    limit = request.args.get('limit', 10)
+    excluidas = _categorias_excluidas()
+    inicio = time.perf_counter()
+    dados, secoes = executar_secoes({
+        'imoveis': listar_imoveis,
+        'categorias': listar_categorias,
+        'ultima_atualizacao': obter_data_ultima_atualizacao,
+        'ultimos_lancamentos': lambda: listar_ultimos_lancamentos_confirmados(limit),
+        'gastos_mensais': lambda: listar_totais_mensais_por_imovel(meses, excluidas),
+    })
+    if not any(secao['ok'] for secao in secoes.values()):
+        return jsonify({"error": "Erro ao carregar a home", "secoes": secoes}), 500
+
+    resposta = jsonify({
+        **dados,
+        'secoes': secoes,
+        'tempo_total_ms': round((time.perf_counter() - inicio) * 1000, 2),
+    })
+    if all(secao['ok'] for secao in secoes.values()):
+        marcar_etag(resposta, tag)
+    return resposta
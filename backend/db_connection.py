@@ -1,19 +1,498 @@
 import psycopg2
-from psycopg2 import extras
+from psycopg2 import extras, extensions
 import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
 from dotenv import load_dotenv
+from flask import g, has_request_context
+import metricas
+import instrumentacao
+from config import (
+    DB_POOL_MIN,
+    DB_POOL_MAX,
+    DB_POOL_TIMEOUT,
+    DB_POOL_CHECK_IDLE_SEC,
+    DB_POOL_MAX_IDLE_SEC,
+)
 
 # Carregar variáveis do arquivo .env
 load_dotenv()
 
-def conectar():
-    """Estabelece conexão com o banco de dados PostgreSQL"""
-    conn = psycopg2.connect(
+
+class PoolEsgotado(Exception):
+    """Nenhuma conexão ficou livre dentro de DB_POOL_TIMEOUT."""
+
+
+_cursores_medidos = {}
+
+
+def _cursor_medido(fabrica):
+    """Subclasse de `fabrica` que passa cada execute por
+    instrumentacao.registrar_consulta (texto, duração, linhas). Em cursores
+    nomeados o execute só declara o cursor; o tempo das leituras em lote
+    não entra."""
+    tipo = _cursores_medidos.get(fabrica)
+    if tipo is not None:
+        return tipo
+
+    class CursorMedido(fabrica):
+        def execute(self, query, vars=None):
+            inicio = time.perf_counter()
+            try:
+                return super().execute(query, vars)
+            finally:
+                instrumentacao.registrar_consulta(self, query, vars, time.perf_counter() - inicio)
+
+        def executemany(self, query, vars_list):
+            inicio = time.perf_counter()
+            try:
+                return super().executemany(query, vars_list)
+            finally:
+                instrumentacao.registrar_consulta(
+                    self, query, vars_list, time.perf_counter() - inicio, lote=True
+                )
+
+    CursorMedido.__name__ = f"{fabrica.__name__}Medido"
+    return _cursores_medidos.setdefault(fabrica, CursorMedido)
+
+
+class _ConexaoMedida(extensions.connection):
+    """Conexão cujos cursores (de qualquer fábrica) são instrumentados e que
+    roda funções registradas em `apos_commit` depois de cada commit."""
+
+    _pendentes = ()
+
+    def cursor(self, *args, **kwargs):
+        fabrica = kwargs.get("cursor_factory") or self.cursor_factory or extensions.cursor
+        kwargs["cursor_factory"] = _cursor_medido(fabrica)
+        return super().cursor(*args, **kwargs)
+
+    def apos_commit(self, funcao):
+        """Agenda `funcao(conn)` para depois do commit da transação atual
+        (descartada se ela for desfeita). Mesma função agendada duas vezes
+        roda uma vez só."""
+        if funcao not in self._pendentes:
+            self._pendentes = (*self._pendentes, funcao)
+
+    def commit(self):
+        super().commit()
+        pendentes, self._pendentes = self._pendentes, ()
+        for funcao in pendentes:
+            funcao(self)
+
+    def rollback(self):
+        self._pendentes = ()
+        super().rollback()
+
+
+def _nova_conexao():
+    """Abre uma conexão física com o banco de dados PostgreSQL"""
+    return psycopg2.connect(
+        connection_factory=_ConexaoMedida,
         host=os.getenv("DB_HOST"),
         database=os.getenv("DB_NAME"),
         user=os.getenv("DB_USER"),
         password=os.getenv("DB_PASSWORD"),
         port=os.getenv("DB_PORT", "5432")  # Usa 5432 como padrão se não estiver no .env
     )
+
+
+class PoolConexoes:
+    """Pool de conexões por processo (cada worker do gunicorn tem o seu).
+
+    Conexões ociosas ficam numa pilha (LIFO) para reaproveitar as mais
+    "quentes"; quando o pool está cheio, quem pede espera até `timeout`.
+    Na retirada, conexões paradas há mais de `verificar_apos` segundos
+    passam por um `SELECT 1` antes de serem entregues.
+    """
+
+    def __init__(self, minimo, maximo, timeout, verificar_apos, ociosidade_max):
+        self.minimo = max(0, minimo)
+        self.maximo = max(1, maximo, self.minimo)
+        self.timeout = timeout
+        self.verificar_apos = verificar_apos
+        self.ociosidade_max = ociosidade_max
+
+        self._cond = threading.Condition()
+        self._ociosas = deque()  # (conn, devolvida_em)
+        self._total = 0
+        self._em_uso = 0
+
+        # Estatísticas
+        self._retiradas = 0
+        self._esperas = 0
+        self._timeouts = 0
+        self._criadas = 0
+        self._descartadas = 0
+        self._retirada_total = 0.0
+        self._retirada_max = 0.0
+        self._retirada_ultima = 0.0
+
+    def preencher(self):
+        """Abre conexões até atingir o mínimo configurado."""
+        while True:
+            with self._cond:
+                if self._total >= self.minimo:
+                    return
+                self._total += 1
+            try:
+                conn = self._criar()
+            except Exception:
+                with self._cond:
+                    self._total -= 1
+                raise
+            with self._cond:
+                self._ociosas.append((conn, time.monotonic()))
+                self._publicar()
+                self._cond.notify()
+
+    def obter(self):
+        inicio = time.perf_counter()
+        prazo = inicio + self.timeout
+        conn, devolvida_em = None, None
+        with self._cond:
+            esperou = False
+            while True:
+                if self._ociosas:
+                    conn, devolvida_em = self._ociosas.pop()
+                    break
+                if self._total < self.maximo:
+                    self._total += 1
+                    break
+                if not esperou:
+                    self._esperas += 1
+                    metricas.POOL_ESPERAS.inc()
+                    esperou = True
+                restante = prazo - time.perf_counter()
+                if restante <= 0:
+                    self._timeouts += 1
+                    metricas.POOL_TIMEOUTS.inc()
+                    raise PoolEsgotado(
+                        f"Nenhuma conexão livre em {self.timeout}s (máximo {self.maximo})"
+                    )
+                self._cond.wait(restante)
+            self._em_uso += 1
+            self._publicar()
+
+        try:
+            if conn is not None and not self._saudavel(conn, devolvida_em):
+                self._fechar(conn)
+                conn = None
+            if conn is None:
+                conn = self._criar()
+        except Exception:
+            with self._cond:
+                self._total -= 1
+                self._em_uso -= 1
+                self._publicar()
+                self._cond.notify()
+            raise
+
+        duracao = time.perf_counter() - inicio
+        metricas.POOL_RETIRADA.observe(duracao)
+        with self._cond:
+            self._retiradas += 1
+            self._retirada_total += duracao
+            self._retirada_ultima = duracao
+            if duracao > self._retirada_max:
+                self._retirada_max = duracao
+        return conn
+
+    def devolver(self, conn, descartar=False):
+        if not descartar and not conn.closed:
+            # Nunca devolve uma transação aberta para o pool
+            status = conn.get_transaction_status()
+            if status != extensions.TRANSACTION_STATUS_IDLE:
+                try:
+                    conn.rollback()
+                except Exception:
+                    descartar = True
+        descartar = descartar or bool(conn.closed)
+
+        expiradas = []
+        with self._cond:
+            self._em_uso -= 1
+            if descartar:
+                self._total -= 1
+            else:
+                self._ociosas.append((conn, time.monotonic()))
+            # Fecha as ociosas mais antigas acima do mínimo
+            limite = time.monotonic() - self.ociosidade_max
+            while (
+                self._ociosas
+                and self._total > self.minimo
+                and self._ociosas[0][1] < limite
+            ):
+                expiradas.append(self._ociosas.popleft()[0])
+                self._total -= 1
+            self._publicar()
+            self._cond.notify()
+
+        if descartar:
+            self._fechar(conn)
+        for antiga in expiradas:
+            self._fechar(antiga)
+
+    def fechar_todas(self):
+        with self._cond:
+            ociosas = [c for c, _ in self._ociosas]
+            self._ociosas.clear()
+            self._total -= len(ociosas)
+            self._publicar()
+        for conn in ociosas:
+            self._fechar(conn)
+
+    def estatisticas(self):
+        with self._cond:
+            retiradas = self._retiradas
+            return {
+                "minimo": self.minimo,
+                "maximo": self.maximo,
+                "total": self._total,
+                "em_uso": self._em_uso,
+                "ociosas": len(self._ociosas),
+                "retiradas": retiradas,
+                "esperas": self._esperas,
+                "timeouts": self._timeouts,
+                "criadas": self._criadas,
+                "descartadas": self._descartadas,
+                "retirada_ms_media": round(self._retirada_total / retiradas * 1000, 3) if retiradas else 0.0,
+                "retirada_ms_max": round(self._retirada_max * 1000, 3),
+                "retirada_ms_ultima": round(self._retirada_ultima * 1000, 3),
+            }
+
+    def _publicar(self):
+        # Chamado com self._cond adquirido; valores somados entre workers em /metrics
+        metricas.POOL_CONEXOES.labels("em_uso").set(self._em_uso)
+        metricas.POOL_CONEXOES.labels("ociosas").set(len(self._ociosas))
+        metricas.POOL_CONEXOES.labels("maximo").set(self.maximo)
+
+    def _criar(self):
+        conn = _nova_conexao()
+        with self._cond:
+            self._criadas += 1
+        return conn
+
+    def _saudavel(self, conn, devolvida_em):
+        if conn.closed:
+            return False
+        if time.monotonic() - devolvida_em < self.verificar_apos:
+            return True
+        try:
+            with conn.cursor() as cur:
+                cur.execute("SELECT 1")
+            conn.rollback()
+            return True
+        except Exception:
+            return False
+
+    def _fechar(self, conn):
+        with self._cond:
+            self._descartadas += 1
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+
+_pool = None
+_pool_pid = None
+_pool_lock = threading.Lock()
+
+
+def obter_pool():
+    """Retorna o pool do processo atual, criando-o no primeiro uso.
+
+    O PID é conferido para que um fork (gunicorn com --preload) não
+    compartilhe sockets com o processo pai.
+    """
+    global _pool, _pool_pid
+    pid = os.getpid()
+    if _pool is None or _pool_pid != pid:
+        with _pool_lock:
+            if _pool is None or _pool_pid != pid:
+                _pool = PoolConexoes(
+                    DB_POOL_MIN,
+                    DB_POOL_MAX,
+                    DB_POOL_TIMEOUT,
+                    DB_POOL_CHECK_IDLE_SEC,
+                    DB_POOL_MAX_IDLE_SEC,
+                )
+                _pool_pid = pid
+                try:
+                    _pool.preencher()
+                except Exception as e:
+                    print(f"Aviso: não foi possível pré-abrir conexões do pool: {e}")
+    return _pool
+
+
+def estatisticas_pool():
+    return obter_pool().estatisticas()
+
+
+@contextmanager
+def conexao_isolada(cursor_factory=extras.DictCursor):
+    """Empresta uma conexão do pool, fora da sessão da requisição.
+
+    Ao sair do bloco a transação é confirmada (commit) ou, se houve
+    exceção, desfeita (rollback); em ambos os casos a conexão volta para o
+    pool. Útil para trabalho que precisa da própria transação ou que
+    sobrevive à requisição (ex.: respostas em streaming).
+    """
+    pool = obter_pool()
+    conn = pool.obter()
+    descartar = False
+    try:
+        cur = conn.cursor(cursor_factory=cursor_factory)  # Retorna resultados como dicionário
+        yield conn, cur
+        conn.commit()
+    except BaseException:
+        try:
+            conn.rollback()
+        except Exception:
+            descartar = True
+        raise
+    finally:
+        pool.devolver(conn, descartar)
+
+
+# ======================================================
+# 🔹 Sessão por requisição (unit of work em flask.g)
+# ======================================================
+
+class SessaoRequisicao:
+    """Uma conexão e uma transação compartilhadas por todas as chamadas
+    ao banco feitas durante a mesma requisição.
+
+    A conexão só é retirada do pool no primeiro uso; o commit/rollback
+    acontece ao final da requisição (ver `init_app`).
+    """
+
+    def __init__(self):
+        self.conn = None
+        self.falhou = False
+
+    def obter_conexao(self):
+        if self.conn is None:
+            self.conn = obter_pool().obter()
+        return self.conn
+
+    def finalizar(self, confirmar):
+        if self.conn is None:
+            return
+        conn, self.conn = self.conn, None
+        descartar = False
+        try:
+            if confirmar and not self.falhou:
+                conn.commit()
+            else:
+                conn.rollback()
+        except BaseException:
+            try:
+                conn.rollback()
+            except Exception:
+                descartar = True
+            raise
+        finally:
+            obter_pool().devolver(conn, descartar)
+
+
+def _sessao_atual():
+    if not has_request_context():
+        return None
+    sessao = g.get("_sessao_db")
+    if sessao is None:
+        sessao = SessaoRequisicao()
+        g._sessao_db = sessao
+    return sessao
+
+
+def liberar_sessao(confirmar=True):
+    """Encerra já a transação da requisição (commit, ou rollback com
+    `confirmar=False`) e devolve a conexão ao pool; o próximo `conexao()`
+    da mesma requisição pega outra. Para rotas de leitura que vão usar
+    outras conexões do pool em paralelo (secoes.py)."""
+    if has_request_context():
+        sessao = g.get("_sessao_db")
+        if sessao is not None:
+            sessao.finalizar(confirmar)
+
+
+@contextmanager
+def conexao(cursor_factory=extras.DictCursor):
+    """Conexão para uso nos models: `with conexao() as (conn, cur): ...`.
+
+    Dentro de uma requisição Flask, todas as chamadas compartilham a
+    conexão e a transação da sessão da requisição, confirmada no
+    `after_request` (status < 400) e desfeita caso contrário. Fora de uma
+    requisição (scripts, threads), equivale a `conexao_isolada()`.
+    """
+    sessao = _sessao_atual()
+    if sessao is None:
+        with conexao_isolada(cursor_factory) as par:
+            yield par
+        return
+
+    conn = sessao.obter_conexao()
+    cur = conn.cursor(cursor_factory=cursor_factory)
+    try:
+        yield conn, cur
+    except BaseException:
+        # Qualquer erro dentro do bloco invalida a unidade de trabalho
+        sessao.falhou = True
+        raise
+    finally:
+        cur.close()
+
+
+def init_app(app):
+    """Registra o ciclo de vida da sessão de banco na aplicação Flask."""
+
+    @app.after_request
+    def _confirmar_sessao_db(response):
+        sessao = g.pop("_sessao_db", None)
+        if sessao is not None:
+            sessao.finalizar(confirmar=response.status_code < 400)
+        return response
+
+    @app.teardown_request
+    def _encerrar_sessao_db(exc):
+        # Caminho de exceção não tratada: after_request não rodou
+        sessao = g.pop("_sessao_db", None)
+        if sessao is not None:
+            try:
+                sessao.finalizar(confirmar=False)
+            except Exception as e:
+                print(f"Erro ao encerrar sessão do banco: {e}")
+
+
+class _ConexaoEmprestada:
+    """Conexão do pool com a interface de uma conexão comum: `close()`
+    devolve ao pool em vez de encerrar o socket."""
+
+    def __init__(self, pool, conn):
+        self._pool = pool
+        self._conn = conn
+
+    def __getattr__(self, nome):
+        return getattr(self._conn, nome)
+
+    def close(self):
+        if self._conn is None:
+            return
+        conn, self._conn = self._conn, None
+        self._pool.devolver(conn)
+
+
+def conectar():
+    """Estabelece conexão com o banco de dados PostgreSQL (via pool).
+
+    Mantido por compatibilidade: prefira `with conexao() as (conn, cur)`.
+    O chamador é responsável pelo commit; `conn.close()` devolve a conexão.
+    """
+    pool = obter_pool()
+    conn = _ConexaoEmprestada(pool, pool.obter())
     cur = conn.cursor(cursor_factory=extras.DictCursor)  # Retorna resultados como dicionário
     return conn, cur
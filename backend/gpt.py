@@ -1,29 +1,12 @@
 from flask import Blueprint, request, jsonify
 from ratelimit import limiter
 from config import ENABLE_GPT_WRITE, GPT_TOKEN, RATE_LIMIT_GPT_WRITE
-from models import adicionar_lancamento, converter_data, buscar_imovel_por_id
-from db_connection import conectar
-import time
+from models import adicionar_lancamento_validado, converter_data
+from idempotencia import criar_idempotencia, impressao_corpo
 
 gpt_bp = Blueprint("gpt", __name__)
 
-_idem_store = {}
-_IDEM_TTL_SEC = 60 * 60  # 1h
-_IDEM_MAX = 5000
-
-
-def _cleanup_idem_store():
-    # Limpeza simples para evitar crescimento indefinido
-    now = time.time()
-    if len(_idem_store) > _IDEM_MAX:
-        # Remove itens antigos
-        keys = list(_idem_store.keys())
-        for k in keys[: len(keys) // 2]:
-            _idem_store.pop(k, None)
-    # TTL prune
-    for k, ts in list(_idem_store.items()):
-        if now - ts > _IDEM_TTL_SEC:
-            _idem_store.pop(k, None)
+_idempotencia = criar_idempotencia()
 
 
 def _require_gpt_auth():
@@ -35,24 +18,6 @@ def _require_gpt_auth():
     return None
 
 
-def _exists_categoria(cat_id: int) -> bool:
-    conn, cur = conectar()
-    try:
-        cur.execute("SELECT 1 FROM categorias WHERE id = %s", (cat_id,))
-        return cur.fetchone() is not None
-    finally:
-        conn.close()
-
-
-def _exists_situacao(sit_id: int) -> bool:
-    conn, cur = conectar()
-    try:
-        cur.execute("SELECT 1 FROM situacao_lancamento WHERE id = %s", (sit_id,))
-        return cur.fetchone() is not None
-    finally:
-        conn.close()
-
-
 @gpt_bp.route("/gpt/lancamentos", methods=["POST"])
 @limiter.limit(RATE_LIMIT_GPT_WRITE)
 def gpt_criar_lancamento():
@@ -65,9 +30,6 @@ def gpt_criar_lancamento():
     idem_key = request.headers.get("Idempotency-Key", "").strip()
     if not idem_key:
         return jsonify({"error": "Idempotency-Key obrigatório"}), 400
-    _cleanup_idem_store()
-    if idem_key in _idem_store:
-        return jsonify({"error": "Requisição duplicada"}), 409
 
     data = request.get_json(silent=True) or {}
 
@@ -94,20 +56,26 @@ def gpt_criar_lancamento():
     except Exception:
         return jsonify({"error": "IDs devem ser inteiros"}), 400
 
-    # Verifica existência de chaves
-    if not buscar_imovel_por_id(id_imovel):
-        return jsonify({"error": "Imóvel inexistente"}), 400
-    if not _exists_categoria(id_categoria):
-        return jsonify({"error": "Categoria inexistente"}), 400
-    if not _exists_situacao(id_situacao):
-        return jsonify({"error": "Situação inexistente"}), 400
-
     descricao = str(data.get("descricao", "")).strip()
     if not descricao:
         return jsonify({"error": "Descrição obrigatória"}), 400
 
+    # Reserva a chave; uma repetição recebe a resposta original
+    impressao = impressao_corpo(request.get_data())
+    anterior = _idempotencia.reservar(idem_key, impressao)
+    if anterior is not None:
+        if anterior["impressao"] != impressao:
+            return jsonify({"error": "Idempotency-Key já usada com outro corpo"}), 422
+        if anterior["status"] is None:
+            return jsonify({"error": "Requisição duplicada em andamento"}), 409
+        resposta = jsonify(anterior["corpo"])
+        resposta.status_code = anterior["status"]
+        resposta.headers["Idempotent-Replayed"] = "true"
+        return resposta
+
+    # Existência das chaves e inserção num único comando no banco
     try:
-        novo = adicionar_lancamento(
+        novo, erro_chave = adicionar_lancamento_validado(
             data_fmt,
             id_imovel,
             id_categoria,
@@ -117,10 +85,15 @@ def gpt_criar_lancamento():
             True,
         )
     except Exception as e:
-        return jsonify({"error": f"Falha ao inserir: {e}"}), 500
-
-    # Marca idempotency como usada
-    _idem_store[idem_key] = time.time()
+        _idempotencia.liberar(idem_key)
+        print(f"Erro ao inserir lançamento (GPT): {e}")
+        return jsonify({"error": "Falha ao inserir lançamento"}), 500
+    if erro_chave:
+        _idempotencia.liberar(idem_key)
+        return jsonify({"error": erro_chave}), 400
+
+    # Guarda a resposta para repetir em retentativas com a mesma chave
+    _idempotencia.concluir(idem_key, 201, novo)
 
     return jsonify(novo), 201
 
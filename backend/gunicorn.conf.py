@@ -0,0 +1,26 @@
+"""Configuração do gunicorn (lida automaticamente a partir de backend/).
+
+Prepara o modo multiprocesso do prometheus_client para GET /metrics
+(metricas.py): o diretório precisa existir, vazio, antes de os workers
+importarem a aplicação, e os arquivos de um worker que sai deixam de
+contar nos gauges.
+"""
+import os
+import shutil
+import tempfile
+
+METRICAS_DIR = os.environ.setdefault(
+    "PROMETHEUS_MULTIPROC_DIR", os.path.join(tempfile.gettempdir(), "financeiro-metricas")
+)
+
+
+def on_starting(server):
+    # Restos de uma execução anterior somariam contadores antigos
+    shutil.rmtree(METRICAS_DIR, ignore_errors=True)
+    os.makedirs(METRICAS_DIR, exist_ok=True)
+
+
+def child_exit(server, worker):
+    from prometheus_client import multiprocess
+
+    multiprocess.mark_process_dead(worker.pid)
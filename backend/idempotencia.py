@@ -0,0 +1,135 @@
+"""Armazenamento das chaves de idempotência do POST /gpt/lancamentos.
+
+Fluxo: `reservar(chave, impressao)` antes de gravar; se a chave já existe
+devolve o registro anterior (`impressao`, `status`, `corpo`) para a rota
+repetir a resposta original. Depois da gravação, `concluir` guarda a
+resposta; se a gravação falhar, `liberar` solta a chave para nova tentativa.
+
+Dois backends, escolhidos por IDEM_BACKEND:
+- `postgres`: tabela `idempotencia_gpt`, compartilhada entre workers e
+  restarts. Usa a transação da requisição, então reserva, lançamento e
+  resposta são confirmados (ou desfeitos) juntos.
+- `memoria`: dicionário ordenado por expiração, por processo.
+"""
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from psycopg2.extras import Json
+from config import IDEM_BACKEND, IDEM_TTL_SEC, IDEM_MAX_ITENS
+from db_connection import conexao
+
+
+def impressao_corpo(corpo_bytes):
+    """Hash do corpo da requisição (detecta chave reutilizada com outro corpo)."""
+    return hashlib.sha256(corpo_bytes or b"").hexdigest()
+
+
+class IdempotenciaMemoria:
+    """Chaves em um OrderedDict na ordem de inserção. Como o TTL é o mesmo
+    para todas, essa também é a ordem de expiração: a limpeza só remove do
+    início enquanto houver vencidas (custo amortizado O(1) por chamada)."""
+
+    def __init__(self, ttl=IDEM_TTL_SEC, max_itens=IDEM_MAX_ITENS):
+        self.ttl = ttl
+        self.max_itens = max_itens
+        self._itens = OrderedDict()  # chave -> [expira_em, impressao, status, corpo]
+        self._lock = threading.Lock()
+
+    def _expirar(self, agora):
+        while self._itens:
+            expira_em = next(iter(self._itens.values()))[0]
+            if expira_em > agora:
+                break
+            self._itens.popitem(last=False)
+
+    def reservar(self, chave, impressao):
+        agora = time.monotonic()
+        with self._lock:
+            self._expirar(agora)
+            item = self._itens.get(chave)
+            if item is not None:
+                return {"impressao": item[1], "status": item[2], "corpo": item[3]}
+            self._itens[chave] = [agora + self.ttl, impressao, None, None]
+            while len(self._itens) > self.max_itens:
+                self._itens.popitem(last=False)  # a mais antiga = a que expira primeiro
+        return None
+
+    def concluir(self, chave, status, corpo):
+        with self._lock:
+            item = self._itens.get(chave)
+            if item is not None:
+                item[2], item[3] = status, corpo
+
+    def liberar(self, chave):
+        with self._lock:
+            self._itens.pop(chave, None)
+
+
+class IdempotenciaPostgres:
+    """Chaves na tabela `idempotencia_gpt` (migrations/004_idempotencia_gpt.sql).
+
+    A reserva é um INSERT ... ON CONFLICT: uma chave vencida é reaproveitada
+    no mesmo comando; uma chave viva não é alterada e o registro existente é
+    devolvido. As vencidas são apagadas a cada `limpar_a_cada` reservas.
+    """
+
+    def __init__(self, ttl=IDEM_TTL_SEC, limpar_a_cada=100):
+        self.ttl = ttl
+        self.limpar_a_cada = limpar_a_cada
+        self._reservas = 0
+        self._lock = threading.Lock()
+
+    def reservar(self, chave, impressao):
+        with conexao() as (conn, cur):
+            cur.execute(
+                """
+                INSERT INTO idempotencia_gpt AS i (chave, impressao, expira_em)
+                VALUES (%s, %s, now() + make_interval(secs => %s))
+                ON CONFLICT (chave) DO UPDATE
+                SET impressao = EXCLUDED.impressao,
+                    status = NULL,
+                    resposta = NULL,
+                    criado_em = now(),
+                    expira_em = EXCLUDED.expira_em
+                WHERE i.expira_em <= now()
+                RETURNING chave
+                """,
+                (chave, impressao, self.ttl),
+            )
+            reservou = cur.fetchone() is not None
+            if not reservou:
+                cur.execute(
+                    "SELECT impressao, status, resposta FROM idempotencia_gpt WHERE chave = %s",
+                    (chave,),
+                )
+                impressao_anterior, status, corpo = cur.fetchone()
+                return {"impressao": impressao_anterior, "status": status, "corpo": corpo}
+            if self._deve_limpar():
+                cur.execute("DELETE FROM idempotencia_gpt WHERE expira_em <= now()")
+        return None
+
+    def _deve_limpar(self):
+        with self._lock:
+            self._reservas += 1
+            return self._reservas % self.limpar_a_cada == 0
+
+    def concluir(self, chave, status, corpo):
+        with conexao() as (conn, cur):
+            cur.execute(
+                "UPDATE idempotencia_gpt SET status = %s, resposta = %s WHERE chave = %s",
+                (status, Json(corpo), chave),
+            )
+
+    def liberar(self, chave):
+        # Na requisição, a resposta de erro desfaz a transação (e a reserva)
+        # em db_connection; aqui não há nada a fazer.
+        pass
+
+
+def criar_idempotencia(backend=IDEM_BACKEND):
+    if backend == "memoria":
+        return IdempotenciaMemoria()
+    if backend == "postgres":
+        return IdempotenciaPostgres()
+    raise ValueError(f"IDEM_BACKEND inválido: {backend}")
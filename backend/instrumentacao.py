@@ -0,0 +1,255 @@
+"""Instrumentação das consultas ao banco.
+
+Toda conexão do pool cria cursores medidos (db_connection._ConexaoMedida):
+cada `execute`/`executemany` passa por `registrar_consulta` com o texto
+normalizado, a duração e as linhas afetadas/retornadas.
+
+O texto registrado nunca leva valores: literais viram `?` e listas de
+VALUES viram `(...)`. Isso vale também para `extras.execute_values`, que
+manda os valores já embutidos no SQL; o que fica é o template. Textos
+longos (lotes) não passam pela normalização caractere a caractere nem
+entram no cache.
+
+- Por requisição: total de consultas, tempo de banco e contagem por texto;
+  saem no header `Server-Timing` (`db;dur=<ms>, db-count;desc="<n>"`) e
+  nas métricas (metricas.py).
+- Consultas acima de SQL_LENTA_MS vão para o log numa linha JSON, como o
+  audit_log, com os parâmetros trocados pelos tipos (valores nunca saem).
+- O mesmo texto executado SQL_N_MAIS_1_MIN vezes ou mais numa requisição
+  (um SELECT dentro de um laço) é sinalizado como possível N+1 no log e em
+  `db_n_mais_1_total`.
+
+Fora de uma requisição (threads de secoes.py, comandos flask) só o log de
+consultas lentas vale.
+"""
+import json
+import re
+from datetime import date, datetime
+from functools import lru_cache
+from flask import g, has_request_context, request
+from psycopg2 import sql as psql
+from config import SQL_LENTA_MS, SQL_N_MAIS_1_MIN, SERVER_TIMING_ATIVO
+import metricas
+
+
+# ======================================================
+# 🔹 Normalização do texto da consulta
+# ======================================================
+
+def _identificador(c):
+    return c.isalnum() or c in "_$"
+
+
+def fim_literal(query, i):
+    """Fim (exclusivo) do literal ou identificador entre aspas que começa em
+    `query[i]` ('...', E'...', "...", $tag$...$tag$); None se nenhum começa
+    ali (ex.: o `$` de `$1`) e -1 se ele não termina."""
+    n = len(query)
+    c = query[i]
+    anterior = query[i - 1] if i else ""
+    if c == "'":
+        escape = anterior in "eE" and (i < 2 or not _identificador(query[i - 2]))
+        fim = i + 1
+        while fim < n:
+            if escape and query[fim] == "\\":
+                fim += 2
+                continue
+            if query[fim] == "'":
+                if fim + 1 < n and query[fim + 1] == "'":  # aspas escapadas ('')
+                    fim += 2
+                    continue
+                return fim + 1
+            fim += 1
+        return -1
+    if c == '"':
+        fim = query.find('"', i + 1)
+        while fim >= 0 and query.startswith('""', fim):
+            fim = query.find('"', fim + 2)
+        return -1 if fim < 0 else fim + 1
+    if c == "$" and not _identificador(anterior):
+        fim_tag = query.find("$", i + 1)
+        tag = query[i:fim_tag + 1] if fim_tag > 0 else ""
+        if tag and (len(tag) == 2 or (not tag[1].isdigit() and all(_identificador(x) for x in tag[1:-1]))):
+            fim = query.find(tag, fim_tag + 1)
+            return -1 if fim < 0 else fim + len(tag)
+    return None
+
+
+def normalizar_sql(query):
+    """Texto canônico da consulta (chaves de cache, log e contagem por
+    requisição): sem comentários, espaços colapsados, minúsculas fora de
+    literais (inclusive $$...$$) e identificadores entre aspas, e sem `;`
+    final. Literais são preservados."""
+    partes = []
+    i, n = 0, len(query)
+    espaco = False
+    while i < n:
+        c = query[i]
+        fim = fim_literal(query, i) if c in "'\"$" else None
+        if fim is not None:
+            fim = n if fim < 0 else fim
+            trecho, i = query[i:fim], fim
+        elif query.startswith("--", i):
+            fim = query.find("\n", i)
+            i = n if fim < 0 else fim
+            espaco = True
+            continue
+        elif query.startswith("/*", i):
+            fim = query.find("*/", i + 2)
+            i = n if fim < 0 else fim + 2
+            espaco = True
+            continue
+        elif c.isspace():
+            espaco = True
+            i += 1
+            continue
+        else:
+            trecho, i = c.lower(), i + 1
+        if espaco and partes:
+            partes.append(" ")
+        espaco = False
+        partes.append(trecho)
+    return "".join(partes).rstrip("; ")
+
+
+# Literais: 'texto' (e E'...'), $$...$$ e números fora de identificadores/placeholders ($1)
+_LITERAL = re.compile(r"(?:\b[eE])?'(?:[^']|'')*'|\$\$.*?\$\$|(?<![\w$.])\d+(?:\.\d+)?\b", re.S)
+# VALUES (...), (...), ... → VALUES (...) (um nível de parênteses dentro de cada linha)
+_VALUES = re.compile(r"(values)\s*\((?:[^()]|\([^()]*\))*\)(?:\s*,\s*\((?:[^()]|\([^()]*\))*\))*", re.I)
+_ESPACOS = re.compile(r"\s+")
+
+# Acima disso o texto é de um lote (ex.: execute_values): só regex, sem cache
+_TEXTO_CACHE_MAX = 4096
+_TEXTO_LOG_MAX = 2000
+
+
+def sem_valores(texto):
+    """`texto` com literais trocados por `?` e listas de VALUES por `(...)`."""
+    return _VALUES.sub(r"\1 (...)", _LITERAL.sub("?", texto))
+
+
+@lru_cache(maxsize=1024)
+def _texto_curto(query):
+    # Os textos dos models são constantes: normaliza cada um uma vez
+    return sem_valores(normalizar_sql(query))
+
+
+def _texto(query, cur):
+    if isinstance(query, bytes):
+        query = query.decode("utf-8", "replace")
+    elif isinstance(query, psql.Composable):
+        query = query.as_string(cur)
+    if len(query) <= _TEXTO_CACHE_MAX:
+        return _texto_curto(query)
+    return _ESPACOS.sub(" ", sem_valores(query)).strip().lower()[:_TEXTO_LOG_MAX]
+
+
+# ======================================================
+# 🔹 Parâmetros sem valores
+# ======================================================
+
+def _tipo(valor):
+    if valor is None:
+        return None
+    if isinstance(valor, datetime):
+        return "datetime"
+    if isinstance(valor, date):
+        return "date"
+    if isinstance(valor, (list, tuple)):
+        return f"{type(valor).__name__}[{len(valor)}]"
+    return type(valor).__name__
+
+
+def redigir_parametros(params):
+    """Estrutura dos parâmetros com os valores trocados pelos tipos."""
+    if params is None:
+        return None
+    if isinstance(params, dict):
+        return {chave: _tipo(valor) for chave, valor in params.items()}
+    if isinstance(params, (list, tuple)):
+        return [_tipo(valor) for valor in params]
+    return _tipo(params)
+
+
+# ======================================================
+# 🔹 Registro por consulta e por requisição
+# ======================================================
+
+class _ContagemRequisicao:
+    __slots__ = ("total", "tempo", "linhas", "por_texto")
+
+    def __init__(self):
+        self.total = 0
+        self.tempo = 0.0
+        self.linhas = 0
+        self.por_texto = {}  # texto -> [vezes, segundos, linhas]
+
+
+def _log(registro):
+    print(json.dumps(registro, ensure_ascii=False, default=str))
+
+
+def registrar_consulta(cur, query, params, duracao, lote=False):
+    """Chamado pelos cursores medidos depois de cada execute (também
+    quando a consulta falhou)."""
+    texto = _texto(query, cur)
+    linhas = max(cur.rowcount, 0)  # -1 em cursores nomeados e comandos sem resultado
+    if has_request_context():
+        contagem = g.get("_consultas_db")
+        if contagem is None:
+            contagem = g._consultas_db = _ContagemRequisicao()
+        contagem.total += 1
+        contagem.tempo += duracao
+        contagem.linhas += linhas
+        item = contagem.por_texto.get(texto)
+        if item is None:
+            contagem.por_texto[texto] = [1, duracao, linhas]
+        else:
+            item[0] += 1
+            item[1] += duracao
+            item[2] += linhas
+
+    ms = duracao * 1000
+    if ms >= SQL_LENTA_MS:
+        _log({
+            "tipo": "consulta_lenta",
+            "ms": round(ms, 2),
+            "linhas": cur.rowcount,
+            "sql": texto,
+            # executemany: só a estrutura do primeiro conjunto
+            "parametros": redigir_parametros(next(iter(params), None) if lote and params else params),
+            "rota": request.path if has_request_context() else None,
+        })
+
+
+def init_app(app):
+    """Header Server-Timing, tempo de banco nas métricas e aviso de N+1."""
+
+    @app.after_request
+    def _resumir_consultas(response):
+        contagem = g.get("_consultas_db")
+        if contagem is None:
+            return response
+        rota = metricas.rota_atual()
+        metricas.TEMPO_DB.labels(rota).observe(contagem.tempo)
+        metricas.CONSULTAS_DB.labels(rota).observe(contagem.total)
+        if SERVER_TIMING_ATIVO:
+            response.headers.add(
+                "Server-Timing",
+                f'db;dur={contagem.tempo * 1000:.2f}, db-count;desc="{contagem.total}"',
+            )
+        repetidas = [
+            (texto, item) for texto, item in contagem.por_texto.items() if item[0] >= SQL_N_MAIS_1_MIN
+        ]
+        if repetidas:
+            metricas.N_MAIS_1.labels(rota).inc()
+            for texto, (vezes, segundos, linhas) in repetidas:
+                _log({
+                    "tipo": "possivel_n_mais_1",
+                    "rota": rota,
+                    "repeticoes": vezes,
+                    "ms_total": round(segundos * 1000, 2),
+                    "linhas": linhas,
+                    "sql": texto,
+                })
+        return response
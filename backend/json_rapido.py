@@ -0,0 +1,100 @@
+"""Provider JSON da aplicação: orjson quando instalado, biblioteca padrão
+como alternativa, com a mesma saída nos dois casos.
+
+Convenções (as mesmas do frontend e do agente):
+- `date` → "DD/MM/AAAA"; `datetime` → "DD/MM/AAAA HH:MM:SS";
+- `Decimal` → número;
+- chaves ordenadas, sem espaços, UTF-8 sem escapes (indentado em DEBUG).
+
+`resposta_linhas` é o caminho rápido para listas lidas do banco: executa
+a consulta num cursor de tuplas, com datas/numeric convertidos pelo driver
+(linhas.py), e devolve a Response já codificada, sem DictRow e sem passar
+por str (jsonify codifica para str e depois para bytes). Registros de
+linhas.py saem como objetos.
+"""
+import json
+from datetime import date, datetime
+from decimal import Decimal
+from flask import current_app
+from flask.json.provider import DefaultJSONProvider
+from linhas import Registro, preparar_cursor
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - depende do ambiente
+    orjson = None
+
+FORMATO_DATA = "%d/%m/%Y"
+FORMATO_DATA_HORA = "%d/%m/%Y %H:%M:%S"
+
+
+def _padrao(obj):
+    # datetime é subclasse de date: testar antes
+    if isinstance(obj, datetime):
+        return obj.strftime(FORMATO_DATA_HORA)
+    if isinstance(obj, date):
+        return obj.strftime(FORMATO_DATA)
+    if isinstance(obj, Decimal):
+        return float(obj)
+    if isinstance(obj, Registro):
+        return obj.como_dict()
+    return DefaultJSONProvider.default(obj)
+
+
+if orjson is not None:
+    # PASSTHROUGH: orjson chama _padrao para datas em vez de gerar ISO
+    _OPCOES = orjson.OPT_SORT_KEYS | orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_NON_STR_KEYS
+
+    def codificar(obj, indentar=False):
+        """`obj` em JSON (bytes)."""
+        opcoes = _OPCOES | orjson.OPT_INDENT_2 if indentar else _OPCOES
+        return orjson.dumps(obj, default=_padrao, option=opcoes)
+
+    _decodificar = orjson.loads
+else:
+    def codificar(obj, indentar=False):
+        """`obj` em JSON (bytes)."""
+        if indentar:
+            texto = json.dumps(obj, default=_padrao, sort_keys=True, ensure_ascii=False, indent=2)
+        else:
+            texto = json.dumps(obj, default=_padrao, sort_keys=True, ensure_ascii=False, separators=(",", ":"))
+        return texto.encode("utf-8")
+
+    _decodificar = json.loads
+
+
+class ProvedorJSON(DefaultJSONProvider):
+    """Registrado em app.py (`app.json = ProvedorJSON(app)`); usado por
+    jsonify, request.get_json e `current_app.json.dumps`."""
+
+    def dumps(self, obj, **kwargs):
+        # `separators`/`sort_keys` de quem chama são ignorados: a saída já é compacta e ordenada
+        return codificar(obj, indentar=bool(kwargs.get("indent"))).decode("utf-8")
+
+    def loads(self, s, **kwargs):
+        return _decodificar(s)
+
+    def _indentar(self):
+        return (self.compact is None and self._app.debug) or self.compact is False
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(
+            codificar(obj, indentar=self._indentar()) + b"\n", mimetype=self.mimetype
+        )
+
+
+def linhas_para_json(colunas, linhas):
+    """Array JSON (bytes) de objetos a partir das tuplas do cursor."""
+    return codificar([dict(zip(colunas, linha)) for linha in linhas])
+
+
+def resposta_linhas(cur, sql, params=None, status=200):
+    """Response com todas as linhas de `sql` como array de objetos.
+    `cur` é um cursor de tuplas; datas e numeric são convertidos pelo
+    driver (linhas.preparar_cursor)."""
+    preparar_cursor(cur)
+    cur.execute(sql, params)
+    colunas = [c[0] for c in cur.description]
+    corpo = linhas_para_json(colunas, cur.fetchall())
+    return current_app.response_class(corpo + b"\n", status=status, mimetype="application/json")
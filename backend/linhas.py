@@ -0,0 +1,122 @@
+"""Linhas compactas para as listas lidas do banco.
+
+`buscar_registros(cur, sql, params)` executa a consulta num cursor de
+tuplas (`conexao(cursor_factory=None)`) e devolve registros `__slots__`:
+
+- o tipo do registro é criado uma vez por conjunto de colunas e fica em
+  cache (mapeamento coluna → posição calculado uma vez, não por linha);
+- cada linha é alocada uma vez só (sem DictRow nem cópias em dict);
+- date/timestamp chegam do driver já como texto DD/MM/AAAA (typecaster
+  registrado só no cursor) e numeric como float, então não há objetos
+  date/Decimal nem `strftime` linha a linha.
+
+Os campos ficam em ordem alfabética: o orjson serializa o registro como
+objeto com as chaves na mesma ordem do `jsonify` de um dict. Registros
+aceitam `registro["coluna"]` e `.get()` como os dicts de antes.
+"""
+import dataclasses
+import keyword
+import operator
+import threading
+from psycopg2 import extensions
+
+
+# ======================================================
+# 🔹 Conversão no driver (por cursor)
+# ======================================================
+
+def _data_br(valor, cur):
+    # Texto do Postgres (AAAA-MM-DD) → DD/MM/AAAA; 'infinity' etc. passam como estão
+    if valor is None:
+        return None
+    if len(valor) == 10 and valor[4] == "-":
+        return f"{valor[8:10]}/{valor[5:7]}/{valor[0:4]}"
+    return valor
+
+
+def _data_hora_br(valor, cur):
+    # AAAA-MM-DD HH:MM:SS[.ffffff][+TZ] → DD/MM/AAAA HH:MM:SS (fuso da sessão)
+    if valor is None:
+        return None
+    if len(valor) >= 19 and valor[4] == "-" and valor[10] == " ":
+        return f"{valor[8:10]}/{valor[5:7]}/{valor[0:4]} {valor[11:19]}"
+    return valor
+
+
+def _numero(valor, cur):
+    return None if valor is None else float(valor)
+
+
+DATA_BR = extensions.new_type((1082,), "DATA_BR", _data_br)
+DATA_HORA_BR = extensions.new_type((1114, 1184), "DATA_HORA_BR", _data_hora_br)
+NUMERO = extensions.new_type((1700,), "NUMERO_FLOAT", _numero)
+
+
+def preparar_cursor(cur):
+    """Registra as conversões em `cur` (antes do execute)."""
+    for tipo in (DATA_BR, DATA_HORA_BR, NUMERO):
+        extensions.register_type(tipo, cur)
+    return cur
+
+
+# ======================================================
+# 🔹 Tipos de registro por conjunto de colunas
+# ======================================================
+
+class Registro:
+    """Base dos registros gerados por `montador`."""
+
+    __slots__ = ()
+
+    def __getitem__(self, campo):
+        return getattr(self, campo)
+
+    def get(self, campo, padrao=None):
+        return getattr(self, campo, padrao)
+
+    def como_dict(self):
+        return {campo: getattr(self, campo) for campo in self.__slots__}
+
+
+_tipos = {}
+_tipos_lock = threading.Lock()
+
+
+def _nome_valido(coluna):
+    return coluna.isidentifier() and not keyword.iskeyword(coluna) and not hasattr(Registro, coluna)
+
+
+def montador(colunas):
+    """Função linha (tupla) → registro para `colunas`, criada uma vez por
+    conjunto de colunas. Colunas repetidas ou que não sejam nomes Python
+    válidos (ex.: `?column?`) caem para dict."""
+    chave = tuple(colunas)
+    montar = _tipos.get(chave)
+    if montar is not None:
+        return montar
+    if len(set(chave)) != len(chave) or not all(_nome_valido(c) for c in chave):
+        def montar(linha):
+            return dict(zip(chave, linha))
+    else:
+        ordem = sorted(range(len(chave)), key=chave.__getitem__)
+        tipo = dataclasses.make_dataclass(
+            "Registro", [chave[i] for i in ordem], bases=(Registro,), slots=True, eq=False
+        )
+        if len(ordem) == 1:
+            def montar(linha):
+                return tipo(linha[0])
+        else:
+            pegar = operator.itemgetter(*ordem)
+
+            def montar(linha):
+                return tipo(*pegar(linha))
+    with _tipos_lock:
+        return _tipos.setdefault(chave, montar)
+
+
+def buscar_registros(cur, sql, params=None):
+    """Executa `sql` em `cur` (cursor de tuplas) e devolve a lista de registros."""
+    preparar_cursor(cur)
+    cur.execute(sql, params)
+    montar = montador([c[0] for c in cur.description])
+    return [montar(linha) for linha in cur.fetchall()]
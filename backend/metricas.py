@@ -0,0 +1,120 @@
+"""Métricas no formato de exposição do Prometheus (GET /metrics).
+
+Sob o gunicorn, `gunicorn.conf.py` define PROMETHEUS_MULTIPROC_DIR antes
+de os workers importarem a aplicação: cada worker grava os seus valores
+em arquivos nesse diretório e /metrics soma todos, seja qual for o worker
+que atender a coleta. Sem a variável (flask run, scripts) as métricas são
+as do próprio processo.
+
+- requisições e latência por método, rota (o template, ex.:
+  `/imoveis/<int:id_imovel>`, nunca a URL) e status;
+- tempo de banco e número de consultas por requisição, e avisos de N+1
+  (registrados por instrumentacao.py, só nas requisições que consultaram);
+- pool de conexões: em uso/ociosas/máximo somados entre workers vivos,
+  esperas, timeouts e tempo de retirada;
+- consultas aos caches (`CacheLRU(nome=...)`) por acerto/falta;
+- rejeições do rate limit (429) por rota;
+- compressão das respostas (compressao.py): respostas, bytes antes/depois
+  e CPU gasto por codificação;
+- eventos de auditoria descartados (fila cheia) ou não gravados.
+"""
+import os
+import time
+from flask import Response, g, request
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    REGISTRY,
+    CollectorRegistry,
+    Counter,
+    Gauge,
+    Histogram,
+    generate_latest,
+    multiprocess,
+)
+from config import METRICAS_TOKEN
+
+MULTIPROCESSO = "PROMETHEUS_MULTIPROC_DIR" in os.environ
+
+_BALDES = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+REQUISICOES = Counter(
+    "http_requisicoes_total", "Requisições atendidas", ["metodo", "rota", "status"]
+)
+LATENCIA = Histogram(
+    "http_requisicao_segundos", "Duração da requisição até a resposta",
+    ["metodo", "rota", "status"], buckets=_BALDES,
+)
+TEMPO_DB = Histogram(
+    "db_requisicao_segundos", "Tempo em consultas ao banco por requisição", ["rota"], buckets=_BALDES
+)
+POOL_CONEXOES = Gauge(
+    "db_pool_conexoes", "Conexões do pool por estado (soma dos workers vivos)",
+    ["estado"], multiprocess_mode="livesum",
+)
+POOL_ESPERAS = Counter("db_pool_esperas_total", "Retiradas que esperaram por conexão livre")
+POOL_TIMEOUTS = Counter("db_pool_timeouts_total", "Retiradas sem conexão livre dentro de DB_POOL_TIMEOUT")
+POOL_RETIRADA = Histogram(
+    "db_pool_retirada_segundos", "Tempo para obter uma conexão do pool",
+    buckets=(0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 10.0),
+)
+CONSULTAS_DB = Histogram(
+    "db_consultas_requisicao", "Consultas ao banco por requisição", ["rota"],
+    buckets=(1, 2, 3, 5, 10, 20, 50, 100),
+)
+N_MAIS_1 = Counter(
+    "db_n_mais_1_total", "Requisições com a mesma consulta repetida SQL_N_MAIS_1_MIN vezes ou mais", ["rota"]
+)
+CACHE = Counter("cache_consultas_total", "Consultas aos caches em memória", ["cache", "resultado"])
+AUDITORIA_DESCARTADOS = Counter("auditoria_descartados_total", "Eventos de auditoria descartados (fila cheia)")
+AUDITORIA_FALHAS = Counter("auditoria_falhas_total", "Eventos de auditoria que a saída não conseguiu gravar")
+RATE_LIMIT = Counter("rate_limit_rejeicoes_total", "Requisições recusadas pelo rate limit (429)", ["rota"])
+COMPRESSAO_RESPOSTAS = Counter("compressao_respostas_total", "Respostas comprimidas", ["codificacao"])
+COMPRESSAO_BYTES_ORIGINAIS = Counter(
+    "compressao_bytes_originais_total", "Bytes das respostas comprimidas antes da compressão", ["codificacao"]
+)
+COMPRESSAO_BYTES_COMPRIMIDOS = Counter(
+    "compressao_bytes_comprimidos_total", "Bytes das respostas comprimidas depois da compressão", ["codificacao"]
+)
+COMPRESSAO_CPU = Counter("compressao_cpu_segundos_total", "Tempo de CPU gasto comprimindo respostas", ["codificacao"])
+
+
+def rota_atual():
+    regra = request.url_rule
+    return regra.rule if regra is not None else "<sem rota>"
+
+
+def _registro():
+    if not MULTIPROCESSO:
+        return REGISTRY
+    registro = CollectorRegistry()
+    multiprocess.MultiProcessCollector(registro)
+    return registro
+
+
+def init_app(app):
+    """Registra a medição das requisições e a rota GET /metrics."""
+
+    @app.before_request
+    def _iniciar_medicao():
+        g._metricas_inicio = time.perf_counter()
+
+    @app.after_request
+    def _registrar_requisicao(response):
+        inicio = g.get("_metricas_inicio")
+        if inicio is None:
+            return response
+        rota = rota_atual()
+        status = str(response.status_code)
+        REQUISICOES.labels(request.method, rota, status).inc()
+        LATENCIA.labels(request.method, rota, status).observe(time.perf_counter() - inicio)
+        if response.status_code == 429:
+            RATE_LIMIT.labels(rota).inc()
+        return response
+
+    @app.route("/metrics", methods=["GET"])
+    def metrics():
+        if METRICAS_TOKEN:
+            token = request.headers.get("Authorization", "")
+            if token != f"Bearer {METRICAS_TOKEN}":
+                return Response("Token inválido\n", status=403, mimetype="text/plain")
+        return Response(generate_latest(_registro()), content_type=CONTENT_TYPE_LATEST)
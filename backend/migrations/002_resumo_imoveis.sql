@@ -0,0 +1,163 @@
+-- Resumo de investimento por imóvel (lido por GET /imoveis).
+--
+-- resumo_imoveis guarda, por imóvel, o total investido, o período (primeira
+-- e última data) e os totais por grupo dos lançamentos confirmados
+-- (id_situacao = 1, ativos), ignorando as categorias listadas em
+-- resumo_categorias_excluidas. Triggers por comando em lancamentos
+-- recalculam apenas os imóveis afetados por cada INSERT/UPDATE/DELETE.
+--
+-- As categorias excluídas vêm de RESUMO_CATEGORIAS_EXCLUIDAS (config.py);
+-- `flask --app app reconstruir-resumo` sincroniza a lista e recalcula tudo.
+-- (Desde a 009 a tabela é a única fonte; a variável saiu do config.)
+
+BEGIN;
+
+CREATE TABLE IF NOT EXISTS resumo_categorias_excluidas (
+    id_categoria integer PRIMARY KEY
+);
+
+INSERT INTO resumo_categorias_excluidas (id_categoria)
+VALUES (4), (8), (15), (18)
+ON CONFLICT DO NOTHING;
+
+CREATE TABLE IF NOT EXISTS resumo_imoveis (
+    id_imovel integer PRIMARY KEY REFERENCES imoveis (id) ON DELETE CASCADE,
+    total_investido numeric NOT NULL DEFAULT 0,
+    periodo_inicio date,
+    periodo_fim date,
+    grupos jsonb NOT NULL DEFAULT '[]'::jsonb,
+    atualizado_em timestamptz NOT NULL DEFAULT now()
+);
+
+-- Recalcula um conjunto de imóveis (NULL = todos)
+CREATE OR REPLACE FUNCTION fn_recalcular_resumo_imoveis(p_ids integer[])
+RETURNS void
+LANGUAGE sql
+AS $$
+    WITH filtrado AS (
+        SELECT l.id_imovel, l.valor, l.data, g.grupo
+        FROM lancamentos l
+        JOIN categorias c ON c.id = l.id_categoria
+        JOIN grupos g ON g.id = c.id_grupo
+        WHERE (p_ids IS NULL OR l.id_imovel = ANY (p_ids))
+          AND l.id_situacao = 1
+          AND (l.ativo IS DISTINCT FROM FALSE)
+          AND c.id NOT IN (SELECT id_categoria FROM resumo_categorias_excluidas)
+    ),
+    por_grupo AS (
+        SELECT id_imovel, grupo, SUM(valor) AS total
+        FROM filtrado
+        GROUP BY id_imovel, grupo
+    ),
+    calculado AS (
+        SELECT im.id AS id_imovel,
+               COALESCE(t.total_investido, 0) AS total_investido,
+               t.periodo_inicio,
+               t.periodo_fim,
+               COALESCE(gr.lista, '[]'::jsonb) AS grupos
+        FROM imoveis im
+        LEFT JOIN (
+            SELECT id_imovel,
+                   SUM(valor) AS total_investido,
+                   MIN(data) AS periodo_inicio,
+                   MAX(data) AS periodo_fim
+            FROM filtrado
+            GROUP BY id_imovel
+        ) t ON t.id_imovel = im.id
+        LEFT JOIN (
+            SELECT id_imovel,
+                   jsonb_agg(jsonb_build_object('grupo', grupo, 'total', total) ORDER BY grupo) AS lista
+            FROM por_grupo
+            GROUP BY id_imovel
+        ) gr ON gr.id_imovel = im.id
+        WHERE p_ids IS NULL OR im.id = ANY (p_ids)
+    )
+    INSERT INTO resumo_imoveis AS r (id_imovel, total_investido, periodo_inicio, periodo_fim, grupos, atualizado_em)
+    SELECT id_imovel, total_investido, periodo_inicio, periodo_fim, grupos, now()
+    FROM calculado
+    ON CONFLICT (id_imovel) DO UPDATE
+    SET total_investido = EXCLUDED.total_investido,
+        periodo_inicio = EXCLUDED.periodo_inicio,
+        periodo_fim = EXCLUDED.periodo_fim,
+        grupos = EXCLUDED.grupos,
+        atualizado_em = EXCLUDED.atualizado_em;
+$$;
+
+CREATE OR REPLACE FUNCTION trg_resumo_imoveis_lancamentos()
+RETURNS trigger
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    afetados integer[];
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        SELECT array_agg(DISTINCT id_imovel) INTO afetados
+        FROM novos WHERE id_imovel IS NOT NULL;
+    ELSIF TG_OP = 'DELETE' THEN
+        SELECT array_agg(DISTINCT id_imovel) INTO afetados
+        FROM antigos WHERE id_imovel IS NOT NULL;
+    ELSE
+        -- Só recalcula quando algo que entra no resumo mudou
+        SELECT array_agg(DISTINCT x.id_imovel) INTO afetados
+        FROM (
+            SELECT n.id_imovel, a.id_imovel AS id_anterior
+            FROM novos n
+            JOIN antigos a ON a.id = n.id
+            WHERE (n.id_imovel, n.id_categoria, n.id_situacao, n.valor, n.data, n.ativo)
+                  IS DISTINCT FROM
+                  (a.id_imovel, a.id_categoria, a.id_situacao, a.valor, a.data, a.ativo)
+        ) mudou
+        CROSS JOIN LATERAL (VALUES (mudou.id_imovel), (mudou.id_anterior)) AS x (id_imovel)
+        WHERE x.id_imovel IS NOT NULL;
+    END IF;
+
+    IF afetados IS NOT NULL THEN
+        PERFORM fn_recalcular_resumo_imoveis(afetados);
+    END IF;
+    RETURN NULL;
+END;
+$$;
+
+DROP TRIGGER IF EXISTS resumo_imoveis_ins ON lancamentos;
+CREATE TRIGGER resumo_imoveis_ins
+    AFTER INSERT ON lancamentos
+    REFERENCING NEW TABLE AS novos
+    FOR EACH STATEMENT EXECUTE FUNCTION trg_resumo_imoveis_lancamentos();
+
+DROP TRIGGER IF EXISTS resumo_imoveis_upd ON lancamentos;
+CREATE TRIGGER resumo_imoveis_upd
+    AFTER UPDATE ON lancamentos
+    REFERENCING OLD TABLE AS antigos NEW TABLE AS novos
+    FOR EACH STATEMENT EXECUTE FUNCTION trg_resumo_imoveis_lancamentos();
+
+DROP TRIGGER IF EXISTS resumo_imoveis_del ON lancamentos;
+CREATE TRIGGER resumo_imoveis_del
+    AFTER DELETE ON lancamentos
+    REFERENCING OLD TABLE AS antigos
+    FOR EACH STATEMENT EXECUTE FUNCTION trg_resumo_imoveis_lancamentos();
+
+-- Mudanças de grupo/nome de grupo afetam todos os imóveis (raras)
+CREATE OR REPLACE FUNCTION trg_resumo_imoveis_reconstruir()
+RETURNS trigger
+LANGUAGE plpgsql
+AS $$
+BEGIN
+    PERFORM fn_recalcular_resumo_imoveis(NULL);
+    RETURN NULL;
+END;
+$$;
+
+DROP TRIGGER IF EXISTS resumo_imoveis_categorias ON categorias;
+CREATE TRIGGER resumo_imoveis_categorias
+    AFTER UPDATE OF id_grupo ON categorias
+    FOR EACH STATEMENT EXECUTE FUNCTION trg_resumo_imoveis_reconstruir();
+
+DROP TRIGGER IF EXISTS resumo_imoveis_grupos ON grupos;
+CREATE TRIGGER resumo_imoveis_grupos
+    AFTER UPDATE OF grupo ON grupos
+    FOR EACH STATEMENT EXECUTE FUNCTION trg_resumo_imoveis_reconstruir();
+
+-- Carga inicial
+SELECT fn_recalcular_resumo_imoveis(NULL);
+
+COMMIT;
@@ -0,0 +1,17 @@
+-- Contadores de versão dos dados (ETag / If-None-Match nas rotas GET).
+-- Escopos: 'global' (qualquer escrita), 'referencia' (categorias/grupos)
+-- e 'imovel:<id>' (escritas que afetam o imóvel). Incrementados pelo
+-- backend (versoes.registrar_escrita) na mesma transação da escrita.
+
+BEGIN;
+
+CREATE TABLE IF NOT EXISTS versoes_dados (
+    escopo text PRIMARY KEY,
+    versao bigint NOT NULL DEFAULT 0
+);
+
+INSERT INTO versoes_dados (escopo, versao)
+VALUES ('global', 0), ('referencia', 0)
+ON CONFLICT DO NOTHING;
+
+COMMIT;
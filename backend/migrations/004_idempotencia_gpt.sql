@@ -0,0 +1,21 @@
+-- Chaves de idempotência do POST /gpt/lancamentos (IDEM_BACKEND=postgres).
+-- A reserva da chave, o INSERT do lançamento e a resposta gravada ficam na
+-- mesma transação: uma repetição concorrente espera o commit e recebe a
+-- resposta original. Linhas expiradas são reaproveitadas na reserva e
+-- apagadas aos poucos pelo backend.
+
+BEGIN;
+
+CREATE TABLE IF NOT EXISTS idempotencia_gpt (
+    chave text PRIMARY KEY,
+    impressao text NOT NULL,
+    status integer,
+    resposta jsonb,
+    criado_em timestamptz NOT NULL DEFAULT now(),
+    expira_em timestamptz NOT NULL
+);
+
+CREATE INDEX IF NOT EXISTS idx_idempotencia_gpt_expira_em
+    ON idempotencia_gpt (expira_em);
+
+COMMIT;
@@ -0,0 +1,25 @@
+-- Busca aproximada de imóveis e categorias (/imoveis/search, /categorias/search).
+-- Compara nomes sem acento e em minúsculas por trigramas (pg_trgm), com
+-- índices GIN sobre a mesma expressão usada nas consultas de search.py.
+-- unaccent() não é IMMUTABLE, por isso o wrapper f_unaccent para indexar.
+
+BEGIN;
+
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+CREATE EXTENSION IF NOT EXISTS unaccent;
+
+CREATE OR REPLACE FUNCTION f_unaccent(text)
+RETURNS text
+LANGUAGE sql
+IMMUTABLE PARALLEL SAFE STRICT
+AS $$
+    SELECT public.unaccent('public.unaccent'::regdictionary, $1)
+$$;
+
+CREATE INDEX IF NOT EXISTS idx_imoveis_nome_trgm
+    ON imoveis USING gin (f_unaccent(lower(nome)) gin_trgm_ops);
+
+CREATE INDEX IF NOT EXISTS idx_categorias_categoria_trgm
+    ON categorias USING gin (f_unaccent(lower(categoria)) gin_trgm_ops);
+
+COMMIT;
@@ -0,0 +1,27 @@
+-- Busca textual em lancamentos.descricao (GET /lancamentos/search).
+-- Configuração `portugues_sem_acento`: stemming do português depois de
+-- remover acentos ("elétrica" e "eletrico" caem no mesmo radical). O índice
+-- GIN usa exatamente a expressão das consultas de search.py; o índice em
+-- (id_imovel, data) atende os filtros combinados com a busca.
+-- Requer as extensões de 005_busca_trigram.sql (unaccent).
+
+BEGIN;
+
+DO $$
+BEGIN
+    IF NOT EXISTS (SELECT 1 FROM pg_ts_config WHERE cfgname = 'portugues_sem_acento') THEN
+        CREATE TEXT SEARCH CONFIGURATION portugues_sem_acento (COPY = portuguese);
+        ALTER TEXT SEARCH CONFIGURATION portugues_sem_acento
+            ALTER MAPPING FOR hword, hword_part, word
+            WITH unaccent, portuguese_stem;
+    END IF;
+END
+$$;
+
+CREATE INDEX IF NOT EXISTS idx_lancamentos_descricao_fts
+    ON lancamentos USING gin (to_tsvector('portugues_sem_acento', coalesce(descricao, '')));
+
+CREATE INDEX IF NOT EXISTS idx_lancamentos_imovel_data
+    ON lancamentos (id_imovel, data);
+
+COMMIT;
@@ -0,0 +1,24 @@
+-- Eventos de auditoria (AUDITORIA_SAIDA=postgres): escritas e rotas
+-- administrativas, gravados em lote pela thread de auditoria.py de cada
+-- worker. `criado_em` é o momento da requisição, não o da gravação.
+
+BEGIN;
+
+CREATE TABLE IF NOT EXISTS auditoria (
+    id bigserial PRIMARY KEY,
+    criado_em timestamptz NOT NULL,
+    metodo text NOT NULL,
+    caminho text NOT NULL,
+    status integer NOT NULL,
+    duracao_ms numeric,
+    ip text,
+    user_agent text,
+    tamanho_corpo integer NOT NULL DEFAULT 0,
+    chaves_json jsonb NOT NULL DEFAULT '[]'::jsonb,
+    token_editor boolean NOT NULL DEFAULT false
+);
+
+CREATE INDEX IF NOT EXISTS idx_auditoria_criado_em
+    ON auditoria (criado_em);
+
+COMMIT;
@@ -0,0 +1,88 @@
+-- Recalculo de resumo_imoveis sem perder atualizações concorrentes.
+--
+-- Em 002 o recálculo era um único comando: duas transações gravando
+-- lançamentos do mesmo imóvel (READ COMMITTED) calculavam cada uma a partir
+-- do próprio snapshot, e a segunda, ao fazer o upsert depois do commit da
+-- primeira, gravava totais sem a linha dela. Agora a função pega antes um
+-- advisory lock de transação por imóvel e só depois roda o recálculo, num
+-- comando novo: o snapshot já inclui o que a outra transação confirmou.
+--
+-- A ordem de id evita deadlock só dentro de um comando. Uma transação com
+-- vários comandos em lancamentos (o lote em páginas de
+-- models.adicionar_lancamentos_em_lote) pega antes os locks de todos os
+-- imóveis, em ordem, num único SELECT (models._bloquear_resumo).
+
+BEGIN;
+
+CREATE OR REPLACE FUNCTION fn_recalcular_resumo_imoveis(p_ids integer[])
+RETURNS void
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    v_id integer;
+BEGIN
+    -- Chave (2, id_imovel): o 2 separa estes locks de outros advisory locks
+    FOR v_id IN
+        SELECT DISTINCT x.id
+        FROM (
+            SELECT unnest(p_ids) AS id WHERE p_ids IS NOT NULL
+            UNION ALL
+            SELECT id FROM imoveis WHERE p_ids IS NULL
+        ) x
+        WHERE x.id IS NOT NULL
+        ORDER BY x.id
+    LOOP
+        PERFORM pg_advisory_xact_lock(2, v_id);
+    END LOOP;
+
+    WITH filtrado AS (
+        SELECT l.id_imovel, l.valor, l.data, g.grupo
+        FROM lancamentos l
+        JOIN categorias c ON c.id = l.id_categoria
+        JOIN grupos g ON g.id = c.id_grupo
+        WHERE (p_ids IS NULL OR l.id_imovel = ANY (p_ids))
+          AND l.id_situacao = 1
+          AND (l.ativo IS DISTINCT FROM FALSE)
+          AND c.id NOT IN (SELECT id_categoria FROM resumo_categorias_excluidas)
+    ),
+    por_grupo AS (
+        SELECT id_imovel, grupo, SUM(valor) AS total
+        FROM filtrado
+        GROUP BY id_imovel, grupo
+    ),
+    calculado AS (
+        SELECT im.id AS id_imovel,
+               COALESCE(t.total_investido, 0) AS total_investido,
+               t.periodo_inicio,
+               t.periodo_fim,
+               COALESCE(gr.lista, '[]'::jsonb) AS grupos
+        FROM imoveis im
+        LEFT JOIN (
+            SELECT id_imovel,
+                   SUM(valor) AS total_investido,
+                   MIN(data) AS periodo_inicio,
+                   MAX(data) AS periodo_fim
+            FROM filtrado
+            GROUP BY id_imovel
+        ) t ON t.id_imovel = im.id
+        LEFT JOIN (
+            SELECT id_imovel,
+                   jsonb_agg(jsonb_build_object('grupo', grupo, 'total', total) ORDER BY grupo) AS lista
+            FROM por_grupo
+            GROUP BY id_imovel
+        ) gr ON gr.id_imovel = im.id
+        WHERE p_ids IS NULL OR im.id = ANY (p_ids)
+    )
+    INSERT INTO resumo_imoveis AS r (id_imovel, total_investido, periodo_inicio, periodo_fim, grupos, atualizado_em)
+    SELECT id_imovel, total_investido, periodo_inicio, periodo_fim, grupos, now()
+    FROM calculado
+    ON CONFLICT (id_imovel) DO UPDATE
+    SET total_investido = EXCLUDED.total_investido,
+        periodo_inicio = EXCLUDED.periodo_inicio,
+        periodo_fim = EXCLUDED.periodo_fim,
+        grupos = EXCLUDED.grupos,
+        atualizado_em = EXCLUDED.atualizado_em;
+END;
+$$;
+
+COMMIT;
@@ -0,0 +1,18 @@
+-- resumo_categorias_excluidas passa a ser a única fonte das categorias
+-- fora do total investido de resumo_imoveis.
+--
+-- Antes a lista também existia em RESUMO_CATEGORIAS_EXCLUIDAS (config.py)
+-- e só era copiada para a tabela por `flask --app app reconstruir-resumo`:
+-- mudar uma sem a outra deixava o resumo calculado com a lista velha. A
+-- variável saiu do config; a lista se altera na tabela (ou com
+-- `reconstruir-resumo --excluir 4,8,15,18`) e qualquer mudança nela
+-- recalcula o resumo de todos os imóveis na mesma transação.
+
+BEGIN;
+
+DROP TRIGGER IF EXISTS resumo_imoveis_categorias_excluidas ON resumo_categorias_excluidas;
+CREATE TRIGGER resumo_imoveis_categorias_excluidas
+    AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON resumo_categorias_excluidas
+    FOR EACH STATEMENT EXECUTE FUNCTION trg_resumo_imoveis_reconstruir();
+
+COMMIT;
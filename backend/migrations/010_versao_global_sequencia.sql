@@ -0,0 +1,19 @@
+-- Versão `global` numa sequência em vez de uma linha de versoes_dados.
+--
+-- Toda escrita fazia upsert na mesma linha 'global', e o lock dessa linha
+-- ficava preso até o commit da requisição: escritas de imóveis diferentes
+-- esperavam umas pelas outras. nextval não trava nada. O backend chama
+-- nextval logo depois do commit da escrita (versoes.registrar_escrita), então
+-- quem lê a versão nova já enxerga os dados da escrita. Os escopos
+-- 'referencia' e 'imovel:<id>' continuam em versoes_dados.
+
+BEGIN;
+
+CREATE SEQUENCE IF NOT EXISTS versoes_global;
+
+-- Continua de onde a linha parou (um a mais: os caches só perdem uma vez)
+SELECT setval('versoes_global', COALESCE((SELECT versao FROM versoes_dados WHERE escopo = 'global'), 0) + 1);
+
+DELETE FROM versoes_dados WHERE escopo = 'global';
+
+COMMIT;
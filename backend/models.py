@@ -1,74 +1,39 @@
-from db_connection import conectar
+from db_connection import conexao
+from versoes import registrar_escrita
+import referencia
+from linhas import buscar_registros
+from psycopg2 import extras
+from datetime import date
 import json
 
+# Linhas por INSERT multi-linha na gravação em lote
+LOTE_PAGINA = 1000
+
 
 # ======================================================
 # 🔹 Funções para a tabela IMOVEIS
 # ======================================================
 
 def listar_imoveis():
-    conn, cur = conectar()
-    cur.execute("""
-        SELECT
-            im.id,
-            im.nome,
-            im.vendido,
-            COALESCE(res.total_investido, 0) AS total_investido,
-            res.periodo_inicio,
-            res.periodo_fim,
-            COALESCE(res.grupos, '[]'::json) AS grupos
-        FROM imoveis im
-        LEFT JOIN LATERAL (
-            WITH filtrado AS (
-                SELECT
-                    l.valor,
-                    l.data,
-                    g.grupo
-                FROM lancamentos l
-                JOIN categorias c ON c.id = l.id_categoria
-                JOIN grupos g ON g.id = c.id_grupo
-                WHERE l.id_imovel = im.id
-                  AND l.id_situacao = 1
-                  AND (l.ativo IS DISTINCT FROM FALSE)
-                  AND (l.id_categoria IS NULL OR c.id NOT IN (4, 8, 15, 18))
-            ),
-            totais AS (
-                SELECT
-                    COALESCE(SUM(valor), 0) AS total_investido,
-                    MIN(data) AS periodo_inicio,
-                    MAX(data) AS periodo_fim
-                FROM filtrado
-            ),
-            grupos AS (
-                SELECT
-                    json_agg(
-                        json_build_object('grupo', grupo, 'total', total)
-                        ORDER BY grupo
-                    ) AS lista
-                FROM (
-                    SELECT
-                        grupo,
-                        SUM(valor) AS total
-                    FROM filtrado
-                    GROUP BY grupo
-                    ORDER BY grupo
-                ) dados
-            )
+    """Lista os imóveis com o resumo de investimento pré-calculado em
+    `resumo_imoveis` (mantido por triggers em lancamentos; ver
+    migrations/002_resumo_imoveis.sql)."""
+    with conexao(cursor_factory=None) as (conn, cur):
+        imoveis = buscar_registros(cur, """
             SELECT
-                totais.total_investido,
-                totais.periodo_inicio,
-                totais.periodo_fim,
-                COALESCE(grupos.lista, '[]'::json) AS grupos
-            FROM totais, grupos
-        ) res ON TRUE
-        ORDER BY im.created_at DESC
-    """)
-    resultados = cur.fetchall()
-    conn.close()
-    imoveis = []
-    for row in resultados:
-        item = dict(row)
-        grupos = item.get("grupos")
+                im.id,
+                im.nome,
+                im.vendido,
+                COALESCE(r.total_investido, 0) AS total_investido,
+                r.periodo_inicio,
+                r.periodo_fim,
+                COALESCE(r.grupos, '[]'::jsonb) AS grupos
+            FROM imoveis im
+            LEFT JOIN resumo_imoveis r ON r.id_imovel = im.id
+            ORDER BY im.created_at DESC
+        """)
+    for item in imoveis:
+        grupos = item.grupos
         if isinstance(grupos, str):
             try:
                 grupos = json.loads(grupos)
@@ -76,38 +41,60 @@ def listar_imoveis():
                 grupos = []
         elif grupos is None:
             grupos = []
-        item["grupos"] = grupos
-        imoveis.append(item)
+        item.grupos = grupos
     return imoveis
 
+def reconstruir_resumo_imoveis(categorias_excluidas=None):
+    """Recalcula `resumo_imoveis` para todos os imóveis. Com
+    `categorias_excluidas`, troca antes a lista da tabela
+    `resumo_categorias_excluidas` (a única fonte; o trigger da migração 009
+    recalcula a cada mudança). Retorna quantos imóveis foram gravados."""
+    with conexao() as (conn, cur):
+        if categorias_excluidas is None:
+            cur.execute("SELECT fn_recalcular_resumo_imoveis(NULL)")
+        else:
+            # Um comando só: os triggers do DELETE e do INSERT rodam no fim dele, já com a lista nova
+            cur.execute("""
+                WITH nova AS (SELECT unnest(%s::integer[]) AS id_categoria),
+                removidas AS (
+                    DELETE FROM resumo_categorias_excluidas r
+                    WHERE r.id_categoria NOT IN (SELECT id_categoria FROM nova)
+                )
+                INSERT INTO resumo_categorias_excluidas (id_categoria)
+                SELECT id_categoria FROM nova
+                ON CONFLICT DO NOTHING
+            """, (sorted({int(c) for c in categorias_excluidas}),))
+        registrar_escrita(cur)
+        cur.execute("SELECT COUNT(*) FROM resumo_imoveis")
+        return cur.fetchone()[0]
+
 def adicionar_imovel(nome, vendido):
-    conn, cur = conectar()
-    cur.execute("""
-        INSERT INTO imoveis (nome, vendido) 
-        VALUES (%s, %s) 
-        RETURNING id
-    """, (nome, vendido))
-    imovel_id = cur.fetchone()[0]
-    conn.commit()
-    conn.close()
+    with conexao() as (conn, cur):
+        cur.execute("""
+            INSERT INTO imoveis (nome, vendido) 
+            VALUES (%s, %s) 
+            RETURNING id
+        """, (nome, vendido))
+        imovel_id = cur.fetchone()[0]
+        registrar_escrita(cur, imoveis=[imovel_id])
     return {"id": imovel_id, "nome": nome, "vendido": vendido}
 
-def buscar_imovel_por_id(imovel_id):
-    conn, cur = conectar()
-    cur.execute("""
-        SELECT id, created_at, nome, vendido, ganho_capital, corretagem, valor_venda, "bAtivo",
-               endereco, cpf_ocupante, nome_ocupante, latitude, longitude
-        FROM imoveis
-        WHERE id = %s
-    """, (imovel_id,))
-    
-    resultado = cur.fetchone()
-    if resultado:
-        colunas = [desc[0] for desc in cur.description]
-        conn.close()
-        return dict(zip(colunas, resultado))
-    
-    conn.close()
+def buscar_imovel_por_id(imovel_id, bloquear=False):
+    """Busca um imóvel. Com `bloquear=True` a linha fica travada (FOR UPDATE)
+    até o fim da transação, para leituras seguidas de escrita."""
+    with conexao() as (conn, cur):
+        cur.execute("""
+            SELECT id, created_at, nome, vendido, ganho_capital, corretagem, valor_venda, "bAtivo",
+                   endereco, cpf_ocupante, nome_ocupante, latitude, longitude
+            FROM imoveis
+            WHERE id = %s
+        """ + (" FOR UPDATE" if bloquear else ""), (imovel_id,))
+
+        resultado = cur.fetchone()
+        if resultado:
+            colunas = [desc[0] for desc in cur.description]
+            return dict(zip(colunas, resultado))
+
     return None
 
 def atualizar_imovel(
@@ -121,9 +108,14 @@ def atualizar_imovel(
     longitude=None,
     corretagem=None,
     ganho_capital=None,
-    valor_venda=None
+    valor_venda=None,
+    imovel=None
 ):
-    imovel = buscar_imovel_por_id(imovel_id)
+    """Atualiza o imóvel; os campos None mantêm o valor atual. `imovel` é a
+    linha já lida com `bloquear=True` na mesma transação, se o chamador a
+    tiver (evita ler e travar a linha de novo)."""
+    if imovel is None:
+        imovel = buscar_imovel_por_id(imovel_id, bloquear=True)
     if not imovel:
         return None
 
@@ -139,27 +131,25 @@ def atualizar_imovel(
     ganho_capital = float(str(ganho_capital).replace(',', '.')) if ganho_capital not in (None, '', ' ') else imovel.get("ganho_capital")
     valor_venda = float(str(valor_venda).replace(',', '.')) if valor_venda not in (None, '', ' ') else imovel.get("valor_venda")
 
-    conn, cur = conectar()
-    cur.execute("""
-        UPDATE imoveis
-        SET nome = %s,
-            vendido = %s,
-            endereco = %s,
-            nome_ocupante = %s,
-            cpf_ocupante = %s,
-            latitude = %s,
-            longitude = %s,
-            corretagem = %s,
-            ganho_capital = %s,
-            valor_venda = %s
-        WHERE id = %s
-    """, (
-        nome, vendido, endereco, nome_ocupante, cpf_ocupante,
-        latitude, longitude, corretagem, ganho_capital, valor_venda, imovel_id
-    ))
-
-    conn.commit()
-    conn.close()
+    with conexao() as (conn, cur):
+        cur.execute("""
+            UPDATE imoveis
+            SET nome = %s,
+                vendido = %s,
+                endereco = %s,
+                nome_ocupante = %s,
+                cpf_ocupante = %s,
+                latitude = %s,
+                longitude = %s,
+                corretagem = %s,
+                ganho_capital = %s,
+                valor_venda = %s
+            WHERE id = %s
+        """, (
+            nome, vendido, endereco, nome_ocupante, cpf_ocupante,
+            latitude, longitude, corretagem, ganho_capital, valor_venda, imovel_id
+        ))
+        registrar_escrita(cur, imoveis=[imovel_id])
 
     return {
         "id": imovel_id,
@@ -176,10 +166,9 @@ def atualizar_imovel(
     }
 
 def deletar_imovel(imovel_id):
-    conn, cur = conectar()
-    cur.execute("DELETE FROM imoveis WHERE id = %s", (imovel_id,))
-    conn.commit()
-    conn.close()
+    with conexao() as (conn, cur):
+        cur.execute("DELETE FROM imoveis WHERE id = %s", (imovel_id,))
+        registrar_escrita(cur, imoveis=[imovel_id])
     return {"message": f"Imóvel {imovel_id} deletado com sucesso"}
 
 # ======================================================
@@ -187,162 +176,307 @@ def deletar_imovel(imovel_id):
 # ======================================================
 
 def listar_categorias():
-    conn, cur = conectar()
-    cur.execute("SELECT * FROM categorias ORDER BY created_at DESC")
-    resultados = cur.fetchall()
-    conn.close()
-    return [dict(row) for row in resultados]
+    # Servido pelo cache de referência (recarregado quando categorias mudam)
+    return referencia.listar("categorias")
 
 def adicionar_categoria(categoria, dc):
-    conn, cur = conectar()
-    cur.execute("""
-        INSERT INTO categorias (categoria, dc) 
-        VALUES (%s, %s) 
-        RETURNING id
-    """, (categoria, dc))
-    categoria_id = cur.fetchone()[0]
-    conn.commit()
-    conn.close()
+    with conexao() as (conn, cur):
+        cur.execute("""
+            INSERT INTO categorias (categoria, dc) 
+            VALUES (%s, %s) 
+            RETURNING id
+        """, (categoria, dc))
+        categoria_id = cur.fetchone()[0]
+        registrar_escrita(cur, referencia=True)
+    referencia.invalidar()
     return {"id": categoria_id, "categoria": categoria, "dc": dc}
 
 def deletar_categoria(categoria_id):
-    conn, cur = conectar()
-    cur.execute("DELETE FROM categorias WHERE id = %s", (categoria_id,))
-    conn.commit()
-    conn.close()
+    with conexao() as (conn, cur):
+        cur.execute("DELETE FROM categorias WHERE id = %s", (categoria_id,))
+        registrar_escrita(cur, referencia=True)
+    referencia.invalidar()
     return {"message": f"Categoria {categoria_id} deletada com sucesso"}
 
 # ======================================================
 # 🔹 Funções para a tabela LANCAMENTOS
 # ======================================================
 
-def listar_lancamentos():
-    conn, cur = conectar()
-    cur.execute("SELECT * FROM lancamentos ORDER BY data DESC")
-    resultados = cur.fetchall()
-    conn.close()
-    return [dict(row) for row in resultados]
+SQL_LANCAMENTOS = "SELECT * FROM lancamentos ORDER BY data DESC"
 
 def adicionar_lancamento(data, id_imovel, id_categoria, id_situacao, descricao, valor, ativo):
-    conn, cur = conectar()
-    cur.execute("""
-        INSERT INTO lancamentos (data, id_imovel, id_categoria, id_situacao, descricao, valor, ativo) 
-        VALUES (%s, %s, %s, %s, %s, %s, %s) 
-        RETURNING id
-    """, (data, id_imovel, id_categoria, id_situacao, descricao, valor, ativo))
-    lancamento_id = cur.fetchone()[0]
-    conn.commit()
-    conn.close()
+    with conexao() as (conn, cur):
+        cur.execute("""
+            INSERT INTO lancamentos (data, id_imovel, id_categoria, id_situacao, descricao, valor, ativo) 
+            VALUES (%s, %s, %s, %s, %s, %s, %s) 
+            RETURNING id
+        """, (data, id_imovel, id_categoria, id_situacao, descricao, valor, ativo))
+        lancamento_id = cur.fetchone()[0]
+        registrar_escrita(cur, imoveis=[id_imovel])
     return {"id": lancamento_id, "descricao": descricao, "valor": valor}
 
-def adicionar_lancamentos_em_lote(lista_lancamentos):
-    """Adiciona uma lista de lançamentos em lote, aceitando datas em
-    DD/MM/YYYY ou YYYY-MM-DD, persistindo sempre em ISO (YYYY-MM-DD)."""
-    conn, cur = conectar()
+def adicionar_lancamento_validado(data, id_imovel, id_categoria, id_situacao, descricao, valor, ativo):
+    """Valida as chaves estrangeiras e insere o lançamento num único comando.
 
-    query = """
-        INSERT INTO lancamentos (data, id_imovel, id_categoria, id_situacao, descricao, valor, ativo)
-        VALUES (%s, %s, %s, %s, %s, %s, %s)
+    O INSERT ... SELECT só grava quando imóvel, categoria e situação existem;
+    o mesmo comando devolve qual chave faltou. Retorna `(lancamento, erro)`:
+    `erro` é None quando gravou, senão a mensagem da primeira chave ausente.
     """
+    with conexao() as (conn, cur):
+        cur.execute("""
+            WITH novo AS (
+                SELECT %s::date AS data, %s::bigint AS id_imovel, %s::bigint AS id_categoria,
+                       %s::bigint AS id_situacao, %s::text AS descricao, %s::numeric AS valor,
+                       %s::boolean AS ativo
+            ),
+            chaves AS (
+                SELECT EXISTS (SELECT 1 FROM imoveis i WHERE i.id = novo.id_imovel) AS imovel_ok,
+                       EXISTS (SELECT 1 FROM categorias c WHERE c.id = novo.id_categoria) AS categoria_ok,
+                       EXISTS (SELECT 1 FROM situacao_lancamento s WHERE s.id = novo.id_situacao) AS situacao_ok
+                FROM novo
+            ),
+            inserido AS (
+                INSERT INTO lancamentos (data, id_imovel, id_categoria, id_situacao, descricao, valor, ativo)
+                SELECT novo.data, novo.id_imovel, novo.id_categoria, novo.id_situacao,
+                       novo.descricao, novo.valor, novo.ativo
+                FROM novo, chaves
+                WHERE chaves.imovel_ok AND chaves.categoria_ok AND chaves.situacao_ok
+                RETURNING id
+            )
+            SELECT chaves.imovel_ok, chaves.categoria_ok, chaves.situacao_ok,
+                   (SELECT id FROM inserido) AS id
+            FROM chaves
+        """, (data, id_imovel, id_categoria, id_situacao, descricao, valor, ativo))
+        imovel_ok, categoria_ok, situacao_ok, lancamento_id = cur.fetchone()
+        if lancamento_id is None:
+            if not imovel_ok:
+                return None, "Imóvel inexistente"
+            if not categoria_ok:
+                return None, "Categoria inexistente"
+            return None, "Situação inexistente"
+        registrar_escrita(cur, imoveis=[id_imovel])
+    return {"id": lancamento_id, "descricao": descricao, "valor": valor}, None
+
+def _bloquear_resumo(cur, ids_imoveis):
+    """Pega, em ordem de id e num único comando, os advisory locks de
+    recálculo do resumo (chave (2, id_imovel), migrations/008) dos imóveis
+    que uma transação com vários comandos em lancamentos vai tocar. Sem
+    isso cada comando trava só os seus, e dois lotes concorrentes podiam
+    travá-los em ordens opostas (deadlock)."""
+    cur.execute("""
+        SELECT COUNT(pg_advisory_xact_lock(2, id))
+        FROM (SELECT DISTINCT unnest(%s::integer[]) AS id ORDER BY 1) ids
+    """, (sorted(ids_imoveis),))
+
+def _data_lote(valor):
+    """Normaliza a data de uma linha do lote (DD/MM/YYYY ou YYYY-MM-DD)
+    para `date`, sem imprimir erro por linha. Retorna None se inválida."""
+    data_str = str(valor or '').strip()
+    try:
+        if '/' in data_str:
+            dia, mes, ano = data_str.split('/')
+            return date(int(ano), int(mes), int(dia))
+        return date.fromisoformat(data_str)
+    except (ValueError, TypeError):
+        return None
 
-    for lancamento in lista_lancamentos:
-        # Normaliza a data para ISO usando o conversor padrão
-        data_str = lancamento.get('data', '').strip()
-        data_formatada = converter_data(data_str)
-
-        cur.execute(query, (
-            data_formatada,
-            lancamento['id_imovel'],
-            lancamento.get('id_categoria', 0),
-            lancamento.get('id_situacao', 1),
-            lancamento['descricao'],
-            lancamento['valor'],
-            True  # ativo
-        ))
 
-    conn.commit()
-    conn.close()
+def adicionar_lancamentos_em_lote(lista_lancamentos, tudo_ou_nada=True):
+    """Adiciona uma lista de lançamentos em lote, aceitando datas em
+    DD/MM/YYYY ou YYYY-MM-DD, persistindo sempre em ISO (YYYY-MM-DD).
 
-    return len(lista_lancamentos)
+    Todas as linhas são validadas antes de gravar: campos, datas e valores
+    em Python; imóveis com uma única consulta para o lote inteiro;
+    categorias e situações no cache de referência. As linhas válidas são inseridas com INSERT multi-linha
+    (`execute_values`) em páginas de LOTE_PAGINA.
 
-def excluir_lancamento(id_lancamento):
-    conn, cur = conectar()
+    Com `tudo_ou_nada=True`, qualquer linha inválida impede a gravação do
+    lote; caso contrário, as válidas são gravadas e as demais reportadas.
+
+    Retorna `{"ids": [...], "inseridos": n, "erros": [{"linha", "erros"}]}`,
+    com `linha` começando em 1 e `ids` na mesma ordem das linhas gravadas.
+    """
+    linhas = []
+    erros = []
+    for indice, lancamento in enumerate(lista_lancamentos, start=1):
+        problemas = []
+        if not isinstance(lancamento, dict):
+            erros.append({"linha": indice, "erros": ["Linha deve ser um objeto"]})
+            continue
+
+        data = _data_lote(lancamento.get('data'))
+        if data is None:
+            problemas.append(f"Data inválida: {lancamento.get('data')!r} (use DD/MM/AAAA ou YYYY-MM-DD)")
+
+        ids = {}
+        for campo, padrao in (('id_imovel', None), ('id_categoria', 0), ('id_situacao', 1)):
+            bruto = lancamento.get(campo, padrao)
+            try:
+                ids[campo] = int(bruto)
+            except (TypeError, ValueError):
+                problemas.append(f"{campo} inválido: {bruto!r}")
+
+        try:
+            valor = float(lancamento.get('valor'))
+        except (TypeError, ValueError):
+            valor = None
+            problemas.append(f"Valor inválido: {lancamento.get('valor')!r}")
+
+        descricao = lancamento.get('descricao')
+        if descricao is None or not str(descricao).strip():
+            problemas.append("Descrição obrigatória")
+
+        if problemas:
+            erros.append({"linha": indice, "erros": problemas})
+            continue
+        linhas.append((indice, data, ids['id_imovel'], ids['id_categoria'], ids['id_situacao'], descricao, valor))
+
+    with conexao() as (conn, cur):
+        if linhas:
+            # Imóveis do lote inteiro numa só ida ao banco
+            cur.execute(
+                "SELECT id FROM imoveis WHERE id = ANY(%s)",
+                (list({l[2] for l in linhas}),),
+            )
+            imoveis_existentes = {row[0] for row in cur.fetchall()}
+
+            validas = []
+            for linha in linhas:
+                indice, _, id_imovel, id_categoria, id_situacao, _, _ = linha
+                problemas = []
+                if id_imovel not in imoveis_existentes:
+                    problemas.append(f"Imóvel inexistente: {id_imovel}")
+                if not referencia.existe_categoria(id_categoria):
+                    problemas.append(f"Categoria inexistente: {id_categoria}")
+                if not referencia.existe_situacao(id_situacao):
+                    problemas.append(f"Situação inexistente: {id_situacao}")
+                if problemas:
+                    erros.append({"linha": indice, "erros": problemas})
+                else:
+                    validas.append(linha)
+            linhas = validas
+
+        erros.sort(key=lambda e: e["linha"])
+        if not linhas or (erros and tudo_ou_nada):
+            return {"ids": [], "inseridos": 0, "erros": erros}
+
+        if len(linhas) > LOTE_PAGINA:
+            # Mais de uma página = mais de um INSERT (e de um trigger de resumo)
+            _bloquear_resumo(cur, {l[2] for l in linhas})
+        retornados = extras.execute_values(
+            cur,
+            """
+            INSERT INTO lancamentos (data, id_imovel, id_categoria, id_situacao, descricao, valor, ativo)
+            VALUES %s
+            RETURNING id
+            """,
+            [(l[1], l[2], l[3], l[4], l[5], l[6], True) for l in linhas],
+            page_size=LOTE_PAGINA,
+            fetch=True,
+        )
+        registrar_escrita(cur, imoveis={l[2] for l in linhas})
 
+    return {"ids": [r[0] for r in retornados], "inseridos": len(retornados), "erros": erros}
+
+def excluir_lancamento(id_lancamento):
     try:
-        with conn.cursor() as cur:
-            query = "DELETE FROM lancamentos WHERE id = %s"
+        with conexao() as (conn, cur):
+            query = "DELETE FROM lancamentos WHERE id = %s RETURNING id_imovel"
             cur.execute(query, (id_lancamento,))
-        
-        conn.commit()
+            registrar_escrita(cur, imoveis=[r[0] for r in cur.fetchall()])
+
         print(f"Lançamento {id_lancamento} excluído com sucesso.")
 
     except Exception as e:
-        conn.rollback()
         print(f"Erro ao excluir lançamento: {e}")
         raise e
 
-    finally:
-        conn.close()
-
 # ======================================================
 # 🔹 Funções para Dashboard - Lançamentos Views
 # ======================================================
 
-def listar_lancamentos_completos_view(id_imovel):
-    conn, cur = conectar()
-    cur.execute("""
-        SELECT * FROM vw_lancamentos_completos
-        WHERE id_imovel = %s
-        ORDER BY data DESC
-    """, (id_imovel,))
-    resultados = cur.fetchall()
-    conn.close()
-
-    lista_tratada = []
-    for row in resultados:
-        linha = dict(row)
-        data_obj = linha.get('data')
-        if data_obj:
-            linha['data'] = data_obj.strftime('%d/%m/%Y')
-        lista_tratada.append(linha)
+# Ordenação das views: datas nulas primeiro, como no ORDER BY data DESC de antes
+_ORDEM_VIEW = "data DESC NULLS FIRST, id_lancamento DESC"
 
-    return lista_tratada
 
-def listar_lancamentos_incompletos_view(id_imovel):
-    conn, cur = conectar()
-    cur.execute("""
-        SELECT * FROM vw_lancamentos_incompletos
-        ORDER BY data DESC
-    """, (id_imovel,))
-    resultados = cur.fetchall()
-    conn.close()
-
-    lista_tratada = []
-    for row in resultados:
-        linha = dict(row)
-        data_obj = linha.get('data')
-        if data_obj:
-            linha['data'] = data_obj.strftime('%d/%m/%Y')
-        lista_tratada.append(linha)
+def _listar_view_lancamentos(view, id_imovel, de=None, ate=None, categorias=None,
+                             cursor=None, limite=None, incluir_sem_imovel=False):
+    """Lista uma view de lançamentos do imóvel, ordenada por (data, id)
+    decrescente, com filtros aplicados no SQL.
 
+    `cursor` é o par (data ISO ou None, id_lancamento) do último item da
+    página anterior. Com `limite`, retorna `(itens, proximo_cursor)`;
+    `proximo_cursor` é None na última página.
+    """
+    if incluir_sem_imovel:
+        condicoes = ["(id_imovel = %s OR id_imovel IS NULL)"]
+    else:
+        condicoes = ["id_imovel = %s"]
+    params = [id_imovel]
+    if de:
+        condicoes.append("data >= %s")
+        params.append(de)
+    if ate:
+        condicoes.append("data <= %s")
+        params.append(ate)
+    if categorias:
+        condicoes.append("id_categoria = ANY(%s)")
+        params.append(list(categorias))
+    if cursor:
+        data_cursor, id_cursor = cursor
+        if data_cursor is None:
+            # Ainda nas datas nulas: as restantes delas e depois todas as datadas
+            condicoes.append("(data IS NOT NULL OR id_lancamento < %s)")
+            params.append(id_cursor)
+        else:
+            # Data nula na linha dá NULL na comparação: já saíram nas primeiras páginas
+            condicoes.append("(data, id_lancamento) < (%s::date, %s)")
+            params.extend(cursor)
+    sql = f"""
+        SELECT * FROM {view}
+        WHERE {' AND '.join(condicoes)}
+        ORDER BY {_ORDEM_VIEW}
+    """
+    if limite:
+        # Uma linha a mais indica se existe próxima página
+        sql += " LIMIT %s"
+        params.append(limite + 1)
+
+    # Registros compactos; `data` já vem como DD/MM/AAAA do driver (linhas.py)
+    with conexao(cursor_factory=None) as (conn, cur):
+        lista_tratada = buscar_registros(cur, sql, params)
+
+    proximo_cursor = None
+    if limite and len(lista_tratada) > limite:
+        lista_tratada = lista_tratada[:limite]
+        ultimo = lista_tratada[-1]
+        data_ultimo = converter_data(ultimo.data) if ultimo.data else 'null'
+        proximo_cursor = f"{data_ultimo}_{ultimo.id_lancamento}"
+
+    if limite:
+        return lista_tratada, proximo_cursor
     return lista_tratada
 
+def listar_lancamentos_completos_view(id_imovel, **filtros):
+    return _listar_view_lancamentos("vw_lancamentos_completos", id_imovel, **filtros)
+
+def listar_lancamentos_incompletos_view(id_imovel, **filtros):
+    # Inclui os ainda sem imóvel, que podem ser completados de qualquer página
+    return _listar_view_lancamentos(
+        "vw_lancamentos_incompletos", id_imovel, incluir_sem_imovel=True, **filtros
+    )
+
 # ======================================================
 # 🔹 Funções Resumo Financeiro
 # ======================================================
 
 def listar_resumo_financeiro(id_imovel):
-    conn, cur = conectar()
-    cur.execute("""
-        SELECT id_imovel, id_grupo, grupo, valor_efetivado, valor_em_contratacao, valor_total, orcamento
-        FROM vw_orcamento_execucao
-        WHERE id_imovel = %s
-    """, (id_imovel,))
-    resultados = cur.fetchall()
-    colunas = [desc[0] for desc in cur.description]
-    conn.close()
-
-    return [dict(zip(colunas, row)) for row in resultados]
+    with conexao(cursor_factory=None) as (conn, cur):
+        return buscar_registros(cur, """
+            SELECT id_imovel, id_grupo, grupo, valor_efetivado, valor_em_contratacao, valor_total, orcamento
+            FROM vw_orcamento_execucao
+            WHERE id_imovel = %s
+        """, (id_imovel,))
 
 # ======================================================
 # 🔹 Funções auxiliares — Atualização e últimos lançamentos
@@ -351,17 +485,16 @@ def listar_resumo_financeiro(id_imovel):
 def obter_data_ultima_atualizacao():
     """Retorna a maior data entre lançamentos confirmados (id_situacao = 1)
     com data menor ou igual à data atual. Retorna string DD/MM/AAAA ou None."""
-    conn, cur = conectar()
-    cur.execute(
-        """
-        SELECT MAX(data) AS ultima_data
-        FROM lancamentos
-        WHERE id_situacao = 1
-          AND data <= CURRENT_DATE
-        """
-    )
-    row = cur.fetchone()
-    conn.close()
+    with conexao() as (conn, cur):
+        cur.execute(
+            """
+            SELECT MAX(data) AS ultima_data
+            FROM lancamentos
+            WHERE id_situacao = 1
+              AND data <= CURRENT_DATE
+            """
+        )
+        row = cur.fetchone()
     if not row or not row[0]:
         return None
     try:
@@ -388,41 +521,22 @@ def listar_ultimos_lancamentos_confirmados(limit=10):
     if limit > 50:
         limit = 50
 
-    conn, cur = conectar()
-    cur.execute(
-        """
-        SELECT l.data, l.descricao, l.valor, i.nome AS imovel, c.categoria AS categoria
-        FROM lancamentos l
-        JOIN imoveis i ON i.id = l.id_imovel
-        JOIN categorias c ON c.id = l.id_categoria
-        WHERE l.id_situacao = 1
-          AND l.data <= CURRENT_DATE
-          AND l.id_categoria <> 0
-        ORDER BY l.data DESC, l.id DESC
-        LIMIT %s
-        """,
-        (limit,),
-    )
-    rows = cur.fetchall()
-    conn.close()
-
-    itens = []
-    for r in rows:
-        item = dict(r)
-        d = item.get('data')
-        if d:
-            try:
-                item['data'] = d.strftime('%d/%m/%Y')
-            except Exception:
-                s = str(d)
-                if '-' in s:
-                    partes = s.split('-')
-                    if len(partes) == 3:
-                        item['data'] = f"{partes[2]}/{partes[1]}/{partes[0]}"
-                else:
-                    item['data'] = s
-        itens.append(item)
-    return itens
+    with conexao(cursor_factory=None) as (conn, cur):
+        return buscar_registros(
+            cur,
+            """
+            SELECT l.data, l.descricao, l.valor, i.nome AS imovel, c.categoria AS categoria
+            FROM lancamentos l
+            JOIN imoveis i ON i.id = l.id_imovel
+            JOIN categorias c ON c.id = l.id_categoria
+            WHERE l.id_situacao = 1
+              AND l.data <= CURRENT_DATE
+              AND l.id_categoria <> 0
+            ORDER BY l.data DESC, l.id DESC
+            LIMIT %s
+            """,
+            (limit,),
+        )
 
 
 def listar_totais_mensais_por_imovel(meses=6, categorias_excluidas=None):
@@ -447,141 +561,134 @@ def listar_totais_mensais_por_imovel(meses=6, categorias_excluidas=None):
 
     intervalo = max(meses - 1, 0)
 
-    conn, cur = conectar()
-    try:
-        base_sql = [
-            "SELECT",
-            "    DATE_TRUNC('month', l.data) AS mes,",
-            "    i.id AS id_imovel,",
-            "    i.nome AS nome_imovel,",
-            "    SUM(l.valor) AS total",
-            "FROM lancamentos l",
-            "JOIN imoveis i ON i.id = l.id_imovel",
-            "WHERE l.id_situacao = 1",
-            "  AND (l.ativo IS DISTINCT FROM FALSE)",
-        ]
-
-        params = []
-
-        if categorias_excluidas:
-            base_sql.append("  AND (l.id_categoria IS NULL OR l.id_categoria NOT IN %s)")
-            params.append(tuple(sorted(set(categorias_excluidas))))
-
-        if intervalo > 0:
-            base_sql.append(
-                "  AND l.data >= DATE_TRUNC('month', CURRENT_DATE) - INTERVAL '1 month' * %s"
-            )
-            params.append(intervalo)
+    base_sql = [
+        "SELECT",
+        "    DATE_TRUNC('month', l.data) AS mes,",
+        "    i.id AS id_imovel,",
+        "    i.nome AS nome_imovel,",
+        "    SUM(l.valor) AS total",
+        "FROM lancamentos l",
+        "JOIN imoveis i ON i.id = l.id_imovel",
+        "WHERE l.id_situacao = 1",
+        "  AND (l.ativo IS DISTINCT FROM FALSE)",
+    ]
 
-        base_sql.append("GROUP BY mes, i.id, i.nome")
-        base_sql.append("ORDER BY mes ASC, i.nome ASC")
+    params = []
 
-        sql = "\n".join(base_sql)
+    if categorias_excluidas:
+        base_sql.append("  AND (l.id_categoria IS NULL OR l.id_categoria NOT IN %s)")
+        params.append(tuple(sorted(set(categorias_excluidas))))
 
+    if intervalo > 0:
+        base_sql.append(
+            "  AND l.data >= DATE_TRUNC('month', CURRENT_DATE) - INTERVAL '1 month' * %s"
+        )
+        params.append(intervalo)
+
+    base_sql.append("GROUP BY mes, i.id, i.nome")
+    base_sql.append("ORDER BY mes ASC, i.nome ASC")
+
+    sql = "\n".join(base_sql)
+
+    with conexao() as (conn, cur):
         cur.execute(sql, tuple(params))
         rows = cur.fetchall()
-        resultados = []
-        for mes, id_imovel, nome_imovel, total in rows:
-            try:
-                mes_iso = mes.strftime('%Y-%m-01')
-            except Exception:
-                mes_iso = str(mes)
-            resultados.append(
-                {
-                    "mes": mes_iso,
-                    "id_imovel": id_imovel,
-                    "nome_imovel": nome_imovel,
-                    "total": float(total or 0),
-                }
-            )
-        return resultados
-    finally:
-        conn.close()
+
+    resultados = []
+    for mes, id_imovel, nome_imovel, total in rows:
+        try:
+            mes_iso = mes.strftime('%Y-%m-01')
+        except Exception:
+            mes_iso = str(mes)
+        resultados.append(
+            {
+                "mes": mes_iso,
+                "id_imovel": id_imovel,
+                "nome_imovel": nome_imovel,
+                "total": float(total or 0),
+            }
+        )
+    return resultados
 
 # ======================================================
 # 🔹 Funções para ORÇAMENTOS
 # ======================================================
 
 def listar_orcamentos_por_imovel(id_imovel):
-    conn, cur = conectar()
-
-    # Orçamentos já existentes para o imóvel
-    cur.execute("""
-        SELECT o.id_imovel, o.id_grupo, COALESCE(o.orcamento, 0) AS orcamento, g.grupo AS descricao
-        FROM orcamentos o
-        INNER JOIN grupos g ON o.id_grupo = g.id
-        WHERE o.id_imovel = %s
-    """, (id_imovel,))
-    orcamentos = cur.fetchall()
-
-    # Grupos que ainda não possuem orçamento para o imóvel
-    cur.execute("""
-        SELECT g.id, g.grupo 
-        FROM grupos g
-        WHERE g.id NOT IN (
-            SELECT id_grupo FROM orcamentos WHERE id_imovel = %s
-        )
-    """, (id_imovel,))
-    grupos_sem_orcamento = cur.fetchall()
-
-    conn.close()
-
-    # Adiciona grupos sem orçamento com valor zero
-    lista_orcamentos = [
+    """Todos os grupos com o orçamento do imóvel (0 quando não cadastrado).
+    Grupos sem orçamento vêm primeiro, como na tela de edição."""
+    with conexao() as (conn, cur):
+        cur.execute("""
+            SELECT g.id AS id_grupo,
+                   COALESCE(o.orcamento, 0) AS orcamento,
+                   g.grupo AS descricao
+            FROM grupos g
+            LEFT JOIN orcamentos o
+                   ON o.id_grupo = g.id
+                  AND o.id_imovel = %s
+            ORDER BY (o.id_grupo IS NOT NULL), g.id
+        """, (id_imovel,))
+        resultados = cur.fetchall()
+
+    return [
         {
             "id_imovel": id_imovel,
             "id_grupo": row[0],
-            "orcamento": 0.0,
-            "descricao": row[1]
-        } for row in grupos_sem_orcamento
+            "orcamento": float(row[1]),
+            "descricao": row[2]
+        } for row in resultados
     ]
 
-    # Adiciona os orçamentos existentes
-    for row in orcamentos:
-        lista_orcamentos.append({
-            "id_imovel": row[0],
-            "id_grupo": row[1],
-            "orcamento": float(row[2]),
-            "descricao": row[3]
-        })
-
-    return lista_orcamentos
-
 def atualizar_inserir_orcamentos(id_imovel, orcamentos):
-    conn, cur = conectar()
-
+    """Grava a lista de orçamentos do imóvel com um único
+    INSERT ... ON CONFLICT (id_imovel, id_grupo) DO UPDATE, apoiado na
+    chave primária da tabela. Retorna as linhas gravadas."""
+    # Um grupo repetido na lista faria o ON CONFLICT atingir a mesma linha
+    # duas vezes no mesmo comando; prevalece o último valor enviado.
+    por_grupo = {}
     for item in orcamentos:
-        id_grupo = item.get("id_grupo")
-        orcamento = item.get("orcamento", 0)
-
-        # Tenta atualizar
-        cur.execute("""
-            UPDATE orcamentos
-            SET orcamento = %s
-            WHERE id_imovel = %s AND id_grupo = %s
-        """, (orcamento, id_imovel, id_grupo))
-
-        # Se não encontrou registro para update, faz insert
-        if cur.rowcount == 0:
-            cur.execute("""
-                INSERT INTO orcamentos (id_imovel, id_grupo, orcamento)
-                VALUES (%s, %s, %s)
-            """, (id_imovel, id_grupo, orcamento))
-
-    conn.commit()
-    conn.close()
+        try:
+            id_grupo = int(item.get("id_grupo"))
+            orcamento = float(item.get("orcamento") or 0)
+        except (AttributeError, TypeError, ValueError):
+            raise ValueError(f"Orçamento inválido: {item!r}")
+        por_grupo[id_grupo] = orcamento
+
+    if not por_grupo:
+        return {"message": "Orçamentos atualizados com sucesso!", "orcamentos": []}
+
+    with conexao() as (conn, cur):
+        linhas = extras.execute_values(
+            cur,
+            """
+            INSERT INTO orcamentos (id_imovel, id_grupo, orcamento)
+            VALUES %s
+            ON CONFLICT (id_imovel, id_grupo)
+            DO UPDATE SET orcamento = EXCLUDED.orcamento
+            RETURNING id_imovel, id_grupo, orcamento
+            """,
+            [(id_imovel, id_grupo, orcamento) for id_grupo, orcamento in por_grupo.items()],
+            fetch=True,
+        )
+        registrar_escrita(cur, imoveis=[id_imovel])
 
-    return {"message": "Orçamentos atualizados com sucesso!"}
+    return {
+        "message": "Orçamentos atualizados com sucesso!",
+        "orcamentos": [
+            {"id_imovel": r[0], "id_grupo": r[1], "orcamento": float(r[2] or 0)}
+            for r in linhas
+        ],
+    }
 
 
 
 def alterar_lancamento(id_lancamento, dados):
-    conn, cur = conectar()
-
     try:
-        with conn.cursor() as cur:
+        with conexao() as (conn, cur):
+            # O FROM enxerga a linha antes do UPDATE: devolve o imóvel antigo
+            # e o novo para invalidar os dois (o lançamento pode mudar de imóvel)
             query = """
-                UPDATE lancamentos
+                UPDATE lancamentos l
                 SET
                     data = %s,
                     descricao = %s,
@@ -589,7 +696,10 @@ def alterar_lancamento(id_lancamento, dados):
                     id_categoria = %s,
                     id_imovel = %s,
                     id_situacao = %s
-                WHERE id = %s
+                FROM lancamentos antigo
+                WHERE l.id = %s
+                  AND antigo.id = l.id
+                RETURNING antigo.id_imovel, l.id_imovel
             """
 
             # Converte a data antes de salvar
@@ -604,18 +714,15 @@ def alterar_lancamento(id_lancamento, dados):
                 dados['id_situacao'],
                 id_lancamento
             ))
+            afetados = {id_imovel for linha in cur.fetchall() for id_imovel in linha}
+            registrar_escrita(cur, imoveis=afetados)
 
-        conn.commit()
         print(f"Lançamento {id_lancamento} alterado com sucesso.")
 
     except Exception as e:
-        conn.rollback()
         print(f"Erro ao alterar lançamento: {e}")
         raise e
 
-    finally:
-        conn.close()
-
 def converter_data(data_str):
     """Converte datas de DD/MM/YYYY ou YYYY-MM-DD para YYYY-MM-DD.
     Lança exceção com mensagem clara se o formato for inválido."""
@@ -0,0 +1,61 @@
+"""Cache dos dados de referência: categorias, grupos e situações.
+
+Essas tabelas mudam raramente, então cada worker as carrega uma vez e
+responde listagens e validações de chave estrangeira da memória. A chave
+do cache inclui a versão `referencia` (ver versoes.py): escritas em
+categorias feitas por qualquer worker mudam a versão e forçam a recarga.
+O TTL cobre alterações feitas direto no banco.
+"""
+from cache import CacheLRU
+from config import REF_CACHE_TTL_SEC, REF_CACHE_MAX_ITENS
+from db_connection import conexao
+from versoes import versoes_atuais, REFERENCIA
+
+_CONSULTAS = {
+    "categorias": "SELECT * FROM categorias ORDER BY created_at DESC",
+    "grupos": "SELECT * FROM grupos ORDER BY id",
+    "situacoes": "SELECT * FROM situacao_lancamento ORDER BY id",
+}
+
+_cache = CacheLRU(max_itens=REF_CACHE_MAX_ITENS, ttl=REF_CACHE_TTL_SEC, nome="referencia")
+
+
+def _tabela(nome):
+    """Linhas da tabela (lista de dicts) e índice por id, do cache."""
+    chave = (nome, versoes_atuais().get(REFERENCIA, 0))
+    achou, valor = _cache.get(chave)
+    if achou:
+        return valor
+    with conexao() as (conn, cur):
+        cur.execute(_CONSULTAS[nome])
+        linhas = [dict(row) for row in cur.fetchall()]
+    valor = (linhas, {linha["id"]: linha for linha in linhas})
+    _cache.set(chave, valor)
+    return valor
+
+
+def listar(nome):
+    """Cópia das linhas de `categorias`, `grupos` ou `situacoes`."""
+    linhas, _ = _tabela(nome)
+    return [dict(linha) for linha in linhas]
+
+
+def existe(nome, id_):
+    _, por_id = _tabela(nome)
+    return id_ in por_id
+
+
+def existe_categoria(id_categoria):
+    return existe("categorias", id_categoria)
+
+
+def existe_situacao(id_situacao):
+    return existe("situacoes", id_situacao)
+
+
+def invalidar():
+    _cache.limpar()
+
+
+def estatisticas():
+    return _cache.estatisticas()
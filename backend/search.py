@@ -1,8 +1,10 @@
 from flask import Blueprint, request, jsonify
-from db_connection import conectar
+from db_connection import conexao
 from ratelimit import limiter
-from config import RATE_LIMIT_SEARCH, ALLOWED_ORIGINS_LIST
+from config import RATE_LIMIT_SEARCH, ALLOWED_ORIGINS_LIST, SEARCH_SIMILARIDADE_MIN
 from flask_cors import CORS
+from datetime import date
+from models import converter_data
 
 search_bp = Blueprint('search', __name__)
 CORS(search_bp, resources={r"/*": {"origins": ALLOWED_ORIGINS_LIST or "*"}})
@@ -13,88 +15,197 @@ def _paginate_params():
         limit = int(request.args.get('limit', 10))
     except Exception:
         limit = 10
+    # Paginação por cursor: id do último item da página anterior
     try:
-        offset = int(request.args.get('offset', 0))
+        cursor = int(request.args['cursor']) if request.args.get('cursor') else None
     except Exception:
-        offset = 0
+        cursor = None
     # bounds
     if limit < 1:
         limit = 1
     if limit > 50:
         limit = 50
-    if offset < 0:
-        offset = 0
-    return limit, offset
+    return limit, cursor
+
+
+def _escapar_like(texto):
+    return texto.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+
+
+def sql_busca(tabela, coluna):
+    """Busca aproximada, sem acento, por `coluna` (índice GIN de trigramas em
+    migrations/005_busca_trigram.sql), ordenada por score decrescente e id.
+
+    O cursor é o id do último item: a próxima página começa depois do par
+    (score, id) desse item, recalculado na própria consulta.
+    """
+    return f"""
+        SELECT set_config('pg_trgm.word_similarity_threshold', %(similaridade)s, true);
+        WITH termo AS (
+            SELECT f_unaccent(lower(%(q)s)) AS t, f_unaccent(lower(%(padrao)s)) AS padrao
+        ),
+        candidatos AS (
+            SELECT x.id, x.{coluna},
+                   round(word_similarity(termo.t, f_unaccent(lower(x.{coluna})))::numeric, 4) AS score
+            FROM {tabela} x, termo
+            WHERE termo.t <%% f_unaccent(lower(x.{coluna}))
+               OR f_unaccent(lower(x.{coluna})) LIKE termo.padrao
+        )
+        SELECT id, {coluna}, score
+        FROM candidatos c
+        WHERE %(cursor)s IS NULL
+           OR (c.score, -c.id) < (SELECT score, -id FROM candidatos WHERE id = %(cursor)s)
+        ORDER BY score DESC, id
+        LIMIT %(limit)s
+    """
+
+
+def _buscar(cur, tabela, coluna, q, limit, cursor):
+    cur.execute(
+        sql_busca(tabela, coluna),
+        {
+            "similaridade": str(SEARCH_SIMILARIDADE_MIN),
+            "q": q,
+            "padrao": f"%{_escapar_like(q)}%",
+            "cursor": cursor,
+            "limit": limit,
+        },
+    )
+    return [{"id": r[0], coluna: r[1], "score": float(r[2])} for r in cur.fetchall()]
 
 
 @search_bp.route('/imoveis/search', methods=['GET'])
 @limiter.limit(RATE_LIMIT_SEARCH)
 def search_imoveis():
     q = request.args.get('q', '').strip()
-    limit, offset = _paginate_params()
+    limit, cursor = _paginate_params()
 
-    conn, cur = conectar()
-    try:
+    with conexao() as (conn, cur):
         if q:
-            cur.execute(
-                """
-                SELECT id, nome
-                FROM imoveis
-                WHERE nome ILIKE %s
-                ORDER BY nome
-                LIMIT %s OFFSET %s
-                """,
-                (f"%{q}%", limit, offset),
-            )
+            itens = _buscar(cur, "imoveis", "nome", q, limit, cursor)
         else:
             cur.execute(
                 """
                 SELECT id, nome
                 FROM imoveis
-                ORDER BY created_at DESC
-                LIMIT %s OFFSET %s
+                WHERE %(cursor)s IS NULL
+                   OR (created_at, id) < (SELECT created_at, id FROM imoveis WHERE id = %(cursor)s)
+                ORDER BY created_at DESC, id DESC
+                LIMIT %(limit)s
                 """,
-                (limit, offset),
+                {"cursor": cursor, "limit": limit},
             )
-        rows = cur.fetchall()
-        itens = [{"id": r[0], "nome": r[1]} for r in rows]
+            itens = [{"id": r[0], "nome": r[1]} for r in cur.fetchall()]
         return jsonify(itens), 200
-    finally:
-        conn.close()
 
 
 @search_bp.route('/categorias/search', methods=['GET'])
 @limiter.limit(RATE_LIMIT_SEARCH)
 def search_categorias():
     q = request.args.get('q', '').strip()
-    limit, offset = _paginate_params()
+    limit, cursor = _paginate_params()
 
-    conn, cur = conectar()
-    try:
+    with conexao() as (conn, cur):
         if q:
-            cur.execute(
-                """
-                SELECT id, categoria
-                FROM categorias
-                WHERE categoria ILIKE %s
-                ORDER BY categoria
-                LIMIT %s OFFSET %s
-                """,
-                (f"%{q}%", limit, offset),
-            )
+            itens = _buscar(cur, "categorias", "categoria", q, limit, cursor)
         else:
             cur.execute(
                 """
                 SELECT id, categoria
                 FROM categorias
-                ORDER BY categoria
-                LIMIT %s OFFSET %s
+                WHERE %(cursor)s IS NULL
+                   OR (categoria, id) > (SELECT categoria, id FROM categorias WHERE id = %(cursor)s)
+                ORDER BY categoria, id
+                LIMIT %(limit)s
                 """,
-                (limit, offset),
+                {"cursor": cursor, "limit": limit},
             )
-        rows = cur.fetchall()
-        itens = [{"id": r[0], "categoria": r[1]} for r in rows]
+            itens = [{"id": r[0], "categoria": r[1]} for r in cur.fetchall()]
         return jsonify(itens), 200
-    finally:
-        conn.close()
 
+
+# Mesma expressão do índice GIN de migrations/006_busca_lancamentos.sql
+_TSV_DESCRICAO = "to_tsvector('portugues_sem_acento', coalesce(l.descricao, ''))"
+
+SQL_BUSCA_LANCAMENTOS = f"""
+    WITH consulta AS (
+        SELECT websearch_to_tsquery('portugues_sem_acento', %(q)s) AS q
+    ),
+    achados AS (
+        SELECT l.id, l.data, l.id_imovel, l.id_categoria, l.id_situacao, l.valor, l.descricao,
+               round(ts_rank_cd({_TSV_DESCRICAO}, consulta.q)::numeric, 6) AS score
+        FROM lancamentos l, consulta
+        WHERE {_TSV_DESCRICAO} @@ consulta.q
+          AND (%(id_imovel)s IS NULL OR l.id_imovel = %(id_imovel)s)
+          AND (%(de)s::date IS NULL OR l.data >= %(de)s::date)
+          AND (%(ate)s::date IS NULL OR l.data <= %(ate)s::date)
+    ),
+    pagina AS (
+        SELECT *
+        FROM achados a
+        WHERE %(cursor)s IS NULL
+           OR (a.score, -a.id) < (SELECT score, -id FROM achados WHERE id = %(cursor)s)
+        ORDER BY score DESC, id
+        LIMIT %(limit)s
+    )
+    SELECT p.id, p.data, p.id_imovel, im.nome, p.id_categoria, c.categoria, p.id_situacao,
+           p.valor, p.descricao, p.score,
+           ts_headline('portugues_sem_acento', coalesce(p.descricao, ''), consulta.q,
+                       'StartSel="**", StopSel="**", MaxWords=20, MinWords=5, MaxFragments=2')
+    FROM pagina p
+    CROSS JOIN consulta
+    LEFT JOIN imoveis im ON im.id = p.id_imovel
+    LEFT JOIN categorias c ON c.id = p.id_categoria
+    ORDER BY p.score DESC, p.id
+"""
+
+
+def _data_param(nome):
+    valor = request.args.get(nome, '').strip()
+    if not valor:
+        return None
+    # Aceita DD/MM/AAAA ou AAAA-MM-DD; ValueError se inválida
+    return date.fromisoformat(converter_data(valor))
+
+
+@search_bp.route('/lancamentos/search', methods=['GET'])
+@limiter.limit(RATE_LIMIT_SEARCH)
+def search_lancamentos():
+    """Busca textual nas descrições (português, sem acento, com stemming),
+    ordenada por relevância, com trecho destacado (`**termo**`)."""
+    q = request.args.get('q', '').strip()
+    if not q:
+        return jsonify({"error": "Parâmetro q obrigatório"}), 400
+    limit, cursor = _paginate_params()
+    try:
+        id_imovel = int(request.args['id_imovel']) if request.args.get('id_imovel') else None
+    except ValueError:
+        return jsonify({"error": "id_imovel deve ser inteiro"}), 400
+    try:
+        de, ate = _data_param('from'), _data_param('to')
+    except Exception:
+        return jsonify({"error": "Data inválida (use DD/MM/AAAA ou AAAA-MM-DD)"}), 400
+
+    with conexao() as (conn, cur):
+        cur.execute(
+            SQL_BUSCA_LANCAMENTOS,
+            {"q": q, "id_imovel": id_imovel, "de": de, "ate": ate, "cursor": cursor, "limit": limit},
+        )
+        rows = cur.fetchall()
+    itens = [
+        {
+            "id": r[0],
+            "data": r[1].isoformat() if r[1] else None,
+            "id_imovel": r[2],
+            "nome_imovel": r[3],
+            "id_categoria": r[4],
+            "categoria": r[5],
+            "id_situacao": r[6],
+            "valor": float(r[7]) if r[7] is not None else None,
+            "descricao": r[8],
+            "score": float(r[9]),
+            "trecho": r[10],
+        }
+        for r in rows
+    ]
+    return jsonify(itens), 200
@@ -0,0 +1,117 @@
+"""Execução das seções independentes de uma resposta composta
+(GET /dashboard/home, GET /imoveis/<id>/bundle).
+
+Cada seção é uma função sem argumentos que roda numa thread do executor do
+processo. Fora do contexto da requisição, `conexao()` dos models equivale a
+`conexao_isolada()`: cada seção pega a própria conexão do pool e a devolve
+ao terminar.
+
+Para não esgotar o pool do worker: a conexão da requisição (usada antes
+para o ETag) volta ao pool antes de as seções começarem, e as seções de
+todas as requisições do worker ocupam juntas no máximo DB_POOL_MAX - 1
+conexões (um semáforo compartilhado), deixando uma para as demais rotas.
+Sem vaga livre, as seções da requisição rodam em sequência na thread dela,
+com uma conexão só.
+
+Falhas e tempo esgotado ficam por seção: a resposta sai com o que deu
+certo e `secoes` conta o que falhou.
+"""
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+from config import DB_POOL_MAX, SECOES_THREADS, SECOES_TIMEOUT_SEC
+from db_connection import liberar_sessao
+
+_executor = None
+_executor_pid = None
+_executor_lock = threading.Lock()
+# Conexões do pool que as seções (de todas as requisições) podem ocupar
+_vagas = threading.BoundedSemaphore(max(DB_POOL_MAX - 1, 1))
+
+
+def _obter_executor():
+    # Mesmo cuidado do pool de conexões: um fork não herda threads do pai
+    global _executor, _executor_pid
+    pid = os.getpid()
+    if _executor is None or _executor_pid != pid:
+        with _executor_lock:
+            if _executor is None or _executor_pid != pid:
+                _executor = ThreadPoolExecutor(max_workers=SECOES_THREADS, thread_name_prefix="secao")
+                _executor_pid = pid
+    return _executor
+
+
+def _medir(funcao):
+    inicio = time.perf_counter()
+    try:
+        return funcao(), None, time.perf_counter() - inicio
+    except Exception as e:
+        return None, e, time.perf_counter() - inicio
+
+
+def _na_vaga(funcao):
+    # Roda na thread do executor: espera uma das conexões reservadas às seções
+    with _vagas:
+        return _medir(funcao)
+
+
+def _registrar(dados, secoes, nome, resultado, erro, duracao):
+    dados[nome] = resultado
+    secoes[nome] = {"ok": erro is None, "tempo_ms": round(duracao * 1000, 2)}
+    if erro is not None:
+        print(f"Erro na seção {nome}: {erro}")
+        secoes[nome]["erro"] = f"Erro ao carregar {nome}"
+
+
+def _em_sequencia_tolerante(tarefas):
+    # Pool ocupado: uma conexão só; depois de uma falha a transação é
+    # desfeita para a próxima seção começar numa conexão limpa
+    dados, secoes = {}, {}
+    for nome, funcao in tarefas.items():
+        resultado, erro, duracao = _medir(funcao)
+        _registrar(dados, secoes, nome, resultado, erro, duracao)
+        if erro is not None:
+            liberar_sessao(confirmar=False)
+    return dados, secoes
+
+
+def executar_secoes(tarefas, timeout=SECOES_TIMEOUT_SEC):
+    """Roda `tarefas` (dict nome -> função) em paralelo.
+
+    Retorna `(dados, secoes)`: `dados[nome]` é o resultado ou None se a
+    seção falhou; `secoes[nome]` é `{"ok", "tempo_ms"}` mais `"erro"` nas
+    que falharam. Seções que não terminam em `timeout` segundos entram como
+    falha (a thread segue até o fim e devolve a conexão normalmente).
+    Sem vaga para seções no pool, roda tudo em sequência (ver o módulo).
+    """
+    liberar_sessao()
+    if not _vagas.acquire(blocking=False):
+        return _em_sequencia_tolerante(tarefas)
+    _vagas.release()
+
+    executor = _obter_executor()
+    futuros = {nome: executor.submit(_na_vaga, funcao) for nome, funcao in tarefas.items()}
+    wait(futuros.values(), timeout=timeout)
+
+    dados, secoes = {}, {}
+    for nome, futuro in futuros.items():
+        if not futuro.done():
+            futuro.cancel()
+            dados[nome] = None
+            secoes[nome] = {"ok": False, "tempo_ms": round(timeout * 1000, 2), "erro": "Tempo esgotado"}
+            continue
+        _registrar(dados, secoes, nome, *futuro.result())
+    return dados, secoes
+
+
+def executar_em_sequencia(tarefas):
+    """Como `executar_secoes`, mas na thread atual (e, numa requisição, na
+    conexão da sessão). Erros não são capturados: uma falha aborta a
+    transação da requisição, então as seções seguintes falhariam também."""
+    dados, secoes = {}, {}
+    for nome, funcao in tarefas.items():
+        inicio = time.perf_counter()
+        dados[nome] = funcao()
+        secoes[nome] = {"ok": True, "tempo_ms": round((time.perf_counter() - inicio) * 1000, 2)}
+    return dados, secoes
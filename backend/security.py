@@ -3,17 +3,36 @@ from flask import request, jsonify
 from config import READ_ONLY, EDITOR_TOKEN
 
 
+def _erro_token():
+    """Resposta de erro se o Bearer não é o EDITOR_TOKEN; None se é."""
+    token = request.headers.get("Authorization", "")
+    if not token.startswith("Bearer "):
+        return jsonify({"error": "Token ausente"}), 401
+    provided = token.split(" ", 1)[1].strip()
+    if not EDITOR_TOKEN or provided != EDITOR_TOKEN:
+        return jsonify({"error": "Token inválido"}), 403
+    return None
+
+
 def requires_editor_token(fn):
     @wraps(fn)
     def wrapper(*args, **kwargs):
         if READ_ONLY:
             return jsonify({"error": "Somente leitura"}), 405
-        token = request.headers.get("Authorization", "")
-        if not token.startswith("Bearer "):
-            return jsonify({"error": "Token ausente"}), 401
-        provided = token.split(" ", 1)[1].strip()
-        if not EDITOR_TOKEN or provided != EDITOR_TOKEN:
-            return jsonify({"error": "Token inválido"}), 403
+        erro = _erro_token()
+        if erro is not None:
+            return erro
         return fn(*args, **kwargs)
     return wrapper
 
+
+def requires_editor_auth(fn):
+    """Mesmo token das escritas, para leituras restritas (ex.: /healthz/stats);
+    continua valendo com READ_ONLY."""
+    @wraps(fn)
+    def wrapper(*args, **kwargs):
+        erro = _erro_token()
+        if erro is not None:
+            return erro
+        return fn(*args, **kwargs)
+    return wrapper
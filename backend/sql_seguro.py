@@ -0,0 +1,374 @@
+"""Execução das consultas do POST /sql com limites.
+
+Cada consulta roda numa transação própria `READ ONLY`, com
+`statement_timeout` local e um teto de linhas. O resultado é lido por
+cursor nomeado em lotes e enviado em streaming como um objeto JSON:
+
+    {"linhas": [{...}, ...], "colunas": [...], "total": N,
+     "truncado": false, "tempo_ms": 12.3, "linhas_lidas": 1234}
+
+Os metadados vêm depois das linhas porque só são conhecidos no fim.
+
+`linhas_lidas` soma as tuplas lidas das tabelas (sequencial + índice) na
+transação, via pg_stat_xact_user_tables. Um erro depois do início do
+envio (ex.: timeout num lote posterior) sai no campo `erro`.
+
+Antes de executar, o plano estimado (`EXPLAIN (FORMAT JSON)`) passa pelo
+controle de admissão: acima de SQL_CUSTO_MAX ou SQL_LINHAS_ESTIMADAS_MAX a
+consulta é rejeitada com uma explicação dos nós mais caros; acima de
+SQL_CUSTO_FILA ela espera vaga entre as consultas pesadas do worker. Os
+planos ficam em cache pelo texto normalizado da consulta.
+
+Resultados completos ficam num cache LRU limitado em bytes, com chave
+(texto normalizado, versão global dos dados): qualquer escrita feita pelo
+backend muda a versão e as entradas antigas deixam de ser usadas.
+"""
+import threading
+import time
+import psycopg2
+from psycopg2 import errors
+from flask import Response
+from cache import CacheLRU
+from config import (
+    SQL_STATEMENT_TIMEOUT_MS,
+    SQL_MAX_LINHAS,
+    STREAM_LOTE,
+    SQL_CUSTO_MAX,
+    SQL_LINHAS_ESTIMADAS_MAX,
+    SQL_CUSTO_FILA,
+    SQL_PESADAS_SIMULTANEAS,
+    SQL_FILA_TIMEOUT_SEC,
+    SQL_PLANO_CACHE_ITENS,
+    SQL_PLANO_CACHE_TTL_SEC,
+    SQL_RESULTADO_CACHE_BYTES,
+    SQL_RESULTADO_CACHE_ITEM_MAX_BYTES,
+    SQL_RESULTADO_CACHE_ITENS,
+    SQL_RESULTADO_CACHE_TTL_SEC,
+)
+from db_connection import conexao_isolada
+from json_rapido import codificar
+from versoes import versoes_atuais, GLOBAL
+from instrumentacao import fim_literal, normalizar_sql
+
+
+# ======================================================
+# 🔹 Controle de admissão pelo plano estimado
+# ======================================================
+
+class ConsultaRejeitada(Exception):
+    """Plano estimado acima dos limites; `detalhes` vai para o cliente."""
+
+    def __init__(self, detalhes):
+        super().__init__(detalhes["motivo"])
+        self.detalhes = detalhes
+
+
+class FilaCheia(Exception):
+    """Nenhuma vaga para consulta pesada dentro de SQL_FILA_TIMEOUT_SEC."""
+
+
+class InstrucoesMultiplas(Exception):
+    """Mais de uma instrução no texto (ex.: `SELECT 1; COMMIT; DELETE ...`)."""
+
+
+def contar_instrucoes(query):
+    """Número de instruções não vazias em `query`, separando por `;` fora de
+    literais ('...', E'...', "...", $tag$...$tag$) e comentários. Texto
+    não terminado conta como mais uma instrução (é rejeitado)."""
+    instrucoes, conteudo = 0, False
+    i, n = 0, len(query)
+    while i < n:
+        c = query[i]
+        fim = fim_literal(query, i) if c in "'\"$" else None
+        if fim is not None:
+            if fim < 0:
+                return instrucoes + 2
+            i, conteudo = fim, True
+        elif query.startswith("--", i):
+            fim = query.find("\n", i)
+            i = n if fim < 0 else fim
+        elif query.startswith("/*", i):
+            # Comentários de bloco aninham no Postgres
+            profundidade, i = 1, i + 2
+            while i < n and profundidade:
+                if query.startswith("/*", i):
+                    profundidade, i = profundidade + 1, i + 2
+                elif query.startswith("*/", i):
+                    profundidade, i = profundidade - 1, i + 2
+                else:
+                    i += 1
+            if profundidade:
+                return instrucoes + 2
+        elif c == ";":
+            instrucoes += conteudo
+            conteudo = False
+            i += 1
+        else:
+            conteudo = conteudo or not c.isspace()
+            i += 1
+    return instrucoes + conteudo
+
+
+_planos = CacheLRU(max_itens=SQL_PLANO_CACHE_ITENS, ttl=SQL_PLANO_CACHE_TTL_SEC, nome="planos_sql")
+_vagas_pesadas = threading.BoundedSemaphore(SQL_PESADAS_SIMULTANEAS)
+_resultados = CacheLRU(
+    max_itens=SQL_RESULTADO_CACHE_ITENS,
+    ttl=SQL_RESULTADO_CACHE_TTL_SEC,
+    max_bytes=SQL_RESULTADO_CACHE_BYTES,
+    nome="resultados_sql",
+)
+
+
+def _nos(plano, profundidade=0):
+    yield plano, profundidade
+    for filho in plano.get("Plans", []):
+        yield from _nos(filho, profundidade + 1)
+
+
+def _tabelas(plano):
+    nomes = []
+    for no, _ in _nos(plano):
+        if "Relation Name" in no:
+            alias = no.get("Alias")
+            nome = no["Relation Name"]
+            nomes.append(nome if not alias or alias == nome else f"{nome} {alias}")
+    return nomes
+
+
+def _numero(valor):
+    return f"{valor:,.0f}".replace(",", ".")
+
+
+def _descrever_no(no):
+    tipo = no["Node Type"]
+    custo = _numero(no["Total Cost"])
+    linhas = _numero(no["Plan Rows"])
+    if "Relation Name" in no:
+        alvo = no["Relation Name"] + (f" ({no['Alias']})" if no.get("Alias") not in (None, no["Relation Name"]) else "")
+        texto = f"{tipo} em {alvo}: ~{linhas} linhas, custo {custo}"
+        if tipo == "Seq Scan":
+            texto += (
+                " — lê a tabela inteira" + (" e filtra depois" if "Filter" in no else " (sem WHERE)")
+                + "; filtre por colunas indexadas (ex.: id_imovel, data) ou reduza o período"
+            )
+        return texto
+    tabelas = ", ".join(_tabelas(no)) or "subconsultas"
+    texto = f"{tipo} envolvendo {tabelas}: ~{linhas} linhas, custo {custo}"
+    if tipo == "Nested Loop" and "Join Filter" not in no and not any(
+        "Index Cond" in n for n, _ in _nos(no)
+    ):
+        texto += " — junção sem condição (produto cartesiano); ligue as tabelas com ON/WHERE"
+    elif tipo in ("Sort", "Aggregate", "HashAggregate", "GroupAggregate"):
+        texto += " — ordena/agrupa muitas linhas; agregue sobre um conjunto menor"
+    return texto
+
+
+def resumir_plano(plano):
+    """Custo, linhas estimadas e os nós que mais pesam (custo próprio =
+    custo total do nó menos o dos filhos)."""
+    custo_total = plano["Total Cost"]
+    proprios = []
+    for no, _ in _nos(plano):
+        filhos = sum(f["Total Cost"] for f in no.get("Plans", []))
+        proprios.append((no["Total Cost"] - filhos, no))
+    proprios.sort(key=lambda x: x[0], reverse=True)
+    gargalos = [
+        _descrever_no(no)
+        for proprio, no in proprios[:3]
+        if custo_total <= 0 or proprio >= 0.1 * custo_total
+    ]
+    linhas_max = max(no["Plan Rows"] for no, _ in _nos(plano))
+    return {"custo": custo_total, "linhas": plano["Plan Rows"], "linhas_max": linhas_max, "gargalos": gargalos}
+
+
+def avaliar_plano(query, params=None):
+    """Resumo do plano (do cache ou via EXPLAIN). Lança ConsultaRejeitada se
+    passar dos limites e InstrucoesMultiplas se houver mais de uma
+    instrução: um `COMMIT` no meio encerraria a transação READ ONLY e o
+    texto seguinte rodaria fora dela (já no EXPLAIN). Retorna
+    `(resumo, veio_do_cache)`."""
+    if contar_instrucoes(query) != 1:
+        raise InstrucoesMultiplas()
+    chave = (normalizar_sql(query), repr(params))
+    achou, resumo = _planos.get(chave)
+    if not achou:
+        with conexao_isolada(cursor_factory=None) as (conn, cur):
+            cur.execute("SET TRANSACTION READ ONLY")
+            cur.execute("SELECT set_config('statement_timeout', %s, true)", (str(SQL_STATEMENT_TIMEOUT_MS),))
+            cur.execute("EXPLAIN (FORMAT JSON) " + query, params)
+            resumo = resumir_plano(cur.fetchone()[0][0]["Plan"])
+        _planos.set(chave, resumo)
+
+    motivos = []
+    if resumo["custo"] > SQL_CUSTO_MAX:
+        motivos.append(f"custo estimado {_numero(resumo['custo'])} acima do limite {_numero(SQL_CUSTO_MAX)}")
+    if resumo["linhas_max"] > SQL_LINHAS_ESTIMADAS_MAX:
+        motivos.append(
+            f"~{_numero(resumo['linhas_max'])} linhas estimadas em um passo do plano "
+            f"(limite {_numero(SQL_LINHAS_ESTIMADAS_MAX)})"
+        )
+    if motivos:
+        raise ConsultaRejeitada({
+            "motivo": "; ".join(motivos),
+            "custo_estimado": resumo["custo"],
+            "linhas_estimadas": resumo["linhas_max"],
+            "explicacao": resumo["gargalos"],
+        })
+    return resumo, achou
+
+
+def estatisticas_planos():
+    return _planos.estatisticas()
+
+
+class ExecucaoSQL:
+    """Itera os lotes (listas de dicts) de uma consulta; ao final do
+    iterador, `total`, `truncado`, `tempo_ms` e `linhas_lidas` ficam
+    preenchidos."""
+
+    def __init__(self, query, params=None, max_linhas=SQL_MAX_LINHAS,
+                 timeout_ms=SQL_STATEMENT_TIMEOUT_MS, lote=STREAM_LOTE):
+        self.query = query
+        self.params = params
+        self.max_linhas = max_linhas
+        self.timeout_ms = timeout_ms
+        self.lote = lote
+        self.colunas = []
+        self.total = 0
+        self.truncado = False
+        self.tempo_ms = None
+        self.linhas_lidas = None
+        self.custo_estimado = None
+        self.espera_fila_ms = 0.0
+
+    def __iter__(self):
+        resumo, _ = avaliar_plano(self.query, self.params)
+        self.custo_estimado = resumo["custo"]
+        pesada = resumo["custo"] > SQL_CUSTO_FILA
+        if pesada:
+            espera = time.perf_counter()
+            if not _vagas_pesadas.acquire(timeout=SQL_FILA_TIMEOUT_SEC):
+                raise FilaCheia()
+            self.espera_fila_ms = round((time.perf_counter() - espera) * 1000, 2)
+        try:
+            yield from self._executar()
+        finally:
+            if pesada:
+                _vagas_pesadas.release()
+
+    def _executar(self):
+        inicio = time.perf_counter()
+        with conexao_isolada(cursor_factory=None) as (conn, cur):
+            cur.execute("SET TRANSACTION READ ONLY")
+            cur.execute("SELECT set_config('statement_timeout', %s, true)", (str(self.timeout_ms),))
+            with conn.cursor(name="sql_seguro") as nomeado:
+                nomeado.itersize = self.lote
+                nomeado.execute(self.query, self.params)
+                while not self.truncado:
+                    # Uma linha além do teto indica truncamento
+                    restante = self.max_linhas - self.total
+                    linhas = nomeado.fetchmany(min(self.lote, restante + 1))
+                    if not linhas:
+                        break
+                    if not self.colunas:
+                        self.colunas = [c[0] for c in nomeado.description]
+                    if len(linhas) > restante:
+                        linhas = linhas[:restante]
+                        self.truncado = True
+                    self.total += len(linhas)
+                    if linhas:
+                        yield [dict(zip(self.colunas, linha)) for linha in linhas]
+                if not self.colunas and nomeado.description:
+                    self.colunas = [c[0] for c in nomeado.description]
+            self.tempo_ms = round((time.perf_counter() - inicio) * 1000, 2)
+            cur.execute(
+                """
+                SELECT COALESCE(SUM(COALESCE(seq_tup_read, 0) + COALESCE(idx_tup_fetch, 0)), 0)
+                FROM pg_stat_xact_user_tables
+                """
+            )
+            self.linhas_lidas = int(cur.fetchone()[0])
+
+
+def mensagem_erro(e):
+    """Status e mensagem para erros do psycopg2 na execução."""
+    if isinstance(e, errors.QueryCanceled):
+        return 400, f"Tempo limite da consulta excedido ({SQL_STATEMENT_TIMEOUT_MS} ms)"
+    if isinstance(e, errors.ReadOnlySqlTransaction):
+        return 403, "A consulta tentou alterar dados (transação somente leitura)"
+    return 400, str(e).strip()
+
+
+def _chave_resultado(execucao):
+    # Qualquer escrita pelo backend muda a versão global e, com ela, a chave
+    versao = versoes_atuais().get(GLOBAL, 0)
+    return (normalizar_sql(execucao.query), repr(execucao.params), versao)
+
+
+def resposta_sql(execucao):
+    """Response em streaming com o resultado de `execucao`, servida do
+    cache de resultados quando possível (campo `cache`).
+
+    Sem cache, o primeiro lote é lido antes: erros de sintaxe/permissão/
+    timeout iniciais sobem como exceção para a rota responder com o status
+    adequado. Resultados completos até SQL_RESULTADO_CACHE_ITEM_MAX_BYTES
+    são guardados ao fim do envio.
+    """
+    chave = _chave_resultado(execucao)
+    achou, guardado = _resultados.get(chave)
+    if achou:
+        linhas_json, final = guardado
+        corpo_cache = [b'{"linhas":[', linhas_json, b"]," + codificar({**final, "cache": True})[1:]]
+        return Response(corpo_cache, mimetype="application/json")
+
+    lotes = iter(execucao)
+    primeiro = next(lotes, [])
+
+    def corpo():
+        erro = None
+        # Trechos já enviados, guardados enquanto couberem no limite por item
+        trechos, tamanho = [], 0
+        try:
+            yield b'{"linhas":['
+            separador = b""
+            try:
+                for linhas in _encadear(primeiro, lotes):
+                    trecho = separador + codificar(linhas)[1:-1]
+                    separador = b","
+                    if trechos is not None:
+                        tamanho += len(trecho)
+                        if tamanho <= SQL_RESULTADO_CACHE_ITEM_MAX_BYTES:
+                            trechos.append(trecho)
+                        else:
+                            trechos = None
+                    yield trecho
+            except psycopg2.Error as e:
+                erro = mensagem_erro(e)[1]
+            final = {
+                "colunas": execucao.colunas,
+                "total": execucao.total,
+                "truncado": execucao.truncado,
+                "tempo_ms": execucao.tempo_ms,
+                "linhas_lidas": execucao.linhas_lidas,
+                "custo_estimado": execucao.custo_estimado,
+                "espera_fila_ms": execucao.espera_fila_ms,
+            }
+            if erro:
+                final["erro"] = erro
+            elif trechos is not None:
+                _resultados.set(chave, (b"".join(trechos), final), tamanho=tamanho)
+            yield b"]," + codificar({**final, "cache": False})[1:]
+        finally:
+            lotes.close()
+
+    return Response(corpo(), mimetype="application/json")
+
+
+def _encadear(primeiro, lotes):
+    if primeiro:
+        yield primeiro
+    yield from lotes
+
+
+def estatisticas_resultados():
+    return _resultados.estatisticas()
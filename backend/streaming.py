@@ -0,0 +1,83 @@
+"""Respostas em streaming para listagens grandes (NDJSON ou array JSON).
+
+As linhas são lidas por um cursor nomeado (no servidor) em lotes de
+STREAM_LOTE e codificadas lote a lote, então a memória do worker não cresce
+com o tamanho da tabela e o primeiro byte sai após o primeiro lote. A
+conexão vem de `conexao_isolada` e fica emprestada até o fim da resposta
+(ou até o cliente desconectar).
+"""
+from flask import Response, request
+from config import STREAM_LOTE
+from db_connection import conexao_isolada
+# Mesmo codificador do jsonify (datas DD/MM/AAAA, Decimal, chaves ordenadas), em bytes
+from json_rapido import codificar
+from linhas import preparar_cursor
+
+NDJSON = "application/x-ndjson"
+
+
+def formato_stream():
+    """`ndjson`, `json` ou None (resposta normal), por `?stream=` ou pelo
+    header Accept: application/x-ndjson."""
+    valor = request.args.get("stream", "").strip().lower()
+    if valor == "ndjson":
+        return "ndjson"
+    if valor in ("json", "1", "true"):
+        return "json"
+    if request.accept_mimetypes.best_match(["application/json", NDJSON]) == NDJSON:
+        return "ndjson"
+    return None
+
+
+def lotes_de_linhas(sql, params=None, lote=STREAM_LOTE):
+    """Gera listas de dicts (um lote por vez) lidas por cursor nomeado."""
+    with conexao_isolada() as (conn, _):
+        with conn.cursor(name="stream_linhas") as cur:
+            cur.itersize = lote
+            # Datas DD/MM/AAAA e numeric como float já no driver
+            preparar_cursor(cur)
+            cur.execute(sql, params)
+            colunas = None
+            while True:
+                linhas = cur.fetchmany(lote)
+                if not linhas:
+                    break
+                if colunas is None:
+                    colunas = [c[0] for c in cur.description]
+                yield [dict(zip(colunas, linha)) for linha in linhas]
+
+
+def resposta_stream(sql, params=None, formato="json", lote=STREAM_LOTE):
+    """Response em streaming com o resultado de `sql`.
+
+    O primeiro lote é lido antes de devolver a resposta: erros de consulta
+    ainda viram 500 normais, em vez de um corpo truncado.
+    """
+    lotes = lotes_de_linhas(sql, params, lote)
+    primeiro = next(lotes, [])
+
+    def todos_os_lotes():
+        try:
+            if primeiro:
+                yield primeiro
+            yield from lotes
+        finally:
+            lotes.close()  # cliente desconectou: devolve a conexão já
+
+    if formato == "ndjson":
+        def corpo():
+            for linhas in todos_os_lotes():
+                yield b"".join(codificar(linha) + b"\n" for linha in linhas)
+
+        return Response(corpo(), mimetype=NDJSON)
+
+    def corpo():
+        yield b"["
+        separador = b""
+        for linhas in todos_os_lotes():
+            # Um dumps por lote: o array do lote sem os colchetes
+            yield separador + codificar(linhas)[1:-1]
+            separador = b","
+        yield b"]"
+
+    return Response(corpo(), mimetype="application/json")
@@ -0,0 +1,117 @@
+"""Execução das consultas nomeadas sem banco: uma sessão falsa que segue o
+comportamento do psycopg2 (cada execute troca o resultado do cursor) e do
+servidor (PREPARE/EXECUTE por sessão).
+
+Uso (a partir de backend/):
+    python -m pytest -q tests
+"""
+import os
+import sys
+from contextlib import contextmanager
+
+import pytest
+from psycopg2 import errors
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import consultas_nomeadas  # noqa: E402
+
+
+class _Sessao:
+    """Estado do servidor: statements preparados e comandos recebidos."""
+
+    def __init__(self):
+        self.preparadas = set()
+        self.comandos = []
+
+
+class _Cursor:
+    def __init__(self, sessao, linhas):
+        self._sessao = sessao
+        self._linhas = linhas
+        self.description = None
+        self._resultado = []
+
+    def execute(self, sql, params=None):
+        comando = sql.split()[0].upper()
+        self._sessao.comandos.append(comando)
+        self.description, self._resultado = None, []
+        if comando == "PREPARE":
+            self._sessao.preparadas.add(sql.split()[1].split("(")[0])
+        elif comando == "EXECUTE":
+            nome = sql.split()[1].split("(")[0]
+            if nome not in self._sessao.preparadas:
+                raise errors.InvalidSqlStatementName()
+            self.description = [("id",), ("valor",)]
+            self._resultado = list(self._linhas)
+        elif comando == "SELECT" and "%(p1)s" in sql:
+            self.description = [("id",), ("valor",)]
+            self._resultado = list(self._linhas)
+
+    def fetchall(self):
+        return self._resultado
+
+    def close(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class _Conexao:
+    def __init__(self, sessao, linhas):
+        self._sessao = sessao
+        self._linhas = linhas
+
+    def cursor(self, *args, **kwargs):
+        return _Cursor(self._sessao, self._linhas)
+
+
+@pytest.fixture
+def banco(monkeypatch):
+    sessao = _Sessao()
+    conn = _Conexao(sessao, [(1, 10.5), (2, 20.0)])
+
+    @contextmanager
+    def conexao_isolada(cursor_factory=None):
+        yield conn, conn.cursor()
+
+    monkeypatch.setattr(consultas_nomeadas, "conexao_isolada", conexao_isolada)
+    monkeypatch.setattr(consultas_nomeadas, "versoes_atuais", lambda: {})
+    monkeypatch.setattr(consultas_nomeadas, "SQL_NOMEADAS_PREPARADAS", True)
+    consultas_nomeadas._resultados.limpar()
+    consultas_nomeadas._preparadas.clear()
+    return sessao
+
+
+def test_caminho_preparado_devolve_as_linhas(banco):
+    resultado = consultas_nomeadas.executar("ultimos_lancamentos", (None, None, 20))
+
+    assert resultado["colunas"] == ["id", "valor"]
+    assert resultado["linhas"] == [{"id": 1, "valor": 10.5}, {"id": 2, "valor": 20.0}]
+    assert resultado["cache"] is False
+    assert "cn_ultimos_lancamentos" in banco.preparadas
+    assert "EXECUTE" in banco.comandos
+
+
+def test_sessao_sem_o_statement_prepara_de_novo(banco):
+    consultas_nomeadas.executar("ultimos_lancamentos", (None, None, 20))
+    banco.preparadas.clear()  # pooler entregou outra sessão do servidor
+    consultas_nomeadas._resultados.limpar()
+
+    resultado = consultas_nomeadas.executar("ultimos_lancamentos", (None, None, 5))
+
+    assert resultado["total"] == 2
+    assert banco.comandos.count("PREPARE") == 2
+
+
+def test_sem_prepared_statements_roda_parametrizada(banco, monkeypatch):
+    monkeypatch.setattr(consultas_nomeadas, "SQL_NOMEADAS_PREPARADAS", False)
+
+    resultado = consultas_nomeadas.executar("gastos_por_categoria", (None, None, None))
+
+    assert resultado["total"] == 2
+    assert "PREPARE" not in banco.comandos
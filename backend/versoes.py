@@ -0,0 +1,180 @@
+"""Contadores de versão dos dados e ETag nas rotas de leitura.
+
+Cada escrita incrementa, na mesma transação, as versões dos escopos
+afetados (`imovel:<id>`, `referencia` para categorias/grupos), linhas da
+tabela `versoes_dados`. A versão `global` (qualquer escrita) é a sequência
+`versoes_global` (migrations/010): incrementada com nextval logo depois do
+commit, sem lock de linha, então escritas de imóveis diferentes não
+esperam umas pelas outras, e quem lê a versão nova já vê os dados. As
+rotas GET derivam o ETag das versões relevantes e respondem 304 quando o
+`If-None-Match` do cliente ainda corresponde, sem rodar a consulta da rota.
+
+O ETag é sempre calculado com as versões lidas do banco: com vários
+workers, uma escrita num worker seguida de um GET condicional em outro não
+pode receber 304 com dados velhos. Os caches em memória (referencia.py,
+resultados do /sql) usam `versoes_atuais`, em cache no processo por
+VERSAO_CACHE_TTL_SEC; uma escrita no próprio worker invalida esse cache
+depois do commit.
+
+Sem as migrações 003/010 aplicadas as rotas respondem sem ETag (e os
+caches em memória ficam só com os seus TTLs), em vez de falhar.
+"""
+import threading
+import time
+from functools import wraps
+from flask import request, make_response
+from config import VERSAO_CACHE_TTL_SEC
+from db_connection import conexao
+
+# Versões lidas do banco: escopos em versoes_dados e a sequência da global
+_SQL_VERSOES = """
+    SELECT escopo, versao FROM versoes_dados {filtro}
+    UNION ALL
+    SELECT 'global', last_value FROM versoes_global
+"""
+
+GLOBAL = "global"
+REFERENCIA = "referencia"
+
+_versoes = {}
+_carregado_em = 0.0
+_disponivel = False
+_verificado_em = None
+_lock = threading.Lock()
+
+
+def escopo_imovel(id_imovel):
+    return f"imovel:{int(id_imovel)}"
+
+
+def _versionamento_disponivel():
+    # Sem exceção (que abortaria a transação da requisição): to_regclass.
+    # Enquanto faltar, verifica de novo a cada VERSAO_CACHE_TTL_SEC.
+    global _disponivel, _verificado_em
+    agora = time.monotonic()
+    if _disponivel or (_verificado_em is not None and agora - _verificado_em < VERSAO_CACHE_TTL_SEC):
+        return _disponivel
+    with conexao(cursor_factory=None) as (conn, cur):
+        cur.execute("SELECT to_regclass('versoes_dados') IS NOT NULL AND to_regclass('versoes_global') IS NOT NULL")
+        disponivel = bool(cur.fetchone()[0])
+    if not disponivel and _verificado_em is None:
+        print("versoes_dados/versoes_global ausentes (migrations 003 e 010): respostas sem ETag")
+    with _lock:
+        _disponivel, _verificado_em = disponivel, agora
+    return disponivel
+
+
+def _depois_do_commit(conn):
+    # A escrita já está visível: só agora a versão global avança
+    global _carregado_em
+    with _lock:
+        _carregado_em = 0.0
+    try:
+        with conn.cursor() as cur:
+            cur.execute("SELECT nextval('versoes_global')")
+        conn.commit()
+    except Exception as e:
+        # A escrita já foi confirmada; sem o nextval os caches ficam com os TTLs
+        print(f"Erro ao incrementar a versão global: {e}")
+
+
+def registrar_escrita(cur, imoveis=(), referencia=False):
+    """Incrementa as versões afetadas por uma escrita usando o cursor (e a
+    transação) da própria escrita; a global e o cache do worker, depois do
+    commit."""
+    global _carregado_em
+    if not _versionamento_disponivel():
+        with _lock:
+            _carregado_em = 0.0
+        return
+    escopos = [REFERENCIA] if referencia else []
+    # Ordem fixa de bloqueio entre escritas concorrentes
+    escopos.extend(sorted({escopo_imovel(i) for i in imoveis if i is not None}))
+    if escopos:
+        cur.execute(
+            """
+            INSERT INTO versoes_dados (escopo, versao)
+            SELECT unnest(%s::text[]), 1
+            ON CONFLICT (escopo) DO UPDATE SET versao = versoes_dados.versao + 1
+            """,
+            (escopos,),
+        )
+    apos_commit = getattr(cur.connection, "apos_commit", None)
+    if apos_commit is not None:
+        apos_commit(_depois_do_commit)
+    else:
+        # Conexão sem o gancho (fora do pool): nextval na própria transação
+        cur.execute("SELECT nextval('versoes_global')")
+        with _lock:
+            _carregado_em = 0.0
+
+
+def versoes_atuais():
+    """Versões conhecidas pelo worker (recarregadas após o TTL)."""
+    global _versoes, _carregado_em
+    agora = time.monotonic()
+    if agora - _carregado_em < VERSAO_CACHE_TTL_SEC:
+        return _versoes
+    novas = {}
+    if _versionamento_disponivel():
+        with conexao(cursor_factory=None) as (conn, cur):
+            cur.execute(_SQL_VERSOES.format(filtro=""))
+            novas = {escopo: versao for escopo, versao in cur.fetchall()}
+    with _lock:
+        _versoes = novas
+        _carregado_em = agora
+    return novas
+
+
+def etag_para(escopos):
+    """ETag de `escopos` com as versões atuais do banco (sem o cache do
+    worker); None se o versionamento não existe no banco."""
+    if not _versionamento_disponivel():
+        return None
+    with conexao(cursor_factory=None) as (conn, cur):
+        cur.execute(_SQL_VERSOES.format(filtro="WHERE escopo = ANY(%s)"), (list(escopos),))
+        versoes = {escopo: versao for escopo, versao in cur.fetchall()}
+    return ";".join(f"{e}={versoes.get(e, 0)}" for e in escopos)
+
+
+def resposta_304(tag):
+    """Resposta 304 (já com o ETag) se o If-None-Match do cliente ainda
+    corresponde a `tag`; None caso contrário ou sem ETag."""
+    if tag is not None and request.if_none_match.contains_weak(tag):
+        return marcar_etag(make_response("", 304), tag)
+    return None
+
+
+def marcar_etag(resposta, tag):
+    if tag is None:
+        return resposta
+    resposta.set_etag(tag, weak=True)
+    resposta.headers["Cache-Control"] = "no-cache"
+    return resposta
+
+
+def com_etag(escopos):
+    """Decorator de rota GET: `escopos` é uma lista ou uma função que
+    recebe os argumentos da rota e devolve a lista de escopos."""
+
+    def decorator(fn):
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            lista = escopos(**kwargs) if callable(escopos) else escopos
+            # Lido antes da consulta: se uma escrita entrar no meio, o ETag
+            # fica "velho" e o cliente apenas busca de novo na próxima vez
+            tag = etag_para(lista)
+            resposta = resposta_304(tag)
+            if resposta is None:
+                resposta = make_response(fn(*args, **kwargs))
+                if resposta.status_code != 200:
+                    return resposta
+            return marcar_etag(resposta, tag)
+
+        return wrapper
+
+    return decorator
+
+
+def escopos_imovel(id_imovel, **_):
+    return [escopo_imovel(id_imovel), REFERENCIA]
@@ -1,10 +1,9 @@
-import React, { useEffect, useState } from "react";
+import React, { useEffect, useRef, useState } from "react";
 import { Link } from "react-router-dom";
 import {
-  fetchImoveis,
+  fetchHome,
   deleteImovel,
   addImovel,
-  fetchUltimaAtualizacao,
   fetchUltimosLancamentos,
   fetchGastosMensais,
   fetchCategorias,
@@ -40,13 +39,19 @@ const normalizarGrupos = (raw) => {
   return [];
 };
 
+// Datas da API chegam como DD/MM/AAAA
+const parseDataBR = (valor) => {
+  const [dia, mes, ano] = String(valor).split("/").map(Number);
+  return new Date(ano, mes - 1, dia);
+};
+
 const formatarPeriodo = (inicio, fim) => {
   if (!inicio || !fim) {
     return null;
   }
   try {
-    const inicioData = new Date(inicio);
-    const fimData = new Date(fim);
+    const inicioData = parseDataBR(inicio);
+    const fimData = parseDataBR(fim);
     if (Number.isNaN(inicioData.getTime()) || Number.isNaN(fimData.getTime())) {
       return null;
     }
@@ -56,6 +61,26 @@ const formatarPeriodo = (inicio, fim) => {
   }
 };
 
+const normalizarImoveis = (data) =>
+  (data || []).map((imovel) => {
+    const totalInvestidoRaw =
+      imovel.total_investido ?? imovel.totalInvestido ?? imovel.totallancamentos ?? 0;
+    const periodoInicio = imovel.periodo_inicio ?? null;
+    const periodoFim = imovel.periodo_fim ?? null;
+    return {
+      ...imovel,
+      totalInvestido: Number(totalInvestidoRaw) || 0,
+      grupos: normalizarGrupos(imovel.grupos),
+      periodoInicio,
+      periodoFim,
+    };
+  });
+
+const ordenarCategorias = (lista) =>
+  (lista || [])
+    .map((item) => ({ id: item.id, nome: item.categoria }))
+    .sort((a, b) => a.nome.localeCompare(b.nome, "pt-BR"));
+
 function Home() {
   const [imoveis, setImoveis] = useState([]);
   const [loadingImoveis, setLoadingImoveis] = useState(true);
@@ -81,6 +106,7 @@ function Home() {
   const [categoriasDisponiveis, setCategoriasDisponiveis] = useState([]);
   const [categoriasLoading, setCategoriasLoading] = useState(false);
   const [categoriasErro, setCategoriasErro] = useState(false);
+  const homeCarregadaRef = useRef(false);
   const editorToken = useEditorToken();
   const canEdit = !!editorToken;
 
@@ -124,37 +150,6 @@ function Home() {
     setPrefReady(true);
   }, []);
 
-  useEffect(() => {
-    setLoadingImoveis(true);
-    setErroImoveis(false);
-    fetchImoveis()
-      .then((data) => {
-        const imoveisNormalizados = (data || []).map((imovel) => {
-          const totalInvestidoRaw =
-            imovel.total_investido ?? imovel.totalInvestido ?? imovel.totallancamentos ?? 0;
-          const periodoInicio = imovel.periodo_inicio ?? null;
-          const periodoFim = imovel.periodo_fim ?? null;
-          return {
-            ...imovel,
-            totalInvestido: Number(totalInvestidoRaw) || 0,
-            grupos: normalizarGrupos(imovel.grupos),
-            periodoInicio,
-            periodoFim,
-          };
-        });
-        setImoveis(imoveisNormalizados);
-      })
-      .catch(() => {
-        setErroImoveis(true);
-        setImoveis([]);
-      })
-      .finally(() => setLoadingImoveis(false));
-
-    fetchUltimaAtualizacao()
-      .then((res) => setUltimaAtualizacao(res?.data || null))
-      .catch(() => setUltimaAtualizacao(null));
-  }, []);
-
   useEffect(() => {
     if (!prefReady) {
       return;
@@ -163,6 +158,47 @@ function Home() {
     setLoadingGastos(true);
     setErroGastos(false);
 
+    // Primeira carga: todos os widgets numa só requisição (GET /dashboard/home)
+    if (!homeCarregadaRef.current) {
+      homeCarregadaRef.current = true;
+      fetchHome(chartPref.meses, chartPref.excluir || [], 10)
+        .then((home) => {
+          // Seções com falha vêm como null e ok: false em home.secoes
+          const ok = (secao) => home?.secoes?.[secao]?.ok !== false;
+          if (ok("imoveis")) {
+            setImoveis(normalizarImoveis(home.imoveis));
+          } else {
+            setErroImoveis(true);
+            setImoveis([]);
+          }
+          setUltimaAtualizacao(home?.ultima_atualizacao || null);
+          if (ok("gastos_mensais")) {
+            setGastosMensais(home.gastos_mensais || []);
+          } else {
+            setGastosMensais([]);
+            setErroGastos(true);
+          }
+          if (ok("categorias")) {
+            setCategoriasDisponiveis(ordenarCategorias(home.categorias));
+          }
+          if (ok("ultimos_lancamentos")) {
+            setUltimos(home.ultimos_lancamentos || []);
+          }
+        })
+        .catch(() => {
+          setErroImoveis(true);
+          setImoveis([]);
+          setUltimaAtualizacao(null);
+          setGastosMensais([]);
+          setErroGastos(true);
+        })
+        .finally(() => {
+          setLoadingImoveis(false);
+          setLoadingGastos(false);
+        });
+      return;
+    }
+
     fetchGastosMensais(chartPref.meses, chartPref.excluir || [])
       .then((dados) => {
         setGastosMensais(dados || []);
@@ -206,10 +242,7 @@ function Home() {
     setCategoriasErro(false);
     try {
       const lista = await fetchCategorias();
-      const ordenadas = (lista || [])
-        .map((item) => ({ id: item.id, nome: item.categoria }))
-        .sort((a, b) => a.nome.localeCompare(b.nome, "pt-BR"));
-      setCategoriasDisponiveis(ordenadas);
+      setCategoriasDisponiveis(ordenarCategorias(lista));
     } catch (error) {
       console.error("Erro ao carregar categorias: ", error);
       setCategoriasErro(true);
@@ -537,6 +570,7 @@ function Home() {
           className="btn btn-link btn-sm p-0"
           onClick={async () => {
             setShowUltimos(true);
+            if (ultimos.length) return; // já vieram com a home
             setLoadingUltimos(true);
             try {
               const itens = await fetchUltimosLancamentos(10);
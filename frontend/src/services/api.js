@@ -51,3 +51,16 @@ export async function fetchGastosMensais(meses = 6, categoriasExcluidas = []) {
   const { data } = await api.get(`/dashboard/gastos-mensais${query ? `?${query}` : ""}`);
   return data;
 }
+
+// Home: imóveis, categorias, data de atualização, últimos lançamentos e
+// gastos mensais numa só requisição (seções consultadas em paralelo)
+export async function fetchHome(meses = 6, categoriasExcluidas = [], limit = 10) {
+  const params = new URLSearchParams();
+  if (meses) params.append("meses", meses);
+  if (categoriasExcluidas.length) {
+    params.append("excluir", categoriasExcluidas.join(","));
+  }
+  params.append("limit", limit);
+  const { data } = await api.get(`/dashboard/home?${params.toString()}`);
+  return data; // { imoveis, categorias, ultima_atualizacao, ultimos_lancamentos, gastos_mensais, secoes, tempo_total_ms }
+}